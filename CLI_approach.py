@@ -1,24 +1,90 @@
+import weakref
 from datetime import date 
+from operator import attrgetter
+
+from templates import compile_template
+
+def _set_once(self, name, value):
+    '''
+    __setattr__ of the immutable records : every slot can be 
+    assigned once, in __init__, and never changed after that. 
+    '''
+    try:
+        getattr(self, name)
+    except AttributeError:
+        object.__setattr__(self, name, value)
+    else:
+        raise AttributeError('{} objects are immutable'.format(type(self).__name__))
+
 
 class Names:
     '''
     Name objects to contain name(s) 
-    of authors. 
+    of authors. Names objects are immutable and hashable, 
+    use Names.intern() to share one object between every 
+    record with the same author list. 
     *names  -> Names(names)     variable amount of str
             -> Names([names])   list of names 
             -> Names((names))   tuple of names
     '''
+    __slots__ = ('list_o_names', '_parsed', '__weakref__')
+
+    _interned = weakref.WeakValueDictionary()
+
     def __init__(self, *names):
-        self.list_o_names = []
-        if isinstance(names[0],list):
-            self.list_o_names = names[0][:]
-        elif isinstance(names[0],tuple):
-            self.list_o_names = list(names[0])
+        if isinstance(names[0],(list,tuple)):
+            self.list_o_names = tuple(names[0])
         elif isinstance(names[0],str):
-            self.list_o_names = list(names)
+            self.list_o_names = names
+        else:
+            self.list_o_names = ()
+
+    __setattr__ = _set_once
+
+    @classmethod
+    def intern(cls, *names):
+        '''
+        Returns the shared Names object for these names, 
+        created the first time it is asked for. 
+        '''
+        # looked up before building a new object, most names are already known
+        found = cls._interned.get(tuple(names[0]) if isinstance(names[0], (list, tuple)) else names)
+        if found != None:
+            return found
+        names = cls(*names)
+        return cls._interned.setdefault(names.list_o_names, names)
 
     def __len__(self):
         return len(self.list_o_names)
+
+    def __eq__(self, other):
+        return isinstance(other, Names) and self.list_o_names == other.list_o_names
+
+    def __hash__(self):
+        return hash(self.list_o_names)
+
+    def __repr__(self):
+        return 'Names({!r})'.format(list(self.list_o_names))
+
+    def get_parsed(self):
+        '''
+        Returns a tuple with one (surname, given names, initials) 
+        tuple per name. Every name is split only once, the result 
+        is cached and shared by all the formatters below. 
+
+        eg : (('Dickson', ('John', 'Smith'), 'J.S.'), ('Trump', ('Donald',), 'D.'))
+        '''
+        try:
+            return self._parsed
+        except AttributeError:
+            parsed = []
+            for names in self.list_o_names:
+                name = names.split(' ')
+                givennames = tuple(name[:-1])
+                initial = ''.join(['{}.'.format(every_name[0]) for every_name in givennames])
+                parsed.append((name[-1], givennames, initial))
+            self._parsed = tuple(parsed)
+            return self._parsed
     
     def get_famname(self):
         '''
@@ -27,11 +93,7 @@ class Names:
 
         eg : ['Dickson', 'Trump', 'Perry']
         '''
-        famnames = []
-        for names in self.list_o_names:
-            name = names.split(' ')
-            famnames.append(name[-1])
-        return famnames
+        return [surname for surname, _, _ in self.get_parsed()]
 
     def get_givenname(self):
         '''
@@ -40,11 +102,7 @@ class Names:
 
         eg : ['John Smith', 'Donald', 'Katy']
         '''
-        givennames = []
-        for names in self.list_o_names:
-            name = names.split(' ')
-            givennames.append(name[:-1])
-        return givennames
+        return [list(givennames) for _, givennames, _ in self.get_parsed()]
 
     def get_initials(self):
         '''
@@ -52,23 +110,7 @@ class Names:
         the initials of the given names . 
         eg : ['J.S.', 'D.', 'K.']
         '''
-        initials = []
-        for givennames in self.get_givenname():
-            # print(givennames)
-            initial = ''
-            if len(givennames)>1:
-                # print('if')
-                for every_name in givennames:
-                    x = every_name[0]
-                    initial += '{}.'.format(x)
-                    # print(x)
-            else:
-                # print('else')
-                for name in givennames:
-                    x = name[0]
-                    initial += '{}.'.format(x)
-            initials.append(initial)
-        return initials
+        return [initial for _, _, initial in self.get_parsed()]
 
     def get_endtext_name(self):
         '''
@@ -77,20 +119,16 @@ class Names:
 
         eg : Dickson, J.S. , Trump, D. and Perry, K.
         '''
-        final = ''
-        if len(self.get_famname()) == 1 :
-            final += '{surname}, {initial} '.format(surname=self.get_famname()[0], initial=self.get_initials()[0])
-        
-        elif len(self.get_famname()) > 1:
-            for i in range(len(self.get_famname())):
-                final += '{surname}, {initial} '.format(surname=self.get_famname()[i], initial=self.get_initials()[i])
-                if i < len(self.get_famname()) - 2  : 
-                    final += ', '
-                elif i == len(self.get_famname()) - 2 :
-                    final += 'and '
-                else:
-                    pass
-        return final
+        parsed = self.get_parsed()
+        last = len(parsed) - 1
+        final = []
+        for i, (surname, _, initial) in enumerate(parsed):
+            final.append('{surname}, {initial} '.format(surname=surname, initial=initial))
+            if i < last - 1 :
+                final.append(', ')
+            elif i == last - 1 :
+                final.append('and ')
+        return ''.join(final)
 
     def get_intext_name(self, source=None):
         '''
@@ -99,53 +137,145 @@ class Names:
 
         eg: Dickson, Trump and Perry
         '''
+        famnames = [surname for surname, _, _ in self.get_parsed()]
         if source == None:
-            final = ''
-            if len(self.get_famname()) == 1 :
-                final += '{surname}'.format(surname=self.get_famname()[0])
-            
-            elif len(self.get_famname()) > 1:
-                for i in range(len(self.get_famname())):
-                    final += '{surname}'.format(surname=self.get_famname()[i])
-                    if i < len(self.get_famname()) - 2  : 
-                        final += ', '
-                    elif i == len(self.get_famname()) - 2 :
-                        final += ' and '
-                    else:
-                        pass
-            return final
+            if len(famnames) > 1:
+                return ', '.join(famnames[:-1]) + ' and ' + famnames[-1]
+            return ''.join(famnames)
         
         # return -> name et.al  
         elif source == 'journal':
-            final = ''
-            if len(self.get_famname()) == 1 :
-                final += '{surname}'.format(surname=self.get_famname()[0])
-            elif len(self.get_famname()) == 2:
-                final += '{name1} and {name2}'.format(name1=self.get_famname()[0],name2=self.get_famname()[1])
-            elif len(self.get_famname()) > 2:
-                final += '{name1} et al.'.format(name1=self.get_famname()[0])
-            return final
+            if len(famnames) == 2:
+                return '{name1} and {name2}'.format(name1=famnames[0],name2=famnames[1])
+            elif len(famnames) > 2:
+                return '{name1} et al.'.format(name1=famnames[0])
+            return ''.join(famnames)
+
+
+MONTH = (None, 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December')
+
+
+class RenderContext:
+    '''
+    Formatting state shared by every record rendered in a batch. 
+    Create one per batch and pass it to end_text() : the access date 
+    is read and formatted only once, and all the records of the batch 
+    get the same date even if the run crosses midnight. 
+
+    Input : data types 
+        access_date -> date object or None (today)
+        date_format -> str, strftime format of the access date
+    '''
+    def __init__(self, access_date=None, date_format='%d/%m/%Y'):
+        self.access_date = date.today() if access_date == None else access_date
+        self.date_format = date_format
+        self.accessed = self.access_date.strftime(date_format)
+        self.month = MONTH
 
 
 class Citation:
     '''
     General citation object. Shall not be used externally 
 
+    Citation objects are slotted, immutable and hashable : two 
+    records of the same type with the same fields are equal. 
+
     Input : data types 
 
         author              -> Name object or None 
         master_title        -> str
         year_of_publication -> int
     '''
+    __slots__ = ('author', 'year_of_publication', 'master_title')
+
     def __init__(self, author, master_title, year_of_publication):
-        self.MONTH = [None, 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
         self.author = author
         self.year_of_publication = self.format_year_of_publication(year_of_publication) 
         self.master_title = master_title
-        self.access_date = self.get_date()
 
-    def in_text(self):
-            return '({author}, {year})'.format(author=self.master_title if self.author == None else self.author.get_intext_name(),year=self.year_of_publication)
+    __setattr__ = _set_once
+
+    @classmethod
+    def get_slots(cls):
+        '''
+        Returns a tuple of the names of every field of the class, 
+        parent classes first. 
+        '''
+        if '_all_slots' not in cls.__dict__:
+            names = []
+            for klass in reversed(cls.__mro__):
+                for name in klass.__dict__.get('__slots__', ()):
+                    if name not in names and not name.startswith('__'):
+                        names.append(name)
+            type.__setattr__(cls, '_all_slots', tuple(names))
+            # reads every field in one C call, see get_values()
+            type.__setattr__(cls, '_all_values', attrgetter(*names))
+        return cls._all_slots
+
+    def get_values(self):
+        '''
+        Returns a tuple of the values of every field, 
+        in the order of get_slots(). 
+        '''
+        getter = type(self).__dict__.get('_all_values')
+        if getter == None:
+            self.get_slots()
+            getter = type(self)._all_values
+        try:
+            return getter(self)
+        except AttributeError:
+            # a field that was never set
+            return tuple([getattr(self, name, None) for name in self.get_slots()])
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.get_values() == other.get_values()
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.get_values()))
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(name, value) for name, value in zip(self.get_slots(), self.get_values())))
+
+    MONTH = MONTH
+
+    @property
+    def access_date(self):
+        return self.get_date()
+
+    # Harvard layout of the end-text citation, see templates.py
+    TEMPLATE = None
+
+    def template_fields(self, context):
+        '''
+        Returns a dict with the values of the fields used in TEMPLATE.
+
+        input : 
+            context -> RenderContext object 
+        '''
+        return {'year': self.year_of_publication, 'master_title': self.master_title}
+
+    def end_text(self, markup='text', context=None, year_suffix=''):
+        '''
+        Returns the end-text citation. 
+
+        input : 
+            markup      -> 'text', 'html', 'markdown' or 'rtf' 
+                           titles are in italics for every markup but 'text'
+            context     -> RenderContext object shared by a batch, or None (today)
+            year_suffix -> str added to the year, eg 'a' for 2019a
+        '''
+        if context == None:
+            context = RenderContext()
+        if self.TEMPLATE == None:
+            raise NotImplementedError('{} has no end-text layout'.format(type(self).__name__))
+        fields = self.template_fields(context)
+        if year_suffix:
+            fields['year'] = '{}{}'.format(fields['year'], year_suffix)
+        return compile_template(self.TEMPLATE, markup)(fields)
+
+    def in_text(self, year_suffix=''):
+            return '({author}, {year}{suffix})'.format(author=self.master_title if self.author == None else self.author.get_intext_name(),year=self.year_of_publication,suffix=year_suffix)
 
     @staticmethod
     def get_date():
@@ -162,6 +292,8 @@ class Citation:
         '''
         if isinstance(number,int):
             number = str(number)
+        if number in ORDINALS:
+            return ORDINALS[number]
 
         if number[-1] == 1 or number[-1] == '1':
             if number == 11 or number =='11':
@@ -207,6 +339,12 @@ class Citation:
             return 'n.d.'
         else :
             return year
+
+# ordinals of the usual days and editions, filled once at import
+ORDINALS = {}
+ORDINALS.update({str(n): Citation.position(str(n)) for n in range(1, 101)})
+
+
 class Online(Citation):
     '''
     Citation for general online sources (with/without author(s)). 
@@ -224,21 +362,26 @@ class Online(Citation):
             article_title        -> str
             url                  -> str
     '''
+    __slots__ = ('website_name', 'article_title', 'url')
+
     def __init__(self, author, year_of_publication, website_name, article_title, url):
         Citation.__init__(self, author, website_name, year_of_publication)
         self.website_name = website_name
         self.article_title = article_title
         self.url = url
 
-    def in_text(self):
-        return '({author}, {year})'.format(author=self.website_name if self.author == None else self.author.get_intext_name(),year=self.year_of_publication)
+    def in_text(self, year_suffix=''):
+        return '({author}, {year}{suffix})'.format(author=self.website_name if self.author == None else self.author.get_intext_name(),year=self.year_of_publication,suffix=year_suffix)
+
+    TEMPLATE = '{name}({year}) {article_title!i}. [Online] Available from: {url}. [Accessed:{accessed}].'
 
-    def end_text(self):
-        part_one = self.website_name+'. ' if self.author==None else self.author.get_endtext_name() 
-        part_two = '(n.d.) ' if self.year_of_publication==None else '({year}) '.format(year=self.year_of_publication)
-        part_three = '{title}. '.format(title=self.article_title)
-        part_four = '[Online] Available from: {url}. [Accessed:{date}].'.format(url=self.url,date=self.get_date().strftime('%d/%m/%Y'))
-        return part_one+part_two+part_three+part_four
+    def template_fields(self, context):
+        fields = Citation.template_fields(self, context)
+        fields['name'] = self.website_name+'. ' if self.author==None else self.author.get_endtext_name()
+        fields['article_title'] = self.article_title
+        fields['url'] = self.url
+        fields['accessed'] = context.accessed
+        return fields
 
 class Website(Online):
     '''
@@ -257,7 +400,7 @@ class Website(Online):
             article_title        -> str
             url                  -> str
     '''
-    pass
+    __slots__ = ()
 
 class Blog(Online):
     '''
@@ -276,6 +419,8 @@ class Blog(Online):
             blog_title           -> str
             url                  -> str
     '''
+    __slots__ = ()
+
     def __init__(self, author, year_of_publication, website_name, blog_title, url):
         Online.__init__(self, author, year_of_publication, website_name, blog_title, url)
 
@@ -296,17 +441,19 @@ class WebDocument(Online):
             article_title        -> str
             url                  -> str
     '''
+    __slots__ = ('month_of_publication',)
+
     def __init__(self, author, year_of_publication, month_of_publication, website_name ,article_title, url):
         Online.__init__(self, author, year_of_publication, website_name, article_title, url)
         self.month_of_publication = month_of_publication
     
-    def end_text(self):
-        part_one = self.website_name+'. ' if self.author==None else self.author.get_endtext_name() 
-        part_two = '({year}) '.format(year=self.year_of_publication)
-        part_three = '{title}. '.format(title=self.article_title)
-        part_four = '[Online] {month} {year}. Available from:{url}. [Accessed:{date}].'.format(url=self.url,date=self.get_date().strftime('%d/%m/%Y'),month=self.MONTH[self.month_of_publication],year=self.year_of_publication)
+    TEMPLATE = '{name}({year}) {article_title!i}. [Online] {month} {document_year}. Available from:{url}. [Accessed:{accessed}].'
 
-        return part_one+part_two+part_three+part_four
+    def template_fields(self, context):
+        fields = Online.template_fields(self, context)
+        fields['month'] = context.month[self.month_of_publication]
+        fields['document_year'] = self.year_of_publication
+        return fields
 
 class Journal(Citation):
     '''
@@ -327,6 +474,8 @@ class Journal(Citation):
             part_number          -> int 
             page                 -> None or int or tuple with 2 elements only
     '''
+    __slots__ = ('title_of_article', 'volume_number', 'part_number', 'page')
+
     def __init__(self, author, year_of_publication, title_of_article, title_of_journal, volume_number, part_number, page):
         Citation.__init__(self, author, title_of_journal, year_of_publication)
         self.title_of_article = title_of_article
@@ -334,28 +483,35 @@ class Journal(Citation):
         self.part_number = part_number
         self.page = '' if page ==None else self.format_page_num(page) 
 
-    def end_text(self):
-        part_one = '{name}'.format(name=self.author.get_endtext_name())
-        part_two = '(n.d.) ' if self.year_of_publication==None else '({year}) '.format(year=self.year_of_publication)
-        part_three = '{articletitle}. {journaltitle}. {vol} ({part}). p. {page}'.format(articletitle=self.title_of_article, journaltitle=self.master_title, vol=self.volume_number, part=self.part_number, page=self.page)
+    TEMPLATE = '{name}({year}) {title_of_article}. {master_title!i}. {volume_number} ({part_number}). p. {page}'
 
-        return part_one+part_two+part_three
+    def template_fields(self, context):
+        fields = Citation.template_fields(self, context)
+        fields['name'] = self.author.get_endtext_name()
+        fields['title_of_article'] = self.title_of_article
+        fields['volume_number'] = self.volume_number
+        fields['part_number'] = self.part_number
+        fields['page'] = self.page
+        return fields
 
-    def in_text(self):
-        return '({author}, {year})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication)
+    def in_text(self, year_suffix=''):
+        return '({author}, {year}{suffix})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication,suffix=year_suffix)
 
 class EJournal(Journal):
+    __slots__ = ('url',)
+
     def __init__(self, author, year_of_publication, title_of_article, title_of_journal, volume_number, part_number, page, url):
         Journal.__init__(self, author, year_of_publication, title_of_article, title_of_journal, volume_number, part_number, page)
         self.url = url
 
-    def end_text(self):
-        part_one = '{name}'.format(name=self.author.get_endtext_name())
-        part_two = '(n.d.) ' if self.year_of_publication==None else '({year}) '.format(year=self.year_of_publication)
-        part_three = '{articletitle}. {journaltitle}. {vol} ({part}). p. {page}.'.format(articletitle=self.title_of_article, journaltitle=self.master_title, vol=self.volume_number, part=self.part_number, page=self.page)
-        part_four = ' Available from:{url}. [Accessed: {date}]'.format(url=self.url,date=self.get_date().strftime('%d/%m/%Y'))
+    TEMPLATE = ('{name}({year}) {title_of_article}. {master_title!i}. {volume_number} ({part_number}). p. {page}.'
+                ' Available from:{url}. [Accessed: {accessed}]')
 
-        return part_one+part_two+part_three+part_four
+    def template_fields(self, context):
+        fields = Journal.template_fields(self, context)
+        fields['url'] = self.url
+        fields['accessed'] = context.accessed
+        return fields
 
 class Book(Citation):
     '''
@@ -375,6 +531,8 @@ class Book(Citation):
             place_of_publication -> str
             publisher            -> str
     '''
+    __slots__ = ('volume', 'edition', 'place_of_publication', 'publisher')
+
     def __init__(self, author, book_title, year_of_publication, volume, edition, place_of_publication, publisher):
         Citation.__init__(self,author, book_title, year_of_publication)
         self.volume = str(volume) if volume != None else None
@@ -382,20 +540,22 @@ class Book(Citation):
         self.place_of_publication = place_of_publication
         self.publisher = publisher
 
-    def end_text(self):
-        part_one = '{name}({year}) '.format(name=self.author.get_endtext_name(),year=self.year_of_publication)
-        part_two = '{booktitle}.'.format(booktitle=self.master_title)
-        part_three = '{volume}'.format(volume= '' if self.volume==None else ' Volume ' + self.volume + '. ')
-        part_four = '{edition}'.format(edition= '' if self.edition==None else ' ' + self.edition + ' edition. ' )
-        part_five = '{place}: {publisher}.'.format(place=self.place_of_publication,publisher=self.publisher)
+    TEMPLATE = '{name}({year}) {master_title!i}.{volume}{edition}{place_of_publication}: {publisher}.'
 
-        return part_one+part_two+part_three+part_four+part_five
+    def template_fields(self, context):
+        fields = Citation.template_fields(self, context)
+        fields['name'] = self.author.get_endtext_name()
+        fields['volume'] = '' if self.volume==None else ' Volume ' + self.volume + '. '
+        fields['edition'] = '' if self.edition==None else ' ' + self.edition + ' edition. '
+        fields['place_of_publication'] = self.place_of_publication
+        fields['publisher'] = self.publisher
+        return fields
 
-    def in_text(self):
+    def in_text(self, year_suffix=''):
         if len(self.author.list_o_names) < 4:
-            return Citation.in_text(self)
+            return Citation.in_text(self, year_suffix)
         else : 
-            return '({author}, {year})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication) # return -> name et al.
+            return '({author}, {year}{suffix})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication,suffix=year_suffix) # return -> name et al.
         
 class EBook(Book):
     '''
@@ -416,19 +576,20 @@ class EBook(Book):
             publisher            -> str
             url                  -> str
         '''
+    __slots__ = ('url',)
+
     def __init__(self, author, book_title, year_of_publication, volume, edition, place_of_publication, publisher, url):
         Book.__init__(self, author, book_title, year_of_publication, volume, edition, place_of_publication, publisher)
         self.url = url
 
-    def end_text(self):
-        part_one = '{name}({year}) '.format(name=self.author.get_endtext_name(),year=self.year_of_publication)
-        part_two = '{booktitle}. [Online]'.format(booktitle=self.master_title)
-        part_three = '{volume}'.format(volume= '' if self.volume==None else ' Volume ' + self.volume + '. ')
-        part_four = '{edition}'.format(edition= '' if self.edition==None else ' ' + self.edition + ' edition. ' )
-        part_five = '{place}: {publisher}. '.format(place=self.place_of_publication,publisher=self.publisher)
-        part_six = 'Available from:{url}. [Accessed: {date}]'.format(url=self.url, date=self.get_date().strftime('%d/%m/%Y'))
+    TEMPLATE = ('{name}({year}) {master_title!i}. [Online]{volume}{edition}{place_of_publication}: {publisher}. '
+                'Available from:{url}. [Accessed: {accessed}]')
 
-        return part_one+part_two+part_three+part_four+part_five+part_six
+    def template_fields(self, context):
+        fields = Book.template_fields(self, context)
+        fields['url'] = self.url
+        fields['accessed'] = context.accessed
+        return fields
 
 class Chapter(Book):
     '''
@@ -449,24 +610,25 @@ class Chapter(Book):
             place_of_publication -> str
             publisher            -> str
     '''
+    __slots__ = ('editors',)
+
     def __init__(self, author, book_title, editors, year_of_publication, volume, edition, place_of_publication, publisher):
         Book.__init__(self, author, book_title, year_of_publication, volume, edition, place_of_publication, publisher)
         self.editors = editors
     
-    def end_text(self):
-        part_one = '{name}({year}) '.format(name=self.author.get_endtext_name(),year=self.year_of_publication)
-        part_two = '{booktitle}. In: {editors} {amount}'.format(booktitle=self.master_title, editors=self.editors.get_endtext_name(), amount='(ed).' if len(self.editors) == 1 else '(eds).')
-        part_three = '{volume}'.format(volume= '' if self.volume==None else ' Volume ' + self.volume + '. ')
-        part_four = '{edition}'.format(edition= '' if self.edition==None else ' ' + self.edition + ' edition. ' )
-        part_five = '{place}: {publisher}.'.format(place=self.place_of_publication,publisher=self.publisher)
+    TEMPLATE = '{name}({year}) {master_title!i}. In: {editors} {amount}{volume}{edition}{place_of_publication}: {publisher}.'
 
-        return part_one+part_two+part_three+part_four+part_five
+    def template_fields(self, context):
+        fields = Book.template_fields(self, context)
+        fields['editors'] = self.editors.get_endtext_name()
+        fields['amount'] = '(ed).' if len(self.editors) == 1 else '(eds).'
+        return fields
 
-    def in_text(self):
+    def in_text(self, year_suffix=''):
         if len(self.author.list_o_names) < 4:
-            return Citation.in_text(self)
+            return Citation.in_text(self, year_suffix)
         else : 
-            return '({author}, {year})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication) # return -> name et al.
+            return '({author}, {year}{suffix})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication,suffix=year_suffix) # return -> name et al.
 
 class Encyclopedia(Chapter):
     '''
@@ -487,7 +649,7 @@ class Encyclopedia(Chapter):
             place_of_publication -> str
             publisher            -> str
     '''
-    pass
+    __slots__ = ()
 
 class Dictionary(Book):
     '''
@@ -506,23 +668,28 @@ class Dictionary(Book):
             place_of_publication -> str
             publisher            -> str
     '''
+    __slots__ = ()
+
     def __init__(self, author, dictionary_title, year_of_publication, volume, edition, place_of_publication, publisher):
         Book.__init__(self, author, dictionary_title, year_of_publication, volume, edition, place_of_publication, publisher)
 
-    def end_text(self):
-        part_one = '{name}{editor} ({year}) '.format(name=self.author.get_endtext_name() if self.author != None else self.master_title+'.',year=self.year_of_publication,editor='' if self.author == None else '(ed.) ' if len(self.author)==1 else '(eds.) ')
-        part_two = '{booktitle}.'.format(booktitle=self.master_title)
-        part_three = '{volume}'.format(volume= '' if self.volume==None else ' Volume ' + self.volume + '. ')
-        part_four = '{edition}'.format(edition= '' if self.edition==None else ' ' + self.edition + ' edition. ' )
-        part_five = '{place}: {publisher}.'.format(place=self.place_of_publication,publisher=self.publisher)
+    TEMPLATE = '{name}{editor} ({year}) {master_title!i}.{volume}{edition}{place_of_publication}: {publisher}.'
 
-        return part_one+part_two+part_three+part_four+part_five
+    def template_fields(self, context):
+        fields = Citation.template_fields(self, context)
+        fields['name'] = self.author.get_endtext_name() if self.author != None else self.master_title+'.'
+        fields['editor'] = '' if self.author == None else '(ed.) ' if len(self.author)==1 else '(eds.) '
+        fields['volume'] = '' if self.volume==None else ' Volume ' + self.volume + '. '
+        fields['edition'] = '' if self.edition==None else ' ' + self.edition + ' edition. '
+        fields['place_of_publication'] = self.place_of_publication
+        fields['publisher'] = self.publisher
+        return fields
 
-    def in_text(self):
+    def in_text(self, year_suffix=''):
         if self.author == None or len(self.author.list_o_names) < 4:
-            return Citation.in_text(self)
+            return Citation.in_text(self, year_suffix)
         else : 
-            return '({author}, {year})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication)
+            return '({author}, {year}{suffix})'.format(author=self.author.get_intext_name(source='journal'),year=self.year_of_publication,suffix=year_suffix)
 
 class Image(Online):
     '''
@@ -540,15 +707,12 @@ class Image(Online):
             desc_of_img          -> str
             url                  -> str
     '''    
+    __slots__ = ()
+
     def __init__(self, author, year_of_publication, website_name, desc_of_img, url):
         Online.__init__(self, author, year_of_publication, website_name, desc_of_img, url)
 
-    def end_text(self):
-        part_one = self.website_name+'. ' if self.author==None else self.author.get_endtext_name() 
-        part_two = '(n.d.) ' if self.year_of_publication==None else '({year}) '.format(year=self.year_of_publication)
-        part_three = '{title}. '.format(title=self.article_title)
-        part_four = '[Online Image] Available from:{url}. [Accessed:{date}].'.format(url=self.url,date=self.get_date().strftime('%d/%m/%Y'))
-        return part_one+part_two+part_three+part_four
+    TEMPLATE = '{name}({year}) {article_title!i}. [Online Image] Available from:{url}. [Accessed:{accessed}].'
 
 class Newspaper(Citation):
     '''
@@ -567,6 +731,8 @@ class Newspaper(Citation):
             month_of_publication -> int
             page                 -> int or None
     '''
+    __slots__ = ('article_title', 'day_of_publication', 'month_of_publication', 'page')
+
     def __init__(self, author, newspaper_title, year_of_publication, article_title, day_of_publication, month_of_publication, page):
         Citation.__init__(self, author, newspaper_title, year_of_publication)
         self.article_title = article_title
@@ -574,13 +740,16 @@ class Newspaper(Citation):
         self.month_of_publication = self.MONTH[month_of_publication]
         self.page = '' if page==None else  'p. ' +self.format_page_num(page)
 
-    def end_text(self):
-        part_one = '{name} '.format(name=self.master_title+'.' if self.author==None else self.author.get_endtext_name())
-        part_two = '(n.d.) ' if self.year_of_publication==None else '({year}) '.format(year=self.year_of_publication)
-        part_three = f'{self.article_title}. {self.master_title}. '
-        part_four = f'{self.day_of_publication} {self.month_of_publication}.{self.page}'
+    TEMPLATE = '{name} ({year}) {article_title}. {master_title!i}. {day_of_publication} {month_of_publication}.{page}'
 
-        return part_one + part_two + part_three + part_four
+    def template_fields(self, context):
+        fields = Citation.template_fields(self, context)
+        fields['name'] = self.master_title+'.' if self.author==None else self.author.get_endtext_name()
+        fields['article_title'] = self.article_title
+        fields['day_of_publication'] = self.day_of_publication
+        fields['month_of_publication'] = self.month_of_publication
+        fields['page'] = self.page
+        return fields
 
 class Video(WebDocument):
     '''
@@ -600,17 +769,18 @@ class Video(WebDocument):
             article_title        -> str
             url                  -> str
     '''
+    __slots__ = ('day_of_publication',)
+
     def __init__(self, author, year_of_publication, day_of_publication, month_of_publication, channel_name ,video_title, url):
         WebDocument.__init__(self, author, year_of_publication, month_of_publication, channel_name ,video_title, url)
         self.day_of_publication = self.position(day_of_publication)
 
-    def end_text(self):
-        part_one = self.website_name+'. ' if self.author==None else self.author.get_endtext_name() 
-        part_two = '({year}) '.format(year=self.year_of_publication)
-        part_three = '{title}. '.format(title=self.article_title)
-        part_four = '[Online Video] {day} {month}. Available from:{url}. [Accessed:{date}].'.format(url=self.url,date=self.get_date().strftime('%d/%m/%Y'),month=self.MONTH[self.month_of_publication],day=self.day_of_publication)
+    TEMPLATE = '{name}({year}) {article_title!i}. [Online Video] {day} {month}. Available from:{url}. [Accessed:{accessed}].'
 
-        return part_one+part_two+part_three+part_four
+    def template_fields(self, context):
+        fields = WebDocument.template_fields(self, context)
+        fields['day'] = self.day_of_publication
+        return fields
 
 class Thesis(Citation):
     '''
@@ -630,6 +800,8 @@ class Thesis(Citation):
         location            -> str
         university          -> str
     '''
+    __slots__ = ('degree_statement', 'degree_awarding_body', 'location', 'university')
+
     def __init__(self, author, year_of_publication, thesis_title, degree_statement, degree_awarding_body, location, university):
         Citation.__init__(self, author,thesis_title, year_of_publication)
         self.degree_statement = degree_statement
@@ -637,12 +809,16 @@ class Thesis(Citation):
         self.location = location
         self.university = university
 
-    def end_text(self):
-        part_one = f'{self.author.get_endtext_name} ({self.year_of_publication}) '
-        part_two = f'{self.master_title}. {self.degree_statement}. {self.degree_awarding_body}. '
-        part_three = f'{self.location}: {self.university}'
+    TEMPLATE = '{name}({year}) {master_title!i}. {degree_statement}. {degree_awarding_body}. {location}: {university}'
 
-        return part_one+part_two+part_three
+    def template_fields(self, context):
+        fields = Citation.template_fields(self, context)
+        fields['name'] = self.author.get_endtext_name()
+        fields['degree_statement'] = self.degree_statement
+        fields['degree_awarding_body'] = self.degree_awarding_body
+        fields['location'] = self.location
+        fields['university'] = self.university
+        return fields
 
         
 if __name__ == '__main__':
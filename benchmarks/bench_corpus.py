@@ -0,0 +1,85 @@
+'''
+Open time and lookups of a memory mapped corpus, against building
+the same citations again from their JSONL rows.
+
+Writes a corpus of generated records (every citation type), opens
+it in a fresh process (nothing in the page cache of Python) and
+looks up random keys. Several worker processes then open the same
+file : the pages are shared, not copied.
+
+    python benchmarks/bench_corpus.py [records] [lookups] [workers]
+'''
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from bibliography import build_citation
+from corpus import Corpus, CorpusWriter
+from suite import corpus as rows
+
+OPEN = '''
+import sys, time
+sys.path.insert(0, {root!r})
+from corpus import Corpus
+start = time.perf_counter()
+corpus = Corpus({path!r})
+opened = time.perf_counter()
+corpus[{key!r}]
+print(opened - start, time.perf_counter() - opened)
+'''
+
+
+def lookups(path, keys):
+    corpus = Corpus(path)
+    start = time.perf_counter()
+    for key in keys:
+        corpus[key]
+    return time.perf_counter() - start
+
+
+def main(count=10 ** 6, count_lookups=10 ** 5, workers=4):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench.corpus')
+    start = time.perf_counter()
+    with CorpusWriter(path) as writer:
+        for i, row in enumerate(rows(count)):
+            writer.add(str(i), build_citation(row))
+    print('write    {:10.1f} s    {:.0f} bytes/record'.format(time.perf_counter() - start,
+                                                             os.path.getsize(path) / count))
+
+    opened, first = map(float, subprocess.run(
+        [sys.executable, '-c', OPEN.format(root=ROOT, path=path, key=str(count // 2))],
+        capture_output=True, text=True, check=True).stdout.split())
+    print('open     {:10.3f} ms   first lookup {:.3f} ms'.format(opened * 1e3, first * 1e3))
+
+    keys = [str(random.randrange(count)) for _ in range(count_lookups)]
+    seconds = lookups(path, keys)
+    print('lookup   {:10.2f} us   {:.0f} lookups/s'.format(seconds / count_lookups * 1e6, count_lookups / seconds))
+
+    sample = [row for _, row in zip(range(count_lookups), rows(count))]
+    lines = [json.dumps(row) for row in sample]
+    start = time.perf_counter()
+    for line in lines:
+        build_citation(json.loads(line))
+    seconds = time.perf_counter() - start
+    print('rebuild  {:10.2f} us   json.loads + build_citation per record'.format(seconds / count_lookups * 1e6))
+
+    with multiprocessing.Pool(workers) as pool:
+        start = time.perf_counter()
+        pool.starmap(lookups, [(path, keys)] * workers)
+        seconds = time.perf_counter() - start
+    print('{} workers {:8.0f} lookups/s'.format(workers, workers * count_lookups / seconds))
+    os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
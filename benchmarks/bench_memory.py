@@ -0,0 +1,81 @@
+'''
+Memory used per citation record, measured with tracemalloc.
+
+Builds a batch of Journal records the way Bibliography does, with
+author lists drawn from a small pool so that interned Names are
+shared between records. The same records are also measured in the
+layout they had before the classes were slotted (baseline) : every
+field in an instance __dict__, and an author list of its own for
+every record.
+
+    python benchmarks/bench_memory.py [records]
+'''
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bibliography import build_citation
+
+
+def make_rows(count, authors=1000):
+    for i in range(count):
+        yield {
+            'type': 'journal',
+            'author': 'Given{0} Surname{0}; Other{0} Person{0}'.format(i % authors),
+            'year_of_publication': 1990 + i % 30,
+            'title_of_article': 'Article {}'.format(i),
+            'title_of_journal': 'Journal {}'.format(i % 50),
+            'volume_number': i % 40,
+            'part_number': i % 4,
+            'page': (i % 300, i % 300 + 12),
+        }
+
+
+class DictNames:
+    '''
+    Names as it was stored before : a list of its own and the parse
+    cache in an instance __dict__.
+    '''
+    def __init__(self, names):
+        self.list_o_names = list(names)
+        self._parsed = None
+
+
+class DictRecord:
+    '''
+    A record as it was stored before : the same field values in an
+    instance __dict__.
+    '''
+    def __init__(self, citation):
+        self.__dict__.update(zip(citation.get_slots(), citation.get_values()))
+        self.author = DictNames(citation.author.list_o_names)
+
+
+def measure(rows, build):
+    '''
+    Returns the bytes per record allocated by building every row.
+    '''
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(row) for row in rows]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(records)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = list(make_rows(count))
+    # the baseline record is the only one kept, its author list is parsed again for every row
+    baseline = measure(rows, lambda row: DictRecord(build_citation(row)))
+    slotted = measure(rows, build_citation)
+    print('{} records'.format(count))
+    print('baseline (__dict__, own author lists) : {:.1f} bytes per record'.format(baseline))
+    print('slotted (interned Names)              : {:.1f} bytes per record'.format(slotted))
+    print('{:.1f}x smaller'.format(baseline / slotted))
+
+
+if __name__ == '__main__':
+    main()
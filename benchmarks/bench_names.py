@@ -0,0 +1,82 @@
+'''
+Benchmark of Names formatting against the number of authors.
+
+Compares the current Names (names parsed once and cached) with the
+previous implementation, which split every name again on every
+loop iteration and so was quadratic in the number of authors.
+
+    python benchmarks/bench_names.py
+'''
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from CLI_approach import Names
+
+
+class LegacyNames(Names):
+    '''
+    Names formatting as it was before the parse cache. 
+    Only kept here to measure the difference.
+    '''
+    def get_famname(self):
+        return [names.split(' ')[-1] for names in self.list_o_names]
+
+    def get_initials(self):
+        return [''.join('{}.'.format(x[0]) for x in names.split(' ')[:-1]) for names in self.list_o_names]
+
+    def get_endtext_name(self):
+        final = ''
+        if len(self.get_famname()) == 1 :
+            final += '{surname}, {initial} '.format(surname=self.get_famname()[0], initial=self.get_initials()[0])
+        elif len(self.get_famname()) > 1:
+            for i in range(len(self.get_famname())):
+                final += '{surname}, {initial} '.format(surname=self.get_famname()[i], initial=self.get_initials()[i])
+                if i < len(self.get_famname()) - 2  : 
+                    final += ', '
+                elif i == len(self.get_famname()) - 2 :
+                    final += 'and '
+        return final
+
+    def get_intext_name(self, source=None):
+        final = ''
+        if len(self.get_famname()) == 1 :
+            final += '{surname}'.format(surname=self.get_famname()[0])
+        elif len(self.get_famname()) > 1:
+            for i in range(len(self.get_famname())):
+                final += '{surname}'.format(surname=self.get_famname()[i])
+                if i < len(self.get_famname()) - 2  : 
+                    final += ', '
+                elif i == len(self.get_famname()) - 2 :
+                    final += ' and '
+        return final
+
+
+def make_authors(count):
+    return ['Given{0} Middle{0} Surname{0}'.format(i) for i in range(count)]
+
+
+def bench(cls, authors, repeat):
+    def run():
+        names = cls(authors)
+        names.get_endtext_name()
+        names.get_intext_name()
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main():
+    print('{:>8} {:>14} {:>14} {:>8}'.format('authors', 'legacy (ms)', 'cached (ms)', 'speedup'))
+    for count in (1, 10, 50, 100, 250, 500):
+        authors = make_authors(count)
+        assert LegacyNames(authors).get_endtext_name() == Names(authors).get_endtext_name()
+        assert LegacyNames(authors).get_intext_name() == Names(authors).get_intext_name()
+        repeat = 5 if count > 100 else 20
+        legacy = bench(LegacyNames, authors, repeat) * 1000
+        cached = bench(Names, authors, repeat) * 1000
+        print('{:>8} {:>14.3f} {:>14.3f} {:>7.1f}x'.format(count, legacy, cached, legacy / cached))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+Requests per second of the Resolver against a local stub server.
+
+The stub answers every /works/<id> with a CSL-JSON item over
+keep-alive HTTP/1.1 connections, after an optional delay that stands
+for the network. The second run is served from the response cache.
+
+    python benchmarks/bench_resolver.py [lookups] [concurrency] [delay ms]
+'''
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bibliography import build_citation
+from resolver import Resolver
+
+
+def stub_item(identifier):
+    number = int(identifier.rsplit('.', 1)[-1])
+    return {'type': 'article-journal', 'title': 'Article {}'.format(number),
+            'container-title': 'Journal {}'.format(number % 50),
+            'author': [{'given': 'Given{}'.format(number), 'family': 'Surname{}'.format(number)}],
+            'issued': {'date-parts': [[1990 + number % 30]]},
+            'volume': str(number % 40), 'issue': str(number % 4 + 1), 'page': '1-12',
+            'URL': 'https://doi.org/10.5555/bench.{}'.format(number)}
+
+
+async def serve(delay):
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                if delay:
+                    await asyncio.sleep(delay)
+                path = line.split()[1].decode()
+                body = json.dumps(stub_item(path.rsplit('/', 1)[-1].replace('%2F', '/'))).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                             b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    return await asyncio.start_server(handle, '127.0.0.1', 0)
+
+
+async def run(lookups, concurrency, delay):
+    server = await serve(delay)
+    port = server.sockets[0].getsockname()[1]
+    identifiers = ['10.5555/bench.{}'.format(i) for i in range(lookups)]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, 'responses.db')
+        for label in ('network', 'cache'):
+            resolver = Resolver('http://127.0.0.1:{}/works/{{id}}'.format(port), concurrency=concurrency,
+                                per_host=concurrency, cache=cache)
+            start = time.perf_counter()
+            count = 0
+            async for _, row, _ in resolver.resolve(identifiers):
+                build_citation(row)
+                count += 1
+            seconds = time.perf_counter() - start
+            print('{:8} {} lookups in {:.2f}s : {:.0f} lookups/s, {} requests, {} connections, {} cache hits'.format(
+                label, count, seconds, count / seconds, resolver.stats['requests'],
+                resolver.pool.opened, resolver.stats['cache_hits']))
+            resolver.close()
+    server.close()
+    await server.wait_closed()
+
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    delay = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+    asyncio.run(run(lookups, concurrency, delay))
+
+
+if __name__ == '__main__':
+    main()
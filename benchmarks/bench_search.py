@@ -0,0 +1,132 @@
+'''
+Query latency of the search index on a generated bibliography.
+
+Titles are drawn from a vocabulary of made up words with a Zipf
+distribution (a few very common words, a long tail of rare ones),
+authors from a pool of surnames, so postings look like the ones of
+a real bibliography. Queries are built from records of the index :
+surname, surname prefix, title words, surname and year, misspelt
+surname and title words with the last one being typed.
+
+    python benchmarks/bench_search.py [records] [queries per kind]
+
+The target is a p99 under TARGET_MS for every kind of query, the
+kinds missing it are listed at the end.
+'''
+import gc
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bibliography import build_citation
+from search import SearchIndex
+
+TARGET_MS = 1.0
+
+CONSONANTS = ('b', 'c', 'd', 'f', 'g', 'h', 'k', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'w', 'br', 'ch', 'st', 'tr')
+VOWELS = ('a', 'e', 'i', 'o', 'u', 'ou', 'ea')
+CODAS = ('', '', '', 'n', 'r', 's', 'l', 'nd', 'rt', 'st')
+
+
+def make_words(count, rng):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) + rng.choice(CODAS)
+                          for _ in range(rng.randint(2, 3))))
+    return sorted(words)
+
+
+def make_rows(count, rng):
+    vocabulary = make_words(40000, rng)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    surnames = [word.capitalize() for word in make_words(30000, rng)]
+    publishers = ['{} Press'.format(word.capitalize()) for word in make_words(500, rng)]
+    for i in range(count):
+        authors = '; '.join('{} {}'.format(rng.choice('ABCDEFGHJKLMNPRSTW'), rng.choice(surnames))
+                            for _ in range(rng.randint(1, 3)))
+        title = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(3, 8))).capitalize()
+        year = rng.randint(1950, 2025)
+        if i % 2:
+            yield {'type': 'journal', 'author': authors, 'year_of_publication': year, 'title_of_article': title,
+                   'title_of_journal': 'Journal of {}'.format(rng.choice(vocabulary[:300]).capitalize()),
+                   'volume_number': rng.randint(1, 60), 'part_number': rng.randint(1, 4), 'page': '1-10'}
+        else:
+            yield {'type': 'book', 'author': authors, 'book_title': title, 'year_of_publication': year,
+                   'edition': rng.randint(1, 4), 'place_of_publication': 'London',
+                   'publisher': rng.choice(publishers)}
+
+
+def typo(word, rng):
+    i = rng.randrange(1, len(word))
+    return word[:i] + rng.choice('aeioukst') + word[i + 1:]
+
+
+def queries(index, kind, count, rng):
+    numbers = list(index.records)
+    for _ in range(count):
+        citation = index[rng.choice(numbers)]
+        surname = citation.author.get_famname()[0].lower()
+        title = (getattr(citation, 'title_of_article', None) or citation.master_title).lower().split()
+        if kind == 'surname':
+            yield surname
+        elif kind == 'surname prefix':
+            yield surname[:4]
+        elif kind == 'title words':
+            yield ' '.join(rng.sample(title, 2))
+        elif kind == 'surname year':
+            yield '{} {}'.format(surname, citation.year_of_publication)
+        elif kind == 'misspelt surname':
+            yield typo(surname, rng)
+        else:
+            yield '{} {}'.format(title[0], title[-1][:3])
+
+
+def main(count=10 ** 6, per_kind=1000):
+    rng = random.Random(1)
+    citations = [build_citation(row) for row in make_rows(count, rng)]
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.update(citations)
+    seconds = time.perf_counter() - start
+    # keeps full collections from walking the index during the queries
+    gc.freeze()
+    print('{} records indexed in {:.1f} s ({:.1f} us/record), {} words'.format(
+        count, seconds, seconds / count * 1e6, len(index.postings)))
+
+    missed = []
+    for kind in ('surname', 'surname prefix', 'title words', 'surname year', 'misspelt surname', 'title + prefix'):
+        times = []
+        hits = 0
+        for query in queries(index, kind, per_kind, rng):
+            start = time.perf_counter()
+            found = index.search(query, k=10)
+            times.append(time.perf_counter() - start)
+            hits += bool(found)
+        times.sort()
+        print('{:18} p50 {:7.3f} ms  p99 {:7.3f} ms  max {:7.3f} ms  {:.0%} with results'.format(
+            kind, statistics.median(times) * 1e3, times[int(len(times) * 0.99)] * 1e3, times[-1] * 1e3,
+            hits / per_kind))
+        if times[int(len(times) * 0.99)] * 1e3 > TARGET_MS:
+            missed.append(kind)
+    print('p99 target of {} ms missed by : {}'.format(TARGET_MS, ', '.join(missed)) if missed else
+          'p99 target of {} ms met by every kind'.format(TARGET_MS))
+
+    numbers = rng.sample(list(index.records), per_kind)
+    start = time.perf_counter()
+    for number in numbers:
+        index.remove(number)
+    removed = time.perf_counter() - start
+    start = time.perf_counter()
+    for number in numbers:
+        index.add(citations[number])
+    added = time.perf_counter() - start
+    print('remove {:.1f} us/record, add {:.1f} us/record'.format(removed / per_kind * 1e6, added / per_kind * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,72 @@
+'''
+Throughput and latency of the RenderService.
+
+Starts the service in process and sends single record requests from
+many concurrent keep-alive clients, then prints the requests per
+second and the service's own /stats.
+
+    python benchmarks/bench_service.py [requests] [clients]
+'''
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from service import RenderService
+
+
+def make_row(i):
+    return {
+        'type': 'journal',
+        'author': 'Given{0} Surname{0}; Other{0} Person{0}'.format(i % 1000),
+        'year_of_publication': 1990 + i % 30,
+        'title_of_article': 'Article {}'.format(i),
+        'title_of_journal': 'Journal {}'.format(i % 50),
+        'volume_number': i % 40,
+        'part_number': i % 4,
+        'page': '{}-{}'.format(i % 300, i % 300 + 12),
+    }
+
+
+async def client(port, numbers):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for i in numbers:
+        body = json.dumps(make_row(i)).encode()
+        writer.write(b'POST /render HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n'
+                     b'Content-Length: ' + str(len(body)).encode() + b'\r\n\r\n' + body)
+        await reader.readline()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b'\r\n':
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+    writer.close()
+
+
+async def run(requests, clients):
+    service = await RenderService(port=0).start()
+    start = time.perf_counter()
+    await asyncio.gather(*[client(service.port, range(c, requests, clients)) for c in range(clients)])
+    seconds = time.perf_counter() - start
+    stats = service.stats()
+    print('{} requests from {} clients in {:.2f}s : {:.0f} requests/s'.format(
+        requests, clients, seconds, requests / seconds))
+    print('batches {batches}, mean batch {mean_batch:.1f} rows'.format(**stats))
+    print('latency ms : p50 {p50:.2f}  p90 {p90:.2f}  p99 {p99:.2f}  max {max:.2f}'.format(**stats['latency_ms']))
+    await service.close()
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    asyncio.run(run(requests, clients))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+'''
+Startup time of the harvard-ref command line.
+
+Runs each command many times in a new interpreter and prints the
+median wall time, next to a bare interpreter for reference. Byte
+code is written to a temporary cache first, as it is once the
+package is installed.
+
+    python benchmarks/bench_startup.py [runs]
+'''
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CLI = os.path.join(ROOT, 'cli.py')
+RECORD = (b'{"type": "website", "author": "John Smith", "year_of_publication": 2019, '
+          b'"website_name": "Site", "article_title": "Title", "url": "http://x"}\n')
+
+
+def median_ms(command, runs, env, stdin=b''):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, input=stdin, stdout=subprocess.DEVNULL, env=env, check=True)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return 1000 * times[len(times) // 2]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    with tempfile.TemporaryDirectory() as cache:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=cache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        commands = [
+            ('python -c pass', [sys.executable, '-c', 'pass'], b''),
+            ('harvard-ref --help', [sys.executable, CLI, '--help'], b''),
+            ('harvard-ref < 1 record', [sys.executable, CLI], RECORD),
+            ('harvard-ref < 100 records', [sys.executable, CLI], RECORD * 100),
+        ]
+        # warm up : fills the byte code cache
+        for _, command, stdin in commands:
+            median_ms(command, 1, env, stdin)
+        base = None
+        for label, command, stdin in commands:
+            ms = median_ms(command, runs, env, stdin)
+            base = ms if base == None else base
+            print('{:28} {:6.1f} ms   (+{:.1f} ms over the interpreter)'.format(label, ms, ms - base))
+
+
+if __name__ == '__main__':
+    main()
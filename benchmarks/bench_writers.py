@@ -0,0 +1,48 @@
+'''
+Time and peak memory of writing a sorted reference list as HTML and
+DOCX. Every run is a fresh process, citations are generated one at
+a time : the peak memory should not grow with the number of entries
+beyond the memory budget of the sort.
+
+    python benchmarks/bench_writers.py [records] [memory budget in MB]
+'''
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bibliography import build_citation
+from suite import corpus
+from writers import write_document
+
+
+def run(count, budget, suffix):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'references' + suffix)
+    start = time.perf_counter()
+    write_document((build_citation(row) for row in corpus(count)), path, memory_budget=budget * 1024 * 1024)
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(path)
+    os.remove(path)
+    os.rmdir(directory)
+    # kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print('{:5} {:8} entries {:7.1f} s  {:6.1f} us/entry  {:7.1f} MB file  peak {:6.1f} MB'.format(
+        suffix[1:], count, seconds, seconds / count * 1e6, size / 1e6, peak))
+
+
+def main(count=500000, budget=16):
+    for suffix in ('.html', '.docx'):
+        for size in (count // 10, count):
+            subprocess.run([sys.executable, __file__, str(size), str(budget), suffix], check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4:
+        run(int(sys.argv[1]), int(sys.argv[2]), sys.argv[3])
+    else:
+        main(*[int(arg) for arg in sys.argv[1:]])
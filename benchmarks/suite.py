@@ -0,0 +1,224 @@
+'''
+Benchmark suite of the formatting hot paths.
+
+    end_text.<type> / in_text.<type>   one call, for every citation class
+    names.build.<n> / names.endtext.<n> / names.intext.<n>
+                                       Names of 1 to 1000 authors
+    bulk.<n>                           build + end_text + in_text of a
+                                       generated corpus of 10^3 to 10^6 records
+
+Results are written as JSON so two revisions can be compared :
+
+    python benchmarks/suite.py run -o base.json            (on the old revision)
+    python benchmarks/suite.py run -o head.json            (on the new one)
+    python benchmarks/suite.py compare base.json head.json
+
+compare exits with status 1 when a benchmark got slower than the
+threshold (10% by default). run -k <text> only runs the benchmarks
+whose name contains the text, --quick stops the corpora at 10^4.
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from CLI_approach import Names, RenderContext
+from bibliography import TYPES, build_citation, get_fields
+
+AUTHOR_COUNTS = (1, 10, 100, 1000)
+CORPUS_SIZES = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+REPEAT = 5
+
+
+def field_value(field, i):
+    '''
+    Returns a generated value of a row field for record number i.
+    '''
+    if field == 'author':
+        return 'Given{0} Surname{0}; Other{0} Person{0}'.format(i % 1000)
+    if field == 'editors':
+        return 'Editor{0} Person{0}'.format(i % 100)
+    if field == 'year_of_publication':
+        return 1990 + i % 30
+    if field == 'month_of_publication':
+        return 1 + i % 12
+    if field == 'day_of_publication':
+        return 1 + i % 28
+    if field in ('volume_number', 'part_number', 'volume'):
+        return 1 + i % 40
+    if field == 'edition':
+        return 1 + i % 5
+    if field == 'page':
+        return '{}-{}'.format(i % 300, i % 300 + 12)
+    if field == 'url':
+        return 'https://example.org/{}'.format(i)
+    return '{} {}'.format(field.replace('_', ' ').capitalize(), i)
+
+
+def make_row(kind, i):
+    row = {'type': kind}
+    for field in get_fields(TYPES[kind]):
+        row[field] = field_value(field, i)
+    return row
+
+
+def corpus(size):
+    '''
+    Yields size rows, every citation type in turn.
+    '''
+    kinds = list(TYPES)
+    for i in range(size):
+        yield make_row(kinds[i % len(kinds)], i)
+
+
+def author_list(count):
+    return ['Given{0} Middle{0} Surname{0}'.format(i) for i in range(count)]
+
+
+def time_call(function, repeat=REPEAT):
+    '''
+    Returns the seconds per call of each repeat, timeit picks the
+    number of calls so that a repeat takes at least 0.2 s.
+    '''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return [total / number for total in timer.repeat(repeat, number)]
+
+
+def micro_benchmarks(context):
+    '''
+    Yields (name, function) of the one call benchmarks.
+    '''
+    for kind in TYPES:
+        citation = build_citation(make_row(kind, 7))
+        yield 'end_text.' + kind, lambda citation=citation: citation.end_text('text', context)
+        yield 'in_text.' + kind, citation.in_text
+
+    for count in AUTHOR_COUNTS:
+        names = author_list(count)
+        # a new object every call, so the parse cache of Names is not reused
+        yield 'names.build.{}'.format(count), lambda names=names: Names(names).get_parsed()
+        yield 'names.endtext.{}'.format(count), lambda names=names: Names(names).get_endtext_name()
+        yield 'names.intext.{}'.format(count), lambda names=names: Names(names).get_intext_name()
+
+
+def bulk(size, context):
+    '''
+    Returns the seconds taken to build and render a generated corpus.
+    '''
+    rows = corpus(size)
+    start = time.perf_counter()
+    for row in rows:
+        citation = build_citation(row)
+        citation.end_text('text', context)
+        citation.in_text()
+    return time.perf_counter() - start
+
+
+def summary(times, unit):
+    return {
+        'unit': unit,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'repeat': len(times),
+    }
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    context = RenderContext()
+    results = {}
+    for name, function in micro_benchmarks(context):
+        if args.k and args.k not in name:
+            continue
+        results[name] = summary(time_call(function), 's/call')
+        print('{:28} {:12.3f} us'.format(name, results[name]['median'] * 1e6), flush=True)
+
+    for size in CORPUS_SIZES:
+        name = 'bulk.{}'.format(size)
+        if args.k and args.k not in name or args.quick and size > 10 ** 4:
+            continue
+        # the biggest corpora take seconds, fewer repeats are enough
+        times = [bulk(size, context) / size for _ in range(REPEAT if size <= 10 ** 4 else 1 if size >= 10 ** 6 else 3)]
+        results[name] = summary(times, 's/record')
+        print('{:28} {:12.0f} records/s'.format(name, 1 / results[name]['median']), flush=True)
+
+    report = {
+        'meta': {
+            'revision': revision(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'system': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            json.dump(report, out, indent=1, sort_keys=True)
+            out.write('\n')
+    return 0
+
+
+def compare(args):
+    '''
+    Prints the ratio of every benchmark of two runs (head / base, on
+    the medians), returns 1 if one is slower than the threshold.
+    '''
+    with open(args.base, encoding='utf-8') as base_file, open(args.head, encoding='utf-8') as head_file:
+        base, head = json.load(base_file), json.load(head_file)
+    print('base {} , head {}'.format((base['meta']['revision'] or '?')[:10], (head['meta']['revision'] or '?')[:10]))
+    regressions = 0
+    for name in sorted(set(base['results']) | set(head['results'])):
+        if name not in base['results'] or name not in head['results']:
+            print('{:28} {}'.format(name, 'only in base' if name in base['results'] else 'only in head'))
+            continue
+        before, after = base['results'][name]['median'], head['results'][name]['median']
+        ratio = after / before
+        mark = ''
+        if ratio > args.threshold:
+            mark = 'SLOWER'
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            mark = 'faster'
+        print('{:28} {:12.4g} {:12.4g} {:7.2f}x  {}'.format(name, before, after, ratio, mark))
+    print('{} regression(s) over {:.0%}'.format(regressions, args.threshold - 1))
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark suite of the formatting hot paths.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', help='JSON file receiving the results')
+    run_parser.add_argument('-k', help='only run benchmarks whose name contains this text')
+    run_parser.add_argument('--quick', action='store_true', help='corpora up to 10^4 records only')
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=1.10,
+                                help='ratio over which a benchmark is a regression (default 1.10)')
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import csv
+import json
+import os
+import sys
+
+from CLI_approach import (RenderContext, Names, Online, Website, Blog, WebDocument, Journal, EJournal,
+                          Book, EBook, Chapter, Encyclopedia, Dictionary, Image,
+                          Newspaper, Video, Thesis)
+
+# value of the `type` column -> citation class
+TYPES = {
+    'online'      : Online,
+    'website'     : Website,
+    'blog'        : Blog,
+    'webdocument' : WebDocument,
+    'journal'     : Journal,
+    'ejournal'    : EJournal,
+    'book'        : Book,
+    'ebook'       : EBook,
+    'chapter'     : Chapter,
+    'encyclopedia': Encyclopedia,
+    'dictionary'  : Dictionary,
+    'image'       : Image,
+    'newspaper'   : Newspaper,
+    'video'       : Video,
+    'thesis'      : Thesis,
+}
+
+NAME_FIELDS = ('author', 'editors')
+INT_FIELDS = ('year_of_publication', 'month_of_publication', 'day_of_publication',
+              'volume_number', 'part_number', 'volume', 'edition')
+NAME_SEPARATOR = ';'
+
+
+def get_fields(cls):
+    '''
+    Returns a tuple of the constructor argument names of a
+    citation class, in order.
+
+    eg : get_fields(Website) -> ('author', 'year_of_publication', ...)
+    '''
+    # __wrapped__ : the constructor may be wrapped by instrument.py
+    code = getattr(cls.__init__, '__wrapped__', cls.__init__).__code__
+    return code.co_varnames[1:code.co_argcount]
+
+
+def parse_names(value):
+    '''
+    Returns the shared (interned) Names object of a row value,
+    or None if empty.
+
+    input :
+        value -> str with names separated by ';' or list of str
+    '''
+    if value == None or value == '' or value == []:
+        return None
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(NAME_SEPARATOR) if name.strip()]
+    return Names.intern(list(value))
+
+
+def parse_page(value):
+    '''
+    Returns the page as expected by Citation.format_page_num.
+
+    input :
+        value -> '12' , '12-15' , int or list of 2 elements
+    '''
+    if value == None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(int(x) for x in value)
+    if '-' in value:
+        start, to = value.split('-', 1)
+        return (int(start), int(to))
+    return int(value)
+
+
+def build_citation(row):
+    '''
+    Returns the citation object described by a row.
+    The `type` key picks the class, the other keys are the
+    constructor arguments of that class.
+
+    Raises KeyError for an unknown type and ValueError/TypeError
+    for badly formed values.
+    '''
+    kind = (row.get('type') or '').strip().lower()
+    if kind not in TYPES:
+        raise KeyError('unknown citation type {!r}'.format(row.get('type')))
+    cls = TYPES[kind]
+
+    args = []
+    for field in get_fields(cls):
+        value = row.get(field)
+        if value == '':
+            value = None
+        if field in NAME_FIELDS:
+            value = parse_names(value)
+        elif field in INT_FIELDS and value != None:
+            value = int(value)
+        elif field == 'page':
+            value = parse_page(value)
+        args.append(value)
+    return cls(*args)
+
+
+def render_row(row, context=None):
+    '''
+    Returns a tuple (end_text, in_text) for a row.
+
+    input :
+        context -> RenderContext object shared by the batch, or None (today)
+    '''
+    citation = build_citation(row)
+    return citation.end_text(context=context), citation.in_text()
+
+
+class Bibliography:
+    '''
+    Streaming pipeline over a CSV or JSONL file of citation records.
+    Records are read lazily one at a time, so memory stays flat
+    however big the input is. Bad rows are reported to `errors`
+    and skipped.
+
+    Input : data types
+        source   -> str (path) or file object
+        fmt      -> 'csv' , 'jsonl' or None (guessed from the file extension)
+        errors   -> file object receiving one line per bad row (default stderr)
+        context  -> RenderContext object or None (a new one for every render() call)
+        validate -> bool, check every row against the schema of its type
+                    (validation.py) before building it, a bad row is
+                    reported once with all its errors
+    '''
+    def __init__(self, source, fmt=None, errors=None, context=None, validate=False):
+        self.source = source
+        if fmt == None:
+            name = source if isinstance(source, str) else getattr(source, 'name', '')
+            fmt = 'csv' if os.path.splitext(str(name))[1].lower() == '.csv' else 'jsonl'
+        if fmt not in ('csv', 'jsonl'):
+            raise ValueError('Only accept csv or jsonl format')
+        self.fmt = fmt
+        self.errors = sys.stderr if errors == None else errors
+        self.error_count = 0
+        self.context = context
+        self.validate = validate
+
+    def _open(self):
+        if isinstance(self.source, str):
+            return open(self.source, newline='', encoding='utf-8'), True
+        return self.source, False
+
+    def rows(self):
+        '''
+        Yields tuples (line number, row dict).
+        Lines that cannot be decoded are reported and skipped.
+        '''
+        stream, owned = self._open()
+        try:
+            if self.fmt == 'csv':
+                reader = csv.DictReader(stream)
+                for row in reader:
+                    yield reader.line_num, row
+            else:
+                for line_num, line in enumerate(stream, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        row = json.loads(line)
+                        if not isinstance(row, dict):
+                            raise ValueError('record is not a JSON object')
+                    except ValueError as error:
+                        self.report(line_num, error)
+                        continue
+                    yield line_num, row
+        finally:
+            if owned:
+                stream.close()
+
+    def checked_rows(self):
+        '''
+        Yields the (line number, row dict) of rows() that pass the
+        validation, every row when validate is off.
+        '''
+        if not self.validate:
+            yield from self.rows()
+            return
+        from validation import format_errors, validate_rows
+
+        for line_num, row, errors in validate_rows(self.rows()):
+            if errors:
+                self.write_error(line_num, 'ValidationError', format_errors(errors))
+                continue
+            yield line_num, row
+
+    def report(self, line_num, error):
+        '''
+        Writes a bad row to the error stream.
+        '''
+        self.write_error(line_num, type(error).__name__, error)
+
+    def write_error(self, line_num, kind, msg):
+        '''
+        Writes one error line : source:line: kind: msg
+        '''
+        self.error_count += 1
+        self.errors.write('{source}:{line}: {kind}: {msg}\n'.format(
+            source=getattr(self.source, 'name', self.source), line=line_num,
+            kind=kind, msg=msg))
+
+    def citations(self):
+        '''
+        Yields the citation object of every good row.
+        '''
+        for line_num, row in self.checked_rows():
+            try:
+                citation = build_citation(row)
+            except Exception as error:
+                self.report(line_num, error)
+                continue
+            yield citation
+
+    def render(self):
+        '''
+        Yields tuples (end_text, in_text) of every good row.
+        '''
+        context = RenderContext() if self.context == None else self.context
+        for line_num, row in self.checked_rows():
+            try:
+                rendered = render_row(row, context)
+            except Exception as error:
+                self.report(line_num, error)
+                continue
+            yield rendered
+
+    def __iter__(self):
+        return self.render()
@@ -0,0 +1,232 @@
+import hashlib
+import sqlite3
+import string
+from itertools import islice
+
+from CLI_approach import Names, RenderContext
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS renders (
+    key      BLOB PRIMARY KEY,
+    end_text TEXT NOT NULL,
+    in_text  TEXT NOT NULL,
+    used     INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS renders_used ON renders (used);
+'''
+
+# keys looked up per SELECT, under the SQLite limit of bound parameters
+BATCH = 500
+# renders kept in memory by default, served without a key or a SELECT
+MEMORY_ENTRIES = 100000
+
+# citation class -> True if its layout prints the access date
+_dated = {}
+
+
+def uses_access_date(cls):
+    '''
+    Returns True if the end-text layout of a class prints the access
+    date. The renders of the other classes do not change from one day
+    to the next, their keys leave the date out.
+    '''
+    dated = _dated.get(cls)
+    if dated == None:
+        fields = string.Formatter().parse(cls.TEMPLATE or '')
+        dated = _dated[cls] = any(field == 'accessed' for _, field, _, _ in fields)
+    return dated
+
+
+def record_key(citation, markup='text', context=None, year_suffix=''):
+    '''
+    Returns the cache key of a citation : a stable hash of its type,
+    its field values and the render settings.
+    '''
+    dated = context != None and uses_access_date(type(citation))
+    accessed = context.accessed if dated else ''
+    return values_key(type(citation), citation.get_values(), (markup, accessed, year_suffix))
+
+
+def values_key(cls, values, settings):
+    '''
+    Same as record_key() from the class, the field values and the
+    (markup, access date, year suffix) of a record.
+    '''
+    # names as a tuple of str : repr() of it is done in C, Names.__repr__ is not
+    values = tuple([value.list_o_names if type(value) is Names else value for value in values])
+    text = '\x00'.join([cls.__name__, repr(values), settings[0], settings[1], settings[2]])
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class RenderCache:
+    '''
+    Content addressed, on disk cache of rendered citations (SQLite).
+    Unchanged records are served from the cache, so rebuilding a big
+    reference list after a small edit only renders the edited entries.
+    The least recently used entries are evicted past max_entries.
+
+    The renders of the last memory_entries records are also kept in a
+    dict keyed by the record itself (its type and field values) : a
+    rebuild in the same process skips the key hash and the SELECT of
+    the records it has already seen.
+
+    The LRU clock ticks every max_entries / 16 new entries rather than
+    every call, so a rebuild where little changed does not stamp every
+    hit again : eviction only has to order entries against the ones
+    added after them.
+
+    Input : data types
+        path           -> str, SQLite file or ':memory:'
+        max_entries    -> int, number of renders kept
+        memory_entries -> int, number of renders also kept in memory
+    '''
+    def __init__(self, path=':memory:', max_entries=1000000, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        # (settings, type, field values) -> (end_text, in_text)
+        self.memory = {}
+        self.epoch = max(1, max_entries // 16)
+        self.added = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('PRAGMA cache_size=-65536')
+        self.db.executescript(SCHEMA)
+        self.clock, self.count = self.db.execute('SELECT COALESCE(MAX(used), 0), COUNT(*) FROM renders').fetchone()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+    def render(self, citation, markup='text', context=None, year_suffix=''):
+        '''
+        Returns (end_text, in_text) of one citation.
+        '''
+        return next(self.render_many([citation], markup, context, year_suffix))
+
+    def render_many(self, citations, markup='text', context=None, year_suffix=''):
+        '''
+        Yields (end_text, in_text) of every citation, in order.
+        Citations are looked up and stored in batches, every call
+        is one transaction.
+        '''
+        context = RenderContext() if context == None else context
+        citations = iter(citations)
+        touched = []
+        try:
+            yield from self._render_batches(citations, markup, context, year_suffix, touched)
+        finally:
+            if touched:
+                # one pass over the hits in key order, much faster than random order
+                touched.sort()
+                self.db.executemany('UPDATE renders SET used = ? WHERE key = ?',
+                                    [(self.clock, key) for key in touched])
+            self.db.commit()
+            self.evict()
+
+    def _render_batches(self, citations, markup, context, year_suffix, touched):
+        settings = (markup, '', year_suffix)
+        dated_settings = (markup, context.accessed, year_suffix)
+        memory = self.memory
+        while True:
+            batch = list(islice(citations, BATCH))
+            if not batch:
+                break
+            rendered = [None] * len(batch)
+            # (position, memory key, citation) of the records not in memory
+            wanted = []
+            for i, citation in enumerate(batch):
+                cls = type(citation)
+                memo = (dated_settings if uses_access_date(cls) else settings, cls, citation.get_values())
+                found = memory.pop(memo, None)
+                if found == None:
+                    wanted.append((i, memo, citation))
+                    continue
+                self.hits += 1
+                result, key, used = found
+                if used != self.clock:
+                    touched.append(key)
+                # put back last : forget() drops the least recently used first
+                memory[memo] = (result, key, self.clock)
+                rendered[i] = result
+            if wanted:
+                self._lookup(wanted, rendered, markup, context, year_suffix, touched)
+            yield from rendered
+
+    def _lookup(self, wanted, rendered, markup, context, year_suffix, touched):
+        '''
+        Fills rendered with the renders of wanted, from the database or
+        rendered and stored.
+        '''
+        keys = [values_key(*memo[1:], memo[0]) for _, memo, _ in wanted]
+        found = {}
+        for key, end_text, in_text, used in self.db.execute(
+                'SELECT key, end_text, in_text, used FROM renders WHERE key IN ({})'.format(','.join('?' * len(keys))),
+                keys):
+            found[key] = (end_text, in_text)
+            if used != self.clock:
+                touched.append(key)
+
+        new = []
+        for key, (i, memo, citation) in zip(keys, wanted):
+            result = found.get(key)
+            if result == None:
+                self.misses += 1
+                result = found[key] = (citation.end_text(markup, context, year_suffix), citation.in_text(year_suffix))
+                new.append((key,) + result + (self.clock,))
+            else:
+                self.hits += 1
+            rendered[i] = result
+            if self.memory_entries:
+                if len(self.memory) >= self.memory_entries:
+                    self.forget()
+                self.memory[memo] = (result, key, self.clock)
+
+        if new:
+            # another process may have stored the same render since the SELECT : it
+            # is the same text under the same key, only the new rows are counted
+            cursor = self.db.executemany('INSERT OR IGNORE INTO renders VALUES (?, ?, ?, ?)', new)
+            self.count += cursor.rowcount
+            self.added += len(new)
+            if self.added >= self.epoch:
+                self.clock += 1
+                self.added = 0
+
+    def forget(self):
+        '''
+        Drops the least recently used quarter of the renders kept in
+        memory.
+        '''
+        for memo in list(islice(self.memory, max(1, self.memory_entries // 4))):
+            del self.memory[memo]
+
+    def evict(self):
+        '''
+        Removes the least recently used entries past max_entries.
+        '''
+        extra = len(self) - self.max_entries
+        if extra > 0:
+            with self.db:
+                self.db.execute('DELETE FROM renders WHERE key IN '
+                                '(SELECT key FROM renders ORDER BY used LIMIT ?)', (extra,))
+            self.count -= extra
+
+    def clear(self):
+        with self.db:
+            self.db.execute('DELETE FROM renders')
+        self.memory.clear()
+        self.hits = self.misses = self.count = 0
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,245 @@
+'''
+harvard-ref : renders Harvard citations from the command line.
+
+    harvard-ref [FILE]            JSONL (or .csv) records -> one end-text citation per line
+    cat records.jsonl | harvard-ref --in-text
+    harvard-ref -i                prompts for the fields of one citation after another
+
+Only sys is imported at startup, the citation modules are loaded once
+the options are read, so a run on a few records starts fast enough to
+be called from build scripts in a loop.
+'''
+import sys
+
+USAGE = '''usage: harvard-ref [-h] [-m MARKUP] [--in-text | --json] [--csv] [--validate]
+                   [-i] [--metrics FILE] [--profile FILE] [FILE]
+
+Renders Harvard citations of JSONL (or CSV) records read from FILE or
+stdin, one citation per line on stdout. Bad records are reported on
+stderr and skipped.
+
+options:
+  -h, --help            show this message and exit
+  -m, --markup MARKUP   text, html, markdown or rtf (default text)
+  --in-text             print the in-text citations instead
+  --json                print {"end_text": ..., "in_text": ...} per record
+  --csv                 read CSV (guessed from a .csv FILE, JSONL otherwise)
+  --validate            check every field of a record before rendering it,
+                        bad records are reported with all their errors
+  -i, --interactive     prompt for the fields of each citation
+  --metrics FILE        write call counts and timings per citation type
+                        (Prometheus text for .prom/.txt, JSON otherwise)
+  --profile FILE        run under cProfile, write the report (.prof : raw stats)
+'''
+
+# hints added to the docstring types in interactive mode
+HINTS = {'author': 'names separated by ;', 'editors': 'names separated by ;', 'page': '12 or 12-15'}
+
+
+class UsageError(Exception):
+    pass
+
+
+def parse_args(argv):
+    '''
+    Returns a dict of the options. Hand written rather than argparse,
+    which costs more to import than the rest of a short run.
+    '''
+    options = {'markup': 'text', 'output': 'end_text', 'fmt': None, 'interactive': False, 'file': None,
+               'metrics': None, 'profile': None, 'validate': False}
+    argv = list(argv)
+    while argv:
+        arg = argv.pop(0)
+        if arg in ('-h', '--help'):
+            options['help'] = True
+        elif arg.split('=', 1)[0] in ('-m', '--markup', '--metrics', '--profile'):
+            name = arg.split('=', 1)[0]
+            if '=' in arg:
+                value = arg.split('=', 1)[1]
+            elif argv:
+                value = argv.pop(0)
+            else:
+                raise UsageError('{} needs a value'.format(arg))
+            if name in ('-m', '--markup'):
+                if value not in ('text', 'html', 'markdown', 'rtf'):
+                    raise UsageError('unknown markup {!r}'.format(value))
+                options['markup'] = value
+            else:
+                options[name[2:]] = value
+        elif arg in ('--in-text', '--json'):
+            if options['output'] != 'end_text':
+                raise UsageError('--in-text and --json cannot be used together')
+            options['output'] = arg[2:].replace('-', '_')
+        elif arg == '--csv':
+            options['fmt'] = 'csv'
+        elif arg == '--validate':
+            options['validate'] = True
+        elif arg in ('-i', '--interactive'):
+            options['interactive'] = True
+        elif arg.startswith('-') and arg != '-':
+            raise UsageError('unknown option {}'.format(arg))
+        elif options['file'] != None:
+            raise UsageError('only one FILE can be given')
+        else:
+            options['file'] = arg
+    return options
+
+
+def docstring_fields(cls):
+    '''
+    Returns a dict field name -> type hint read from the "Input" part
+    of the class docstring. The constructor names come first : fields
+    are matched by position when the docstring lists as many fields
+    as the constructor takes (Video calls them channel_name and
+    video_title but documents website_name and article_title).
+    '''
+    from bibliography import get_fields
+
+    fields = get_fields(cls)
+    hints = {}
+    for klass in cls.__mro__:
+        documented = []
+        reading = False
+        for line in (klass.__dict__.get('__doc__') or '').splitlines():
+            line = line.strip()
+            if line.startswith('Input'):
+                reading = True
+            elif reading and '->' in line:
+                name, _, hint = line.partition('->')
+                documented.append((name.strip(), hint.strip()))
+        if not documented:
+            continue
+        if klass is cls and len(documented) == len(fields):
+            for field, (_, hint) in zip(fields, documented):
+                hints.setdefault(field, hint)
+        for name, hint in documented:
+            hints.setdefault(name, hint)
+    return {field: hints.get(field, '') for field in fields}
+
+
+def interactive(markup='text', stdin=None, stdout=None):
+    '''
+    Prompts for a citation type and its fields, prints its end-text
+    and in-text citations, and starts again until an empty type or
+    the end of the input.
+    '''
+    from bibliography import TYPES, build_citation
+    from CLI_approach import RenderContext
+
+    stdin = sys.stdin if stdin == None else stdin
+    stdout = sys.stdout if stdout == None else stdout
+    context = RenderContext()
+    names = sorted(TYPES)
+
+    def ask(prompt):
+        stdout.write(prompt)
+        stdout.flush()
+        line = stdin.readline()
+        if not line:
+            raise EOFError
+        return line.strip()
+
+    stdout.write('Citation types : {}\n'.format(', '.join(
+        '{}) {}'.format(number, name) for number, name in enumerate(names, 1))))
+    while True:
+        try:
+            kind = ask('\ntype (empty to quit): ').lower()
+            if not kind:
+                return 0
+            if kind.isdigit() and 0 < int(kind) <= len(names):
+                kind = names[int(kind) - 1]
+            if kind not in TYPES:
+                stdout.write('unknown type {!r}\n'.format(kind))
+                continue
+            row = {'type': kind}
+            for field, hint in docstring_fields(TYPES[kind]).items():
+                hint = '; '.join(part for part in (hint, HINTS.get(field)) if part)
+                row[field] = ask('{}{}: '.format(field, ' ({})'.format(hint) if hint else ''))
+        except EOFError:
+            stdout.write('\n')
+            return 0
+        try:
+            citation = build_citation(row)
+            stdout.write('\n{}\n{}\n'.format(citation.end_text(markup, context), citation.in_text()))
+        except Exception as error:
+            stdout.write('{}: {}\n'.format(type(error).__name__, error))
+
+
+def render(options, stdout):
+    '''
+    Streams the citations of the input to stdout, returns the exit
+    status : 1 when some records could not be rendered.
+    '''
+    import json
+    from bibliography import Bibliography
+    from CLI_approach import RenderContext
+
+    source = options['file']
+    if source in (None, '-'):
+        source = sys.stdin
+    bibliography = Bibliography(source, options['fmt'] or ('csv' if str(source).lower().endswith('.csv') else 'jsonl'),
+                                validate=options['validate'])
+    context = RenderContext()
+    markup = options['markup']
+    output = options['output']
+    write = stdout.write
+    for citation in bibliography.citations():
+        if output == 'end_text':
+            write(citation.end_text(markup, context) + '\n')
+        elif output == 'in_text':
+            write(citation.in_text() + '\n')
+        else:
+            write(json.dumps({'end_text': citation.end_text(markup, context), 'in_text': citation.in_text()},
+                             ensure_ascii=False) + '\n')
+    stdout.flush()
+    return 1 if bibliography.error_count else 0
+
+
+def instrumented(options, stdout):
+    '''
+    render() with the --metrics and --profile switches.
+    '''
+    from instrument import Instrumentation, profile
+
+    instrumentation = Instrumentation() if options['metrics'] != None else None
+    if instrumentation != None:
+        instrumentation.enable()
+    try:
+        if options['profile'] != None:
+            return profile(render, options, stdout, report=options['profile'])
+        return render(options, stdout)
+    finally:
+        if instrumentation != None:
+            instrumentation.disable()
+            instrumentation.write(options['metrics'])
+
+
+def main(argv=None):
+    try:
+        options = parse_args(sys.argv[1:] if argv == None else argv)
+    except UsageError as error:
+        sys.stderr.write('{}harvard-ref: error: {}\n'.format(USAGE.split('\n\n')[0] + '\n', error))
+        return 2
+    if options.get('help'):
+        sys.stdout.write(USAGE)
+        return 0
+    try:
+        if options['interactive']:
+            return interactive(options['markup'])
+        if options['metrics'] == None and options['profile'] == None:
+            return render(options, sys.stdout)
+        return instrumented(options, sys.stdout)
+    except BrokenPipeError:
+        # the reader went away (| head) : stop quietly
+        import os
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except OSError as error:
+        sys.stderr.write('harvard-ref: {}\n'.format(error))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
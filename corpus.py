@@ -0,0 +1,431 @@
+'''
+Compact binary corpus of citation records, opened with mmap.
+
+    with CorpusWriter('refs.corpus') as writer:
+        for key, citation in items:
+            writer.add(key, citation)
+
+    corpus = Corpus('refs.corpus')
+    corpus['dickson2019']          -> Website(...)
+
+Opening reads a 64 byte header and a small table of the citation
+types, nothing else, so it takes the same time for 100 records and
+for 10M. A record is only decoded into its citation class when it is
+looked up. The file is mapped read only : every process opening the
+same corpus shares the same pages of the page cache.
+
+File layout (integers little endian) :
+
+    header   magic, version, record count, index slots,
+             offsets of the records, the index and the type table
+    records  varint length, varint key length, key (utf-8),
+             varint type number, then the fields as utf-8 text
+             (see encode_fields)
+    index    open addressing table (linear probing) : u64 hash of
+             the key of every slot (0 : empty), then u64 record
+             offset of every slot
+    types    JSON list of [class name, [field names]]
+
+The fields are the slots of the class (get_slots()) : a record comes
+back equal to the one written without calling the constructor again.
+They are kept as one piece of text so a lookup decodes them in one
+call rather than value by value.
+'''
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from CLI_approach import Names
+from bibliography import TYPES
+
+MAGIC = b'HARVCORP'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQQQQ')
+HEADER_SIZE = 64
+U64 = struct.Struct('<Q')
+# index slots per record : the table is at most 3/4 full
+LOAD = 4 / 3
+
+SEPARATOR = '\x00'
+
+# class name -> class, the type table stores class names
+CLASSES = {cls.__name__: cls for cls in TYPES.values()}
+
+
+def key_hash(key):
+    '''
+    Returns the 64 bit hash of a key, never 0 (empty slot).
+    '''
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+
+def write_varint(out, number):
+    while number > 0x7F:
+        out.append(number & 0x7F | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def read_varint(data, position):
+    '''
+    Returns (number, position after it).
+    '''
+    byte = data[position]
+    if byte < 0x80:
+        return byte, position + 1
+    number = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
+
+
+def write_str(out, value):
+    value = value.encode('utf-8')
+    write_varint(out, len(value))
+    out += value
+
+
+def read_str(data, position):
+    length, position = read_varint(data, position)
+    return str(data[position:position + length], 'utf-8'), position + length
+
+
+def encode_fields(citation, slots):
+    '''
+    Returns the text of the fields of a record : one part per value,
+    parts separated by NUL, the first character of a part tells its
+    type. None is an empty part, a Names value is followed by one
+    part per name.
+    '''
+    parts = []
+    for name in slots:
+        value = getattr(citation, name, None)
+        if value == None:
+            parts.append('')
+        elif isinstance(value, str):
+            parts.append('s' + value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            parts.append('i{}'.format(value))
+        elif isinstance(value, Names):
+            parts.append('n{}'.format(len(value)))
+            parts.extend(value.list_o_names)
+        else:
+            raise TypeError('cannot store a {} value in {}'.format(type(value).__name__, name))
+    text = SEPARATOR.join(parts)
+    if text.count(SEPARATOR) != len(parts) - 1:
+        raise ValueError('field values cannot hold NUL characters')
+    return text.encode('utf-8')
+
+
+def decode_fields(text, fields, citation):
+    '''
+    Sets the fields of an empty citation object from the text of a
+    record.
+    '''
+    parts = text.split(SEPARATOR)
+    position = 0
+    set_field = object.__setattr__
+    for name in fields:
+        part = parts[position]
+        position += 1
+        if not part:
+            value = None
+        elif part[0] == 's':
+            value = part[1:]
+        elif part[0] == 'i':
+            value = int(part[1:])
+        else:
+            count = int(part[1:])
+            value = Names.intern(parts[position:position + count])
+            position += count
+        # the slots are set once, as __init__ would
+        set_field(citation, name, value)
+    return citation
+
+
+class CorpusWriter:
+    '''
+    Writes a corpus file record by record. Only the hash and offset
+    of every key stay in memory (16 bytes a record), close() builds
+    the index from them. The file is written next to path and
+    renamed over it once complete, so readers of the old corpus are
+    not disturbed.
+
+    Input : data types
+        path -> str, corpus file
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.temp = '{}.{}.tmp'.format(path, os.getpid())
+        self.out = open(self.temp, 'w+b')
+        self.out.write(bytes(HEADER_SIZE))
+        self.offset = HEADER_SIZE
+        self.hashes = array('Q')
+        self.offsets = array('Q')
+        # class -> (type number, slot names)
+        self.types = {}
+        self.closed = False
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _type(self, cls):
+        found = self.types.get(cls)
+        if found == None:
+            if CLASSES.get(cls.__name__) is not cls:
+                raise TypeError('{} is not a citation type of bibliography.TYPES'.format(cls.__name__))
+            found = self.types[cls] = (len(self.types), cls.get_slots())
+        return found
+
+    def add(self, key, citation):
+        '''
+        Appends one record. Keys must be unique, a key given twice
+        makes close() raise ValueError.
+
+        input :
+            key      -> str
+            citation -> Citation object
+        '''
+        number, slots = self._type(type(citation))
+        body = bytearray()
+        write_str(body, key)
+        write_varint(body, number)
+        body += encode_fields(citation, slots)
+        record = bytearray()
+        write_varint(record, len(body))
+        record += body
+        self.out.write(record)
+        self.hashes.append(key_hash(key.encode('utf-8')))
+        self.offsets.append(self.offset)
+        self.offset += len(record)
+
+    def _key_at(self, offset):
+        self.out.flush()
+        with open(self.temp, 'rb') as stream:
+            stream.seek(offset)
+            head = stream.read(20)
+            _, position = read_varint(head, 0)
+            length, position = read_varint(head, position)
+            stream.seek(offset + position)
+            return stream.read(length).decode('utf-8')
+
+    def _index(self):
+        '''
+        Returns the open addressing table of the keys : the array of
+        the hashes and the array of the offsets, one item per slot.
+        '''
+        slots = int(len(self.offsets) * LOAD) + 1
+        hashes = array('Q', bytes(8 * slots))
+        offsets = array('Q', bytes(8 * slots))
+        for key, offset in zip(self.hashes, self.offsets):
+            slot = key % slots
+            while hashes[slot]:
+                # same hash : the same key unless two keys collide on 64 bits
+                if hashes[slot] == key and self._key_at(offsets[slot]) == self._key_at(offset):
+                    raise ValueError('duplicate key {!r}'.format(self._key_at(offset)))
+                slot = slot + 1 if slot + 1 < slots else 0
+            hashes[slot] = key
+            offsets[slot] = offset
+        if sys.byteorder == 'big':
+            hashes.byteswap()
+            offsets.byteswap()
+        return slots, hashes, offsets
+
+    def close(self):
+        '''
+        Writes the index and the header, and puts the file in place.
+        '''
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            slots, hashes, offsets = self._index()
+            index = self.offset
+            hashes.tofile(self.out)
+            offsets.tofile(self.out)
+            types = json.dumps([[cls.__name__, list(names)] for cls, (_, names)
+                                in sorted(self.types.items(), key=lambda item: item[1][0])]).encode('utf-8')
+            self.out.write(types)
+            self.out.seek(0)
+            self.out.write(HEADER.pack(MAGIC, VERSION, 0, len(self.offsets), slots, HEADER_SIZE, index,
+                                       index + 16 * slots, len(types)))
+            self.out.close()
+            os.replace(self.temp, self.path)
+        except BaseException:
+            self.out.close()
+            os.remove(self.temp)
+            raise
+        finally:
+            self.hashes = self.offsets = None
+
+    def abort(self):
+        '''
+        Drops the file being written.
+        '''
+        if not self.closed:
+            self.closed = True
+            self.out.close()
+            os.remove(self.temp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, *exc):
+        if kind == None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_corpus(path, items):
+    '''
+    Writes a corpus file, returns the number of records.
+
+    input :
+        items -> iterable of (key, Citation object)
+    '''
+    with CorpusWriter(path) as writer:
+        for key, citation in items:
+            writer.add(key, citation)
+        return len(writer)
+
+
+class Corpus:
+    '''
+    Read only, memory mapped corpus. Behaves as a mapping
+    key -> Citation object, records are decoded on access.
+
+    Input : data types
+        path -> str, file written by CorpusWriter
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as stream:
+            if os.fstat(stream.fileno()).st_size < HEADER_SIZE:
+                # mmap cannot map an empty file
+                raise ValueError('{} is not a corpus file'.format(path))
+            # the mapping stays valid once the file is closed
+            self.data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.count, self.slots, self.start, self.index,
+         types, types_length) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError('{} is not a corpus file of version {}'.format(path, VERSION))
+        # the type table ends the file, the other parts come before it
+        if not (HEADER_SIZE == self.start <= self.index == types - 16 * self.slots and
+                types + types_length == len(self.data)):
+            size = len(self.data)
+            self.data.close()
+            raise ValueError('{} is truncated or corrupt : {} bytes, the header gives {}'.format(
+                path, size, types + types_length))
+        try:
+            # type number -> (class, slot names of the file)
+            self.types = [(CLASSES[name], tuple(fields))
+                          for name, fields in json.loads(self.data[types:types + types_length].decode('utf-8'))]
+        except (ValueError, KeyError, TypeError) as error:
+            self.data.close()
+            raise ValueError('{} has a corrupt type table : {}'.format(path, error)) from error
+        if hasattr(self.data, 'madvise'):
+            # lookups jump around the file, read ahead would load pages for nothing
+            self.data.madvise(mmap.MADV_RANDOM)
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key):
+        '''
+        Returns the offset of the record of a key, or None.
+        '''
+        if not self.slots:
+            return None
+        raw = key.encode('utf-8')
+        wanted = key_hash(raw)
+        data = self.data
+        slot = wanted % self.slots
+        unpack_from = U64.unpack_from
+        offsets = self.index + 8 * self.slots
+        while True:
+            found = unpack_from(data, self.index + 8 * slot)[0]
+            if found == 0:
+                return None
+            if found == wanted:
+                offset = unpack_from(data, offsets + 8 * slot)[0]
+                _, position = read_varint(data, offset)
+                length, position = read_varint(data, position)
+                if data[position:position + length] == raw:
+                    return offset
+            slot = slot + 1 if slot + 1 < self.slots else 0
+
+    def decode(self, offset):
+        '''
+        Returns (key, Citation object) of the record at an offset.
+        '''
+        data = self.data
+        length, position = read_varint(data, offset)
+        end = position + length
+        key, position = read_str(data, position)
+        number, position = read_varint(data, position)
+        cls, fields = self.types[number]
+        return key, decode_fields(str(data[position:end], 'utf-8'), fields, cls.__new__(cls))
+
+    def get(self, key, default=None):
+        offset = self._find(key)
+        return default if offset == None else self.decode(offset)[1]
+
+    def __getitem__(self, key):
+        offset = self._find(key)
+        if offset == None:
+            raise KeyError(key)
+        return self.decode(offset)[1]
+
+    def __contains__(self, key):
+        return self._find(key) != None
+
+    def offsets(self):
+        '''
+        Yields the offset of every record, in the order written.
+        '''
+        data = self.data
+        position = self.start
+        while position < self.index:
+            length, body = read_varint(data, position)
+            yield position
+            position = body + length
+
+    def keys(self):
+        data = self.data
+        for offset in self.offsets():
+            _, position = read_varint(data, offset)
+            yield read_str(data, position)[0]
+
+    __iter__ = keys
+
+    def items(self):
+        '''
+        Yields (key, Citation object) of every record, in the order
+        written.
+        '''
+        for offset in self.offsets():
+            yield self.decode(offset)
+
+    def values(self):
+        for _, citation in self.items():
+            yield citation
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,273 @@
+'''
+Finds near-duplicate records in a merged bibliography : the same
+work with a slightly different title or other author initials.
+
+Records are first grouped into blocks on the normalized surname of
+the first author and the year, so only records of one block are
+compared. Titles are compared as sets of character 3-grams, through
+their exact Jaccard similarity : a title has a few dozen 3-grams, so
+comparing the sets costs less than estimating it from MinHash
+sketches, and no pair is kept or dropped on an estimate. Records
+closer than the threshold are joined into clusters (union-find) when
+no field tells them apart (other numbers in the titles, another
+volume, issue or page), and two clusters are only joined when their
+first records are close too, so near titles do not chain distinct
+works into one cluster. The cost is linear in the number of records
+plus the pairs inside the blocks. Big blocks only compare records
+that share one of the first hashes of their 3-gram sets (prefix
+filtering), so they do not go quadratic.
+
+    clusters = Deduplicator().find(citations)
+    kept = list(merge(citations, clusters))
+'''
+import json
+import math
+import re
+import zlib
+
+from CLI_approach import RenderContext
+from exporters import citation_fields
+from reflist import collation_key
+
+# records in a block compared pair by pair, bigger blocks use prefix filtering
+SMALL_BLOCK = 64
+# fields that tell two works apart when both records have them
+DISTINCT_FIELDS = ('volume', 'issue', 'page')
+NOT_WORD = re.compile(r'[\W_]+')
+NUMBER = re.compile(r'\d+')
+
+
+def normalize(text):
+    '''
+    Returns text without accents, case or punctuation.
+
+    eg : 'The Économie, of Things!' -> 'the economie of things'
+    '''
+    return ' '.join(NOT_WORD.sub(' ', collation_key(text)).split())
+
+
+def block_key(citation):
+    '''
+    Returns the block of a citation : normalized surname of the first
+    author (or first word of the title without author) and year.
+    '''
+    if citation.author != None and len(citation.author):
+        name = normalize(citation.author.get_famname()[0])
+    else:
+        name = normalize(citation.master_title or '')
+        name = name.split(' ')[0] if name else ''
+    return '{}\x00{}'.format(name.replace(' ', ''), citation.year_of_publication)
+
+
+def title_of(citation):
+    '''
+    Returns the title of the work itself (the article rather than
+    the journal), falling back on master_title.
+    '''
+    fields = citation_fields(citation)
+    return fields.get('title') or fields.get('container') or citation.master_title or ''
+
+
+def shingles(text, size=3):
+    text = ' {} '.format(normalize(text))
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def shingle_hashes(text, size=3):
+    '''
+    Returns the sorted tuple of the crc32 hashes of the shingles of a
+    title.
+    '''
+    return tuple(sorted({zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text, size)}))
+
+
+def jaccard(first, second):
+    '''
+    Returns the exact Jaccard similarity of two sets.
+    '''
+    union = len(first | second)
+    return len(first & second) / union if union else 1.0
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent
+        root = parent.setdefault(item, item)
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            if second < first:
+                first, second = second, first
+            self.parent[second] = first
+
+    def groups(self):
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+class Deduplicator:
+    '''
+    Input : data types
+        threshold -> float, title similarity (0 to 1) over which two records are duplicates
+        shingle   -> int, characters per shingle
+    '''
+    def __init__(self, threshold=0.7, shingle=3):
+        self.threshold = threshold
+        self.shingle = shingle
+        self.stats = {'records': 0, 'blocks': 0, 'compared': 0, 'clusters': 0, 'duplicates': 0}
+
+    def blocks(self, citations):
+        '''
+        Returns the lists of record numbers of the blocks holding more
+        than one record.
+        '''
+        blocks = {}
+        for number, citation in enumerate(citations):
+            key = block_key(citation)
+            found = blocks.get(key)
+            # single records are kept as an int, most blocks have one record
+            if found == None:
+                blocks[key] = number
+            elif isinstance(found, int):
+                blocks[key] = [found, number]
+            else:
+                found.append(number)
+        self.stats['records'] = len(citations)
+        self.stats['blocks'] = len(blocks)
+        return [found for found in blocks.values() if not isinstance(found, int)]
+
+    def _pairs(self, hashes):
+        '''
+        Yields the pairs of positions of a block worth comparing.
+
+        input :
+            hashes -> list of the sorted shingle hashes of every record
+        '''
+        if len(hashes) <= SMALL_BLOCK:
+            for first in range(len(hashes)):
+                for second in range(first + 1, len(hashes)):
+                    yield first, second
+            return
+        # two sets this close share one of their first hashes
+        index = {}
+        seen = set()
+        for position, values in enumerate(hashes):
+            prefix = len(values) - math.ceil(self.threshold * len(values)) + 1
+            for value in values[:prefix]:
+                for other in index.get(value, ()):
+                    if (other, position) not in seen:
+                        seen.add((other, position))
+                        yield other, position
+                index.setdefault(value, []).append(position)
+
+    def _record(self, citation):
+        '''
+        Returns what the comparisons of a record need : its shingle
+        hashes (sorted tuple and set), the numbers of its title and the
+        fields that tell works apart.
+        '''
+        fields = citation_fields(citation)
+        title = title_of(citation)
+        hashes = shingle_hashes(title, self.shingle)
+        return (hashes, frozenset(hashes), frozenset(NUMBER.findall(title)),
+                tuple(fields.get(name) for name in DISTINCT_FIELDS))
+
+    def same_work(self, first, second):
+        '''
+        Returns True if two records (see _record) are duplicates.
+        '''
+        # sizes too far apart cannot reach the threshold
+        sizes = len(first[1]), len(second[1])
+        if min(sizes) < self.threshold * max(sizes):
+            return False
+        # Part 1 and Part 2, or another volume, issue or page : other works
+        if first[2] != second[2]:
+            return False
+        if any(one != None and other != None and one != other for one, other in zip(first[3], second[3])):
+            return False
+        return jaccard(first[1], second[1]) >= self.threshold
+
+    def find(self, citations):
+        '''
+        Returns the clusters of duplicates : sorted lists of record
+        numbers (positions in citations), the first record of each
+        cluster first.
+
+        input :
+            citations -> sequence of Citation objects (read twice)
+        '''
+        clusters = UnionFind()
+        for block in self.blocks(citations):
+            records = [self._record(citations[number]) for number in block]
+            positions = {number: position for position, number in enumerate(block)}
+            for first, second in self._pairs([record[0] for record in records]):
+                self.stats['compared'] += 1
+                if not self.same_work(records[first], records[second]):
+                    continue
+                roots = clusters.find(block[first]), clusters.find(block[second])
+                if roots[0] == roots[1]:
+                    continue
+                # the first records of both clusters must be duplicates too, or
+                # titles one edit apart would chain different works together
+                if roots != (block[first], block[second]) and \
+                        not self.same_work(records[positions[roots[0]]], records[positions[roots[1]]]):
+                    continue
+                clusters.union(*roots)
+        groups = sorted(clusters.groups())
+        self.stats['clusters'] = len(groups)
+        self.stats['duplicates'] = sum(len(group) - 1 for group in groups)
+        return groups
+
+
+def completeness(citation):
+    return sum(1 for value in citation.get_values() if value not in (None, '', 'n.d.'))
+
+
+def representative(citations, cluster):
+    '''
+    Returns the record number kept for a cluster : the record with
+    the most fields set, the first one on a tie.
+    '''
+    return max(cluster, key=lambda number: (completeness(citations[number]), -number))
+
+
+def merge(citations, clusters):
+    '''
+    Yields the citations with every cluster reduced to its most
+    complete record, in the order of the input.
+    '''
+    dropped = set()
+    for cluster in clusters:
+        kept = representative(citations, cluster)
+        dropped.update(number for number in cluster if number != kept)
+    for number, citation in enumerate(citations):
+        if number not in dropped:
+            yield citation
+
+
+def write_report(citations, clusters, out, context=None):
+    '''
+    Writes one JSON line per cluster : the record kept, the records
+    it replaces and their end-text citations.
+    '''
+    context = RenderContext() if context == None else context
+    for cluster in clusters:
+        kept = representative(citations, cluster)
+        out.write(json.dumps({
+            'kept': kept,
+            'duplicates': [number for number in cluster if number != kept],
+            'end_text': {number: citations[number].end_text(context=context) for number in cluster},
+        }, ensure_ascii=False) + '\n')
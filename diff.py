@@ -0,0 +1,295 @@
+'''
+Compares two releases of a reference list : added, removed and
+modified records, the fields changed in each, and the end-text
+citations they give.
+
+    changes = ReferenceDiff(old_citations, new_citations).changes()
+    write_text(changes, sys.stdout)
+
+    python diff.py old.jsonl new.jsonl [--json]
+
+Records are matched through hash tables, never pair by pair, so the
+cost is linear in the size of the releases :
+
+    1. records with the same fingerprint (type and fields) are
+       unchanged,
+    2. the others are matched on a key that survives an edit : type,
+       title and surnames, then type and title, then type, surnames
+       and year. A key only matches when it is held by one record on
+       each side, the others stay added or removed.
+'''
+import json
+import sys
+
+from CLI_approach import Names, RenderContext
+from dedup import normalize
+
+ADDED = 'added'
+REMOVED = 'removed'
+MODIFIED = 'modified'
+
+
+def fingerprint(citation):
+    '''
+    Returns the fingerprint of a record : its type and the values of
+    its fields. Equal records have equal fingerprints, hashed in C
+    rather than through Citation.__hash__.
+    '''
+    return type(citation).__name__, citation.get_values()
+
+
+def surnames(citation):
+    author = getattr(citation, 'author', None)
+    if author == None or not len(author):
+        return ''
+    return ' '.join(normalize(surname) for surname in author.get_famname())
+
+
+def identity_keys(citation):
+    '''
+    Returns the keys matching a record with its edited version, most
+    specific first.
+    '''
+    kind = type(citation).__name__
+    # Journal keeps the journal in master_title, the article is the work
+    title = normalize(getattr(citation, 'title_of_article', None) or citation.master_title or '')
+    names = surnames(citation)
+    return ((kind, title, names), (kind, title), (kind, names, citation.year_of_publication))
+
+
+def plain(value):
+    '''
+    Returns a field value as JSON can hold it.
+    '''
+    if isinstance(value, Names):
+        return list(value.list_o_names)
+    return value
+
+
+class Change:
+    '''
+    One added, removed or modified record.
+
+    Input : data types
+        kind -> ADDED, REMOVED or MODIFIED
+        old  -> (position, Citation object) in the old release or None (added)
+        new  -> (position, Citation object) in the new release or None (removed)
+    '''
+    __slots__ = ('kind', 'old', 'new')
+
+    def __init__(self, kind, old=None, new=None):
+        self.kind = kind
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        return 'Change({!r}, old={!r}, new={!r})'.format(self.kind, self.old and self.old[0], self.new and self.new[0])
+
+    def fields(self):
+        '''
+        Returns a list of (field, old value, new value) of the fields
+        that changed, in the order of get_slots().
+        '''
+        if self.kind != MODIFIED:
+            return []
+        old, new = self.old[1], self.new[1]
+        return [(name, before, after) for name, before, after
+                in zip(old.get_slots(), old.get_values(), new.get_values()) if before != after]
+
+    def end_text(self, markup='text', context=None):
+        '''
+        Returns (old end-text citation or None, new end-text citation or None).
+        '''
+        context = RenderContext() if context == None else context
+        return tuple(None if side == None else side[1].end_text(markup, context) for side in (self.old, self.new))
+
+    def as_dict(self, context=None):
+        old_text, new_text = self.end_text(context=context)
+        return {
+            'change': self.kind,
+            'type': type((self.new or self.old)[1]).__name__,
+            'old': None if self.old == None else self.old[0],
+            'new': None if self.new == None else self.new[0],
+            'fields': {name: [plain(before), plain(after)] for name, before, after in self.fields()},
+            'old_end_text': old_text,
+            'new_end_text': new_text,
+        }
+
+
+class ReferenceDiff:
+    '''
+    Input : data types
+        old -> sequence of Citation objects, the old release
+        new -> sequence of Citation objects, the new release
+    '''
+    def __init__(self, old, new):
+        self.old = old if isinstance(old, list) else list(old)
+        self.new = new if isinstance(new, list) else list(new)
+        self.stats = {'old': len(self.old), 'new': len(self.new), 'unchanged': 0,
+                      ADDED: 0, REMOVED: 0, MODIFIED: 0}
+
+    def _unchanged(self):
+        '''
+        Returns the positions of the old and the new records that have
+        no equal record on the other side.
+        '''
+        # hash of the fingerprint -> positions in the old release, a record can
+        # be listed twice. Keys are ints : the garbage collector does not walk them
+        positions = {}
+        for position, citation in enumerate(self.old):
+            key = hash(fingerprint(citation))
+            found = positions.get(key)
+            if found == None:
+                positions[key] = position
+            elif isinstance(found, int):
+                positions[key] = [found, position]
+            else:
+                found.append(position)
+        old = self.old
+        new_left = []
+        for position, citation in enumerate(self.new):
+            wanted = fingerprint(citation)
+            key = hash(wanted)
+            found = positions.get(key)
+            if found == None:
+                new_left.append(position)
+            elif isinstance(found, int):
+                # equal hashes, the fields are compared to be sure
+                if fingerprint(old[found]) == wanted:
+                    del positions[key]
+                else:
+                    new_left.append(position)
+            else:
+                for i, other in enumerate(found):
+                    if fingerprint(old[other]) == wanted:
+                        del found[i]
+                        break
+                else:
+                    new_left.append(position)
+                    continue
+                if len(found) == 1:
+                    positions[key] = found[0]
+        old_left = []
+        for found in positions.values():
+            if isinstance(found, int):
+                old_left.append(found)
+            else:
+                old_left.extend(found)
+        old_left.sort()
+        self.stats['unchanged'] = len(self.new) - len(new_left)
+        return old_left, new_left
+
+    def _match(self, old_left, new_left):
+        '''
+        Returns the list of (old position, new position) of edited
+        records, and removes them from old_left and new_left.
+        '''
+        old_keys = {position: identity_keys(self.old[position]) for position in old_left}
+        new_keys = {position: identity_keys(self.new[position]) for position in new_left}
+        pairs = []
+        for level in range(3):
+            # key -> position, None when more than one record has it
+            olds = {}
+            for position in old_left:
+                key = old_keys[position][level]
+                olds[key] = None if key in olds else position
+            news = {}
+            for position in new_left:
+                key = new_keys[position][level]
+                news[key] = None if key in news else position
+            matched_old = set()
+            matched_new = set()
+            for key, position in news.items():
+                other = olds.get(key)
+                if position != None and other != None:
+                    pairs.append((other, position))
+                    matched_old.add(other)
+                    matched_new.add(position)
+            old_left = [position for position in old_left if position not in matched_old]
+            new_left = [position for position in new_left if position not in matched_new]
+        return sorted(pairs, key=lambda pair: pair[1]), old_left, new_left
+
+    def changes(self):
+        '''
+        Returns the list of Change objects : removed records in the
+        order of the old release, then modified and added records in
+        the order of the new release.
+        '''
+        old_left, new_left = self._unchanged()
+        pairs, old_left, new_left = self._match(old_left, new_left)
+        changes = [Change(REMOVED, old=(position, self.old[position])) for position in old_left]
+        modified = {new: old for old, new in pairs}
+        for position in sorted(new_left + list(modified)):
+            if position in modified:
+                old = modified[position]
+                changes.append(Change(MODIFIED, (old, self.old[old]), (position, self.new[position])))
+            else:
+                changes.append(Change(ADDED, new=(position, self.new[position])))
+        self.stats[REMOVED] = len(old_left)
+        self.stats[ADDED] = len(new_left)
+        self.stats[MODIFIED] = len(pairs)
+        return changes
+
+
+def write_json(changes, out, context=None):
+    '''
+    Writes one JSON line per change.
+    '''
+    context = RenderContext() if context == None else context
+    for change in changes:
+        out.write(json.dumps(change.as_dict(context), ensure_ascii=False) + '\n')
+
+
+def write_text(changes, out, context=None):
+    '''
+    Writes the changes for a reader : one line per added or removed
+    record, the changed fields and both citations of a modified one.
+    '''
+    context = RenderContext() if context == None else context
+    for change in changes:
+        old_text, new_text = change.end_text(context=context)
+        if change.kind == REMOVED:
+            out.write('- [{}] {}\n'.format(change.old[0] + 1, old_text))
+        elif change.kind == ADDED:
+            out.write('+ [{}] {}\n'.format(change.new[0] + 1, new_text))
+        else:
+            out.write('~ [{} -> {}] {}\n'.format(change.old[0] + 1, change.new[0] + 1, type(change.new[1]).__name__))
+            for name, before, after in change.fields():
+                out.write('    {}: {!r} -> {!r}\n'.format(name, plain(before), plain(after)))
+            if old_text != new_text:
+                out.write('    - {}\n    + {}\n'.format(old_text, new_text))
+
+
+def load(path):
+    '''
+    Returns the list of citations of a release : a corpus file
+    (.corpus) or JSONL/CSV records, bad records are reported on
+    stderr and skipped.
+    '''
+    if path.endswith('.corpus'):
+        from corpus import Corpus
+        with Corpus(path) as corpus:
+            return list(corpus.values())
+    from bibliography import Bibliography
+    return list(Bibliography(path).citations())
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compares two releases of a reference list.')
+    parser.add_argument('old', help='old release : JSONL, CSV or .corpus file')
+    parser.add_argument('new', help='new release : JSONL, CSV or .corpus file')
+    parser.add_argument('--json', action='store_true', help='one JSON line per change')
+    args = parser.parse_args(argv)
+    differ = ReferenceDiff(load(args.old), load(args.new))
+    changes = differ.changes()
+    (write_json if args.json else write_text)(changes, sys.stdout)
+    sys.stderr.write('{unchanged} unchanged, {added} added, {removed} removed, {modified} modified\n'.format(
+        **differ.stats))
+    # same exit status as diff : 1 when the releases differ
+    return 1 if changes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+from bisect import insort
+
+from CLI_approach import RenderContext
+from reflist import sort_key
+
+
+def suffix_letters(position):
+    '''
+    Returns the year suffix of the n-th work (from 0) of a group.
+
+    eg : 0 -> 'a' , 25 -> 'z' , 26 -> 'aa'
+    '''
+    letters = ''
+    position += 1
+    while position:
+        position, rest = divmod(position - 1, 26)
+        letters = chr(ord('a') + rest) + letters
+    return letters
+
+
+class CitationIndex:
+    '''
+    Hash index of a bibliography on the in-text name and year.
+
+    Works by the same authors in the same year get 2019a, 2019b ...
+    suffixes, in the order of their titles, in both the in-text and
+    the end-text citations. Adding a citation and looking up its
+    suffix only touch its own group, so indexing a whole bibliography
+    is one linear pass.
+
+    Input : data types
+        citations -> iterable of Citation objects or None
+        context   -> RenderContext object of the end-text citations, or None (today)
+    '''
+    def __init__(self, citations=None, context=None):
+        self.context = RenderContext() if context == None else context
+        # (in-text name, year) -> sorted list of (sort key, citation)
+        self.groups = {}
+        # citation -> (in-text name, year)
+        self.keys = {}
+        if citations != None:
+            self.extend(citations)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, citation):
+        return citation in self.keys
+
+    @staticmethod
+    def group_key(citation):
+        '''
+        Returns the (in-text name, year) of a citation, the in-text
+        name being what in_text() prints before the year.
+        '''
+        year = str(citation.year_of_publication)
+        return citation.in_text()[1:-len(year) - 3], year
+
+    def add(self, citation):
+        '''
+        Adds a citation, equal citations are only indexed once.
+        '''
+        if citation in self.keys:
+            return
+        key = self.group_key(citation)
+        self.keys[citation] = key
+        # the group list is kept sorted by title, groups are small
+        insort(self.groups.setdefault(key, []), (sort_key(citation), len(self.keys), citation))
+
+    def extend(self, citations):
+        for citation in citations:
+            self.add(citation)
+
+    def suffix(self, citation):
+        '''
+        Returns the year suffix of an indexed citation, '' when no
+        other work shares its in-text name and year.
+        '''
+        group = self.groups[self.keys[citation]]
+        if len(group) == 1:
+            return ''
+        for position, entry in enumerate(group):
+            if entry[2] is citation or entry[2] == citation:
+                return suffix_letters(position)
+
+    def in_text(self, citation):
+        return citation.in_text(self.suffix(citation))
+
+    def end_text(self, citation, markup='text', context=None):
+        context = self.context if context == None else context
+        return citation.end_text(markup, context, self.suffix(citation))
+
+    def cite(self, *citations):
+        '''
+        Returns one in-text citation for several works cited together.
+
+        eg : (Smith, 2019a; Jones, 2020)
+
+        input :
+            *citations -> indexed Citation objects, or one list of them
+        '''
+        if len(citations) == 1 and isinstance(citations[0], (list, tuple)):
+            citations = citations[0]
+        parts = []
+        for citation in citations:
+            part = self.in_text(citation)[1:-1]
+            if part not in parts:
+                parts.append(part)
+        return '({})'.format('; '.join(parts))
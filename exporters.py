@@ -0,0 +1,346 @@
+import hashlib
+import json
+import os
+import re
+
+from CLI_approach import (MONTH, RenderContext, Online, Blog, WebDocument, Journal, EJournal,
+                          Book, EBook, Chapter, Encyclopedia, Dictionary, Image,
+                          Newspaper, Video, Thesis)
+
+# records serialized before one write() to the output
+BUFFER_RECORDS = 1000
+
+# citation class -> CSL type, the first class the citation is an instance of wins
+CSL_TYPES = (
+    (Blog, 'post-weblog'),
+    (Image, 'graphic'),
+    (Video, 'motion_picture'),
+    (Online, 'webpage'),
+    (Journal, 'article-journal'),
+    (Encyclopedia, 'entry-encyclopedia'),
+    (Chapter, 'chapter'),
+    (Book, 'book'),
+    (Newspaper, 'article-newspaper'),
+    (Thesis, 'thesis'),
+)
+
+# citation class -> BibTeX entry type (biblatex names where BibTeX has none)
+BIBTEX_TYPES = (
+    (Online, 'online'),
+    (Journal, 'article'),
+    (Newspaper, 'article'),
+    (Encyclopedia, 'inreference'),
+    (Chapter, 'incollection'),
+    (Book, 'book'),
+    (Thesis, 'thesis'),
+)
+
+BIBTEX_SPECIAL = re.compile(r'[\\{}&%$#_~^]')
+BIBTEX_ESCAPES = {'\\': r'\textbackslash{}', '{': r'\{', '}': r'\}', '&': r'\&', '%': r'\%', '$': r'\$',
+                  '#': r'\#', '_': r'\_', '~': r'\textasciitilde{}', '^': r'\textasciicircum{}'}
+ORDINAL = re.compile(r'^(\d+)(st|nd|rd|th)$')
+
+
+def ordinal_number(value):
+    '''
+    Returns the int of an ordinal made by Citation.position().
+
+    eg : '2nd' -> 2 , None -> None
+    '''
+    if value == None:
+        return None
+    match = ORDINAL.match(str(value))
+    return int(match.group(1)) if match else None
+
+
+def month_number(value):
+    '''
+    Returns the month as an int, from an int or a month name.
+    '''
+    if value == None or isinstance(value, int):
+        return value
+    return MONTH.index(value) if value in MONTH else None
+
+
+def page_range(value):
+    '''
+    Returns the stored page ('12-15', 'p. 12' or '') as '12-15', '12' or None.
+    '''
+    if not value:
+        return None
+    return value[3:] if value.startswith('p. ') else value
+
+
+def citation_fields(citation):
+    '''
+    Returns a dict with the values of a citation under neutral names,
+    undoing the formatting done by the constructors (ordinals, month
+    names, 'n.d.', 'p. ' ...). Fields a class does not have are left out.
+
+        authors, editors, title, container, year, month, day,
+        volume, issue, page, edition, publisher, place, url, genre,
+        authority
+
+    Names are kept as Names objects.
+    '''
+    year = citation.year_of_publication
+    fields = {'authors': citation.author, 'year': None if year == 'n.d.' else year}
+    if isinstance(citation, Online):
+        fields.update(title=citation.article_title, container=citation.website_name, url=citation.url)
+        if isinstance(citation, WebDocument):
+            fields['month'] = month_number(citation.month_of_publication)
+        if isinstance(citation, Video):
+            fields['day'] = ordinal_number(citation.day_of_publication)
+    elif isinstance(citation, Journal):
+        fields.update(title=citation.title_of_article, container=citation.master_title,
+                      volume=citation.volume_number, issue=citation.part_number, page=page_range(citation.page))
+        if isinstance(citation, EJournal):
+            fields['url'] = citation.url
+    elif isinstance(citation, Book):
+        fields.update(volume=citation.volume, edition=ordinal_number(citation.edition),
+                      place=citation.place_of_publication, publisher=citation.publisher)
+        if isinstance(citation, Chapter):
+            # a chapter only records the title of its book
+            fields.update(container=citation.master_title, editors=citation.editors)
+        else:
+            fields['title'] = citation.master_title
+        if isinstance(citation, Dictionary):
+            # the names of a dictionary are printed as its editors
+            fields.update(authors=None, editors=citation.author)
+        if isinstance(citation, EBook):
+            fields['url'] = citation.url
+    elif isinstance(citation, Newspaper):
+        fields.update(title=citation.article_title, container=citation.master_title,
+                      day=ordinal_number(citation.day_of_publication),
+                      month=month_number(citation.month_of_publication), page=page_range(citation.page))
+    elif isinstance(citation, Thesis):
+        fields.update(title=citation.master_title, genre=citation.degree_statement,
+                      authority=citation.degree_awarding_body, publisher=citation.university,
+                      place=citation.location)
+    else:
+        raise TypeError('{} objects cannot be exported'.format(type(citation).__name__))
+    return fields
+
+
+def citation_key(citation, fields=None):
+    '''
+    Returns a stable key for a citation : first surname, year and a
+    short hash of its values. Needs no state, so equal records get
+    the same key however many are exported.
+
+    eg : 'dickson2019-3fa91c'
+    '''
+    fields = citation_fields(citation) if fields == None else fields
+    names = fields['authors'] or fields.get('editors')
+    if names != None and len(names):
+        first = names.get_parsed()[0][0]
+    else:
+        first = fields.get('title') or fields.get('container') or 'anon'
+    first = re.sub(r'[^a-z]', '', first.lower().split(' ')[0]) or 'anon'
+    text = '\x00'.join([type(citation).__name__, repr(citation.get_values())])
+    return '{}{}-{}'.format(first, fields['year'] or 'nd',
+                            hashlib.blake2b(text.encode('utf-8'), digest_size=3).hexdigest())
+
+
+def csl_names(names):
+    people = []
+    for surname, givennames, _ in names.get_parsed():
+        if givennames:
+            people.append({'family': surname, 'given': ' '.join(givennames)})
+        else:
+            # one word : an organisation
+            people.append({'literal': surname})
+    return people
+
+
+def csl_item(citation, context=None):
+    '''
+    Returns the CSL-JSON item (a dict) of a citation. The access date
+    of records with a url is taken from the context.
+    '''
+    fields = citation_fields(citation)
+    item = {'id': citation_key(citation, fields),
+            'type': next(kind for cls, kind in CSL_TYPES if isinstance(citation, cls))}
+    if fields['authors'] != None:
+        item['author'] = csl_names(fields['authors'])
+    if fields.get('editors') != None:
+        item['editor'] = csl_names(fields['editors'])
+    for field, name in (('title', 'title'), ('container', 'container-title'), ('volume', 'volume'),
+                        ('issue', 'issue'), ('page', 'page'), ('edition', 'edition'),
+                        ('publisher', 'publisher'), ('place', 'publisher-place'), ('genre', 'genre'),
+                        ('authority', 'authority'), ('url', 'URL')):
+        if fields.get(field) != None:
+            item[name] = fields[field]
+    if fields['year'] != None:
+        parts = [fields['year']]
+        if fields.get('month') != None:
+            parts.append(fields['month'])
+            if fields.get('day') != None:
+                parts.append(fields['day'])
+        item['issued'] = {'date-parts': [parts]}
+    if fields.get('url') != None:
+        access_date = (context or RenderContext()).access_date
+        item['accessed'] = {'date-parts': [[access_date.year, access_date.month, access_date.day]]}
+    return item
+
+
+def bibtex_escape(value):
+    return BIBTEX_SPECIAL.sub(lambda match: BIBTEX_ESCAPES[match.group()], str(value))
+
+
+def bibtex_names(names):
+    people = []
+    for surname, givennames, _ in names.get_parsed():
+        surname = bibtex_escape(surname)
+        if givennames:
+            people.append('{}, {}'.format(surname, bibtex_escape(' '.join(givennames))))
+        else:
+            # one word : an organisation, kept whole by the braces
+            people.append('{{{}}}'.format(surname))
+    return ' and '.join(people)
+
+
+def bibtex_entry(citation, context=None):
+    '''
+    Returns the BibTeX entry (a str) of a citation.
+    '''
+    fields = citation_fields(citation)
+    kind = next(kind for cls, kind in BIBTEX_TYPES if isinstance(citation, cls))
+    entry = []
+    if fields['authors'] != None:
+        entry.append(('author', bibtex_names(fields['authors'])))
+    if fields.get('editors') != None:
+        entry.append(('editor', bibtex_names(fields['editors'])))
+    if fields.get('title') != None:
+        entry.append(('title', bibtex_escape(fields['title'])))
+    container = fields.get('container')
+    if container != None:
+        if kind == 'article':
+            entry.append(('journal', bibtex_escape(container)))
+        elif kind == 'online':
+            entry.append(('organization', bibtex_escape(container)))
+        else:
+            entry.append(('booktitle', bibtex_escape(container)))
+    if isinstance(citation, Newspaper):
+        entry.append(('entrysubtype', 'newspaper'))
+    if fields['year'] != None:
+        entry.append(('year', str(fields['year'])))
+        if fields.get('month') != None:
+            date = '{}-{:02d}'.format(fields['year'], fields['month'])
+            if fields.get('day') != None:
+                date += '-{:02d}'.format(fields['day'])
+            entry.append(('month', str(fields['month'])))
+            entry.append(('date', date))
+    # the university of a thesis is its school, not a publisher
+    for field, name in (('volume', 'volume'), ('issue', 'number'), ('edition', 'edition'),
+                        ('publisher', 'school' if kind == 'thesis' else 'publisher'),
+                        ('genre', 'type'), ('authority', 'institution')):
+        if fields.get(field) != None:
+            entry.append((name, bibtex_escape(fields[field])))
+    if fields.get('place') != None:
+        entry.append(('address', bibtex_escape(fields['place'])))
+    if fields.get('page') != None:
+        entry.append(('pages', fields['page'].replace('-', '--')))
+    if fields.get('url') != None:
+        # url is verbatim in BibTeX, only braces must stay balanced
+        entry.append(('url', fields['url'].replace('{', '%7B').replace('}', '%7D')))
+        entry.append(('urldate', (context or RenderContext()).access_date.isoformat()))
+    return '@{}{{{},\n{}\n}}\n'.format(kind, citation_key(citation, fields), ',\n'.join(
+        '  {} = {{{}}}'.format(name, value) for name, value in entry))
+
+
+FORMATS = {'csl-json': csl_item, 'bibtex': bibtex_entry}
+
+
+def format_for(path):
+    '''
+    Returns the export format of a file name : .bib -> 'bibtex',
+    anything else -> 'csl-json'.
+    '''
+    return 'bibtex' if os.path.splitext(path)[1].lower() == '.bib' else 'csl-json'
+
+
+class Exporter:
+    '''
+    Streaming exporter of citations to CSL-JSON or BibTeX. Any mix
+    of Citation subclasses can be written, in one pass. Records are
+    serialized in blocks of buffer_records and each block is one
+    write() to the output, so memory does not grow with the number
+    of records.
+
+    A CSL-JSON export is one JSON array : it is only complete once
+    the exporter is closed.
+
+    Input : data types
+        out            -> str (path) or file object opened in text mode
+        fmt            -> 'csl-json' , 'bibtex' or None (guessed from the path)
+        context        -> RenderContext object or None (today), gives the access date
+        buffer_records -> int, records serialized before a write
+    '''
+    def __init__(self, out, fmt=None, context=None, buffer_records=BUFFER_RECORDS):
+        if fmt == None:
+            fmt = format_for(out if isinstance(out, str) else getattr(out, 'name', ''))
+        if fmt not in FORMATS:
+            raise ValueError('Only accept csl-json or bibtex format')
+        self.fmt = fmt
+        self.serialize = FORMATS[fmt]
+        self.context = RenderContext() if context == None else context
+        self.buffer_records = buffer_records
+        if isinstance(out, str):
+            self.out = open(out, 'w', encoding='utf-8', newline='\n')
+            self.owned = True
+        else:
+            self.out = out
+            self.owned = False
+        self.count = 0
+        self.closed = False
+        if fmt == 'csl-json':
+            self.out.write('[')
+
+    def _text(self, citation):
+        if self.fmt == 'csl-json':
+            text = json.dumps(self.serialize(citation, self.context), ensure_ascii=False)
+            return ('\n' if self.count == 0 else ',\n') + text
+        return ('' if self.count == 0 else '\n') + self.serialize(citation, self.context)
+
+    def write(self, citations):
+        '''
+        Writes every citation, returns the number written.
+        '''
+        written = 0
+        block = []
+        for citation in citations:
+            block.append(self._text(citation))
+            self.count += 1
+            written += 1
+            if len(block) >= self.buffer_records:
+                self.out.write(''.join(block))
+                block = []
+        if block:
+            self.out.write(''.join(block))
+        return written
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.fmt == 'csl-json':
+            self.out.write('\n]\n' if self.count else ']\n')
+        if self.owned:
+            self.out.close()
+        else:
+            self.out.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export(citations, out, fmt=None, context=None):
+    '''
+    Writes citations to out in one pass, returns the number written.
+    '''
+    with Exporter(out, fmt, context) as exporter:
+        return exporter.write(citations)
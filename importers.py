@@ -0,0 +1,489 @@
+import re
+import sys
+import time
+import unicodedata
+
+from bibliography import build_citation
+
+CHUNK_SIZE = 64 * 1024
+
+# LaTeX accent command -> combining character
+ACCENTS = {'"': '\u0308', "'": '\u0301', '`': '\u0300', '^': '\u0302', '~': '\u0303',
+           '=': '\u0304', '.': '\u0307', 'c': '\u0327', 'v': '\u030c', 'u': '\u0306', 'H': '\u030b'}
+ACCENT = re.compile(r'\\([\"\'`^~=.cvuH])\s*\{?\s*(\w)\}?')
+SYMBOLS = {'\\&': '&', '\\%': '%', '\\$': '$', '\\_': '_', '\\#': '#', '~': ' ', '--': '-'}
+ORDINAL_WORDS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6,
+                 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10}
+YEAR = re.compile(r'\d{4}')
+ENTRY_START = re.compile(r'@\s*(\w+)\s*([{(])')
+BRACES = re.compile(r'[{}]')
+BRACES_PARENTHESES = re.compile(r'[{})]')
+QUOTE_BRACES = re.compile(r'[{}"]')
+FIELD_NAME = re.compile(r'\s*,?\s*([\w\-:.]+)\s*=\s*')
+WORD = re.compile(r'[\w\-:.]+')
+HASH_SIGN = re.compile(r'\s*#\s*')
+# characters clean_latex() has something to do with
+LATEX = re.compile(r'[\\{}~\t\r\n]|--|  ')
+
+
+def clean_latex(text):
+    '''
+    Returns the plain text of a LaTeX field value : accents become
+    unicode characters, escaped symbols are unescaped and braces
+    are removed.
+
+    eg : 'Schr{\\"o}dinger \\& Sons' -> 'Schrödinger & Sons'
+    '''
+    if LATEX.search(text) == None:
+        return text.strip()
+    text = ACCENT.sub(lambda match: unicodedata.normalize('NFC', match.group(2) + ACCENTS[match.group(1)]), text)
+    for symbol, plain in SYMBOLS.items():
+        text = text.replace(symbol, plain)
+    return ' '.join(text.replace('{', '').replace('}', '').split())
+
+
+def convert_name(name):
+    '''
+    Returns a name in the 'Given Names Surname' order used by Names.
+
+    eg : 'Dickson, John Smith' -> 'John Smith Dickson'
+    '''
+    name = name.strip()
+    if ',' in name:
+        surname, _, given = name.partition(',')
+        # 'Surname, Jr., Given' : the suffix is dropped
+        given = given.split(',')[-1]
+        name = '{} {}'.format(given.strip(), surname.strip()).strip()
+    return ' '.join(name.split())
+
+
+def split_names(value, separator):
+    names = [convert_name(clean_latex(name)) for name in re.split(separator, value)]
+    return [name for name in names if name and name.lower() != 'others']
+
+
+def is_corporate(value):
+    '''
+    Returns True for a BibTeX author in double braces, eg
+    {{World Health Organization}}, which is not a person.
+    '''
+    value = value.strip()
+    return value.startswith('{') and value.endswith('}') and ' and ' not in value
+
+
+def parse_year(value):
+    match = YEAR.search(value or '')
+    return int(match.group()) if match else None
+
+
+def parse_edition(value):
+    value = (value or '').strip().lower()
+    if value.isdigit():
+        return int(value)
+    for word, number in ORDINAL_WORDS.items():
+        if value.startswith(word):
+            return number
+    match = re.match(r'(\d+)', value)
+    return int(match.group(1)) if match else None
+
+
+def parse_pages(value):
+    value = (value or '').replace('--', '-').replace('\u2013', '-').strip()
+    return value if re.fullmatch(r'\d+(-\d+)?', value) else None
+
+
+class Importer:
+    '''
+    Base of the streaming importers. Subclasses yield one dict of raw
+    fields per entry from entries(), which is then mapped to a row for
+    build_citation(). Only one entry is held in memory at a time.
+
+    Input : data types
+        source     -> str (path) or file object opened in text mode
+        errors     -> file object receiving bad entries (default stderr)
+        chunk_size -> int, characters read at once
+    '''
+    def __init__(self, source, errors=None, chunk_size=CHUNK_SIZE):
+        self.source = source
+        self.errors = sys.stderr if errors == None else errors
+        self.chunk_size = chunk_size
+        self.stats = {'entries': 0, 'errors': 0, 'skipped': 0, 'skipped_types': {}, 'seconds': 0.0,
+                      'entries_per_sec': 0.0}
+
+    def _chunks(self):
+        if isinstance(self.source, str):
+            stream = open(self.source, encoding='utf-8', errors='replace')
+        else:
+            stream = self.source
+        try:
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            if stream is not self.source:
+                stream.close()
+
+    def entries(self):
+        raise NotImplementedError
+
+    def to_row(self, entry):
+        raise NotImplementedError
+
+    def entry_type(self, entry):
+        raise NotImplementedError
+
+    def report(self, position, error):
+        self.stats['errors'] += 1
+        self.errors.write('{}:{}: {}: {}\n'.format(
+            getattr(self.source, 'name', self.source), position, type(error).__name__, error))
+
+    def skip(self, position, entry):
+        '''
+        Reports an entry of a type no citation class stands for.
+        '''
+        kind = self.entry_type(entry)
+        self.stats['skipped'] += 1
+        self.stats['skipped_types'][kind] = self.stats['skipped_types'].get(kind, 0) + 1
+        self.errors.write('{}:{}: skipped: no citation type for {}\n'.format(
+            getattr(self.source, 'name', self.source), position, kind))
+
+    def rows(self):
+        '''
+        Yields the row dict of every entry that maps to a citation type.
+        '''
+        start = time.perf_counter()
+        try:
+            for position, entry in self.entries():
+                try:
+                    row = self.to_row(entry)
+                except Exception as error:
+                    self.report(position, error)
+                    continue
+                if row == None:
+                    self.skip(position, entry)
+                    continue
+                self.stats['entries'] += 1
+                yield row
+        finally:
+            seconds = time.perf_counter() - start
+            self.stats['seconds'] = seconds
+            self.stats['entries_per_sec'] = self.stats['entries'] / seconds if seconds else 0.0
+
+    def citations(self):
+        '''
+        Yields the Citation object of every good entry.
+        '''
+        for number, row in enumerate(self.rows(), 1):
+            try:
+                yield build_citation(row)
+            except Exception as error:
+                self.report('entry {}'.format(number), error)
+
+    def __iter__(self):
+        return self.citations()
+
+
+class BibTeXImporter(Importer):
+    '''
+    Streaming BibTeX importer. @string macros are expanded,
+    @comment and @preamble are skipped.
+
+        @article                     -> Journal (EJournal with a url)
+        @book                        -> Book (EBook with a url)
+        @incollection @inbook        -> Chapter
+        @inproceedings @conference   -> Chapter (the proceedings are the book)
+        @inreference                 -> Encyclopedia
+        @phdthesis @mastersthesis    -> Thesis
+        @online @misc (with a url)   -> Website
+    '''
+    def __init__(self, source, errors=None, chunk_size=CHUNK_SIZE):
+        Importer.__init__(self, source, errors, chunk_size)
+        self.macros = {}
+
+    def entries(self):
+        '''
+        Yields (offset, fields) of every entry. fields has the lower
+        case entry type under 'ENTRYTYPE' and the key under 'ID'.
+        '''
+        buffer = ''
+        # buffer[position:] is what is left to read, offset is where buffer starts in the file
+        position = 0
+        offset = 0
+        chunks = self._chunks()
+        done = False
+        while True:
+            at = buffer.find('@', position)
+            if at >= 0:
+                end = self._entry_end(buffer, at)
+                if end != None:
+                    entry = self._parse_entry(buffer[at:end], offset + at)
+                    position = end
+                    if entry != None:
+                        yield entry
+                    continue
+                position = at
+            else:
+                position = len(buffer)
+            if done:
+                if buffer[position:].strip():
+                    self.report(offset + position, ValueError('unterminated entry'))
+                return
+            chunk = next(chunks, None)
+            if chunk == None:
+                done = True
+            else:
+                # drop what was read, the buffer only holds the current entry
+                offset += position
+                buffer = buffer[position:] + chunk
+                position = 0
+
+    @staticmethod
+    def _entry_end(text, start):
+        '''
+        Returns the position after the closing brace of the entry
+        starting at text[start], or None if it is not complete yet.
+        '''
+        opened = ENTRY_START.match(text, start)
+        if opened == None:
+            # not an entry (an @ in a comment) : skip the @ once more text is there
+            return start + 1 if len(text) - start > 64 or '\n' in text[start:] else None
+        if opened.group(2) == '{':
+            depth = 0
+            for brace in BRACES.finditer(text, opened.end() - 1):
+                depth += 1 if brace.group() == '{' else -1
+                if depth == 0:
+                    return brace.end()
+        else:
+            depth = 0
+            for brace in BRACES_PARENTHESES.finditer(text, opened.end()):
+                char = brace.group()
+                if char == ')' and depth == 0:
+                    return brace.end()
+                if char in '{}':
+                    depth += 1 if char == '{' else -1
+        return None
+
+    def _parse_entry(self, text, offset):
+        match = ENTRY_START.match(text)
+        if match == None:
+            return None
+        kind = match.group(1).lower()
+        body = text[match.end():-1]
+        if kind in ('comment', 'preamble'):
+            return None
+        if kind == 'string':
+            for field, value in self._fields(body):
+                self.macros[field] = value
+            return None
+        key, _, body = body.partition(',')
+        fields = {'ENTRYTYPE': kind, 'ID': key.strip()}
+        try:
+            for field, value in self._fields(body):
+                # names are split before cleaning, braces mark corporate authors
+                fields[field] = value if field in ('author', 'editor') else clean_latex(value)
+        except ValueError as error:
+            self.report(offset, error)
+            return None
+        return offset, fields
+
+    def _fields(self, body):
+        '''
+        Yields (name, value) of 'name = value, ...'. Values are
+        {braced}, "quoted", numbers or macros joined with #.
+        '''
+        position = 0
+        length = len(body)
+        while position < length:
+            match = FIELD_NAME.match(body, position)
+            if match == None:
+                if body[position:].strip(' \t\r\n,'):
+                    raise ValueError('cannot read field near {!r}'.format(body[position:position + 30]))
+                return
+            name = match.group(1).lower()
+            position = match.end()
+            parts = []
+            while True:
+                char = body[position:position + 1]
+                if char == '{':
+                    depth = 0
+                    for brace in BRACES.finditer(body, position):
+                        depth += 1 if brace.group() == '{' else -1
+                        if depth == 0:
+                            break
+                    else:
+                        raise ValueError('unbalanced braces in field {}'.format(name))
+                    parts.append(body[position + 1:brace.start()])
+                    position = brace.end()
+                elif char == '"':
+                    end = length
+                    depth = 0
+                    for mark in QUOTE_BRACES.finditer(body, position + 1):
+                        char = mark.group()
+                        if char == '"' and depth == 0:
+                            end = mark.start()
+                            break
+                        if char != '"':
+                            depth += 1 if char == '{' else -1
+                    parts.append(body[position + 1:end])
+                    position = end + 1
+                else:
+                    word = WORD.match(body, position)
+                    if word == None:
+                        raise ValueError('cannot read value of field {}'.format(name))
+                    parts.append(self.macros.get(word.group().lower(), word.group()))
+                    position = word.end()
+                hash_sign = HASH_SIGN.match(body, position)
+                if hash_sign == None:
+                    break
+                position = hash_sign.end()
+            yield name, ''.join(parts)
+
+    def to_row(self, fields):
+        kind = fields['ENTRYTYPE']
+        url = fields.get('url') or (fields.get('doi') and 'https://doi.org/' + fields['doi'])
+        author = split_names(fields['author'], r'\s+and\s+') if fields.get('author') else None
+        corporate = clean_latex(fields['author']) if author and is_corporate(fields['author']) else None
+        year = parse_year(fields.get('year') or fields.get('date'))
+        row = {'key': fields['ID'], 'author': author, 'year_of_publication': year}
+
+        if kind == 'article':
+            row.update(type='ejournal' if url else 'journal', title_of_article=fields.get('title'),
+                       title_of_journal=fields.get('journal') or fields.get('journaltitle'),
+                       volume_number=fields.get('volume'), part_number=fields.get('number'),
+                       page=parse_pages(fields.get('pages')), url=url)
+        elif kind in ('book', 'incollection', 'inbook', 'inreference', 'inproceedings', 'conference'):
+            row.update(type={'book': 'ebook' if url else 'book', 'inreference': 'encyclopedia'}.get(kind, 'chapter'),
+                       book_title=fields.get('booktitle') if kind != 'book' else fields.get('title'),
+                       volume=fields.get('volume'), edition=parse_edition(fields.get('edition')),
+                       place_of_publication=fields.get('address') or fields.get('location'),
+                       publisher=fields.get('publisher') or fields.get('organization'), url=url)
+            if kind != 'book':
+                row['book_title'] = row['book_title'] or fields.get('title')
+                row['editors'] = split_names(fields['editor'], r'\s+and\s+') if fields.get('editor') else None
+        elif kind in ('phdthesis', 'mastersthesis', 'thesis'):
+            school = fields.get('school') or fields.get('institution')
+            row.update(type='thesis', thesis_title=fields.get('title'),
+                       degree_statement=fields.get('type') or ('PhD thesis' if kind == 'phdthesis' else 'Masters thesis'),
+                       degree_awarding_body=fields.get('institution') or school, location=fields.get('address') or fields.get('location'),
+                       university=school)
+        elif kind in ('online', 'electronic', 'www', 'misc') and url:
+            row.update(type='website', article_title=fields.get('title'),
+                       website_name=corporate or fields.get('organization') or fields.get('publisher')
+                       or fields.get('howpublished'),
+                       url=url)
+            if corporate:
+                row['author'] = None
+        else:
+            return None
+        return row
+
+    def entry_type(self, fields):
+        return '@' + fields['ENTRYTYPE']
+
+
+class RISImporter(Importer):
+    '''
+    Streaming RIS importer.
+
+        JOUR        -> Journal      EJOUR       -> EJournal
+        BOOK        -> Book         EBOOK       -> EBook
+        CHAP        -> Chapter      ENCYC       -> Encyclopedia
+        CONF CPAPER -> Chapter (the proceedings are the book)
+        DICT        -> Dictionary   THES        -> Thesis
+        NEWS        -> Newspaper    VIDEO       -> Video
+        ELEC WEB    -> Website      BLOG        -> Blog
+    '''
+    TYPES = {'JOUR': 'journal', 'EJOUR': 'ejournal', 'JFULL': 'journal', 'MGZN': 'journal',
+             'BOOK': 'book', 'EBOOK': 'ebook', 'CHAP': 'chapter', 'ECHAP': 'chapter',
+             'CONF': 'chapter', 'CPAPER': 'chapter',
+             'ENCYC': 'encyclopedia', 'DICT': 'dictionary', 'THES': 'thesis', 'NEWS': 'newspaper',
+             'VIDEO': 'video', 'ELEC': 'website', 'WEB': 'website', 'BLOG': 'blog'}
+    TAG = re.compile(r'^([A-Z][A-Z0-9])  -( (.*))?$')
+    REPEATED = ('AU', 'A1', 'A2', 'ED', 'KW')
+
+    def entries(self):
+        '''
+        Yields (line number, tags) of every entry, tags maps each tag
+        to its value (a list for the tags that repeat).
+        '''
+        line_num = 0
+        tags = None
+        start = 0
+        rest = ''
+        for chunk in self._chunks():
+            lines = (rest + chunk).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                line_num += 1
+                match = self.TAG.match(line.rstrip('\r').lstrip('\ufeff'))
+                if match == None:
+                    continue
+                tag, value = match.group(1), (match.group(3) or '').strip()
+                if tag == 'TY':
+                    tags = {'TY': value}
+                    start = line_num
+                elif tags == None:
+                    continue
+                elif tag == 'ER':
+                    yield start, tags
+                    tags = None
+                elif tag in self.REPEATED:
+                    tags.setdefault(tag, []).append(value)
+                elif tag not in tags:
+                    tags[tag] = value
+        if tags != None:
+            self.report(start, ValueError('entry without ER line'))
+
+    def to_row(self, tags):
+        kind = self.TYPES.get(tags['TY'])
+        if kind == None:
+            return None
+        authors = [convert_name(name) for name in tags.get('AU', []) + tags.get('A1', [])]
+        editors = [convert_name(name) for name in tags.get('ED', []) + tags.get('A2', [])]
+        date = tags.get('PY') or tags.get('Y1') or tags.get('DA') or ''
+        parts = [part for part in re.split(r'[/\-]', date) if part]
+        title = tags.get('TI') or tags.get('T1')
+        secondary = tags.get('T2') or tags.get('JO') or tags.get('JF') or tags.get('BT')
+        pages = tags.get('SP')
+        if pages and tags.get('EP'):
+            pages = '{}-{}'.format(pages, tags['EP'])
+        row = {
+            'type': kind, 'key': tags.get('ID'), 'author': authors or None, 'editors': editors or None,
+            'year_of_publication': parse_year(date),
+            'month_of_publication': int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None,
+            'day_of_publication': int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None,
+            'url': tags.get('UR'), 'page': parse_pages(pages),
+            'volume_number': tags.get('VL'), 'part_number': tags.get('IS'), 'volume': tags.get('VL'),
+            'edition': parse_edition(tags.get('ET')),
+            'place_of_publication': tags.get('CY'), 'publisher': tags.get('PB'),
+        }
+        if kind in ('journal', 'ejournal'):
+            row.update(title_of_article=title, title_of_journal=secondary)
+        elif kind in ('book', 'ebook', 'dictionary'):
+            row.update(book_title=title, dictionary_title=title)
+        elif kind in ('chapter', 'encyclopedia'):
+            row.update(book_title=secondary or title)
+        elif kind == 'thesis':
+            row.update(thesis_title=title, degree_statement=tags.get('M3') or 'Thesis',
+                       degree_awarding_body=tags.get('PB'), location=tags.get('CY'), university=tags.get('PB'))
+        elif kind == 'newspaper':
+            row.update(article_title=title, newspaper_title=secondary)
+        elif kind == 'video':
+            row.update(video_title=title, channel_name=secondary or tags.get('PB'))
+        else:
+            row.update(article_title=title, blog_title=title, website_name=secondary or tags.get('PB'))
+        return row
+
+    def entry_type(self, tags):
+        return 'TY  - ' + tags['TY']
+
+
+def importer_for(path, errors=None):
+    '''
+    Returns the importer of a file from its extension (.bib or .ris).
+    '''
+    if str(path).lower().endswith('.ris'):
+        return RISImporter(path, errors)
+    return BibTeXImporter(path, errors)
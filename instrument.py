@@ -0,0 +1,239 @@
+'''
+Optional instrumentation of the citation classes.
+
+    instrumentation = Instrumentation().enable()
+    ... build and render citations ...
+    instrumentation.disable()
+    print(instrumentation.to_prometheus())
+
+While enabled, construction, end_text() and in_text() of every class
+are wrapped to count calls, errors and time them into a histogram,
+per class. Only the outermost call is timed : Video.__init__ calling
+WebDocument.__init__ is one Video construction. disable() puts the
+original methods back, so there is no cost at all when it is off.
+
+profile() runs a function under cProfile and writes a report.
+'''
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+
+from bibliography import TYPES
+
+# upper bounds of the histogram buckets in seconds : 1 us to about 1 s, doubling
+BUCKETS = tuple(1e-6 * 2 ** i for i in range(21))
+# method name -> name of the operation in the reports
+OPERATIONS = {'__init__': 'build', 'end_text': 'end_text', 'in_text': 'in_text'}
+
+
+class Timing:
+    '''
+    Count, error count, total time and histogram of one operation
+    of one class.
+    '''
+    __slots__ = ('count', 'errors', 'total', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        # one more bucket for the calls over the last bound
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds, error):
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+        low, high = 0, len(BUCKETS)
+        while low < high:
+            middle = (low + high) // 2
+            if seconds <= BUCKETS[middle]:
+                high = middle
+            else:
+                low = middle + 1
+        self.buckets[low] += 1
+
+    def percentile(self, fraction):
+        '''
+        Returns an estimate of a percentile (fraction 0 to 1) in
+        seconds, linear inside the bucket it falls in.
+        '''
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, number in enumerate(self.buckets):
+            if number and seen + number >= rank:
+                low = BUCKETS[index - 1] if index else 0.0
+                high = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1] * 2
+                return low + (high - low) * (rank - seen) / number
+            seen += number
+        return BUCKETS[-1]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.50),
+            'p90': self.percentile(0.90),
+            'p99': self.percentile(0.99),
+        }
+
+
+class Instrumentation:
+    '''
+    Times construction, end_text() and in_text() of citation classes
+    while enabled.
+
+    Input : data types
+        classes -> iterable of citation classes, or None (every class of bibliography.TYPES)
+    '''
+    def __init__(self, classes=None):
+        self.classes = list(dict.fromkeys(TYPES.values() if classes == None else classes))
+        # (class name, operation) -> Timing
+        self.timings = {}
+        self.saved = None
+        self.local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.saved != None
+
+    def _wrap(self, method, operation):
+        timings = self.timings
+        local = self.local
+        clock = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(citation, *args, **kwargs):
+            if getattr(local, operation, False):
+                # called from the same operation of a subclass : timed there
+                return method(citation, *args, **kwargs)
+            setattr(local, operation, True)
+            error = False
+            start = clock()
+            try:
+                return method(citation, *args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                seconds = clock() - start
+                setattr(local, operation, False)
+                key = (type(citation).__name__, operation)
+                timing = timings.get(key)
+                if timing == None:
+                    timing = timings[key] = Timing()
+                timing.add(seconds, error)
+        return wrapper
+
+    def enable(self):
+        '''
+        Wraps the methods, returns self.
+        '''
+        if self.enabled:
+            return self
+        # read every method before wrapping any, a subclass must not wrap the wrapper of its parent
+        found = [(cls, name, cls.__dict__.get(name), getattr(cls, name))
+                 for cls in self.classes for name in OPERATIONS]
+        self.saved = [(cls, name, own) for cls, name, own, _ in found]
+        for cls, name, _, method in found:
+            setattr(cls, name, self._wrap(method, OPERATIONS[name]))
+        return self
+
+    def disable(self):
+        '''
+        Puts the original methods back.
+        '''
+        if not self.enabled:
+            return self
+        for cls, name, own in self.saved:
+            if own == None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, own)
+        self.saved = None
+        return self
+
+    def reset(self):
+        self.timings.clear()
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def stats(self):
+        '''
+        Returns {class name: {operation: {count, errors, total, mean, p50, p90, p99}}},
+        times in seconds.
+        '''
+        stats = {}
+        for (name, operation), timing in sorted(self.timings.items()):
+            stats.setdefault(name, {})[operation] = timing.as_dict()
+        return stats
+
+    def to_json(self):
+        return json.dumps(self.stats(), indent=1, sort_keys=True)
+
+    def to_prometheus(self, prefix='harvard_ref'):
+        '''
+        Returns the timings in the Prometheus text format : one
+        histogram of call seconds and one error counter, labelled
+        by class and operation.
+        '''
+        lines = ['# HELP {}_call_seconds Time of citation construction and rendering.'.format(prefix),
+                 '# TYPE {}_call_seconds histogram'.format(prefix)]
+        errors = ['# HELP {}_errors_total Calls that raised an exception.'.format(prefix),
+                  '# TYPE {}_errors_total counter'.format(prefix)]
+        for (name, operation), timing in sorted(self.timings.items()):
+            labels = 'type="{}",op="{}"'.format(name, operation)
+            cumulative = 0
+            for bound, number in zip(BUCKETS, timing.buckets):
+                cumulative += number
+                lines.append('{}_call_seconds_bucket{{{},le="{:.6g}"}} {}'.format(prefix, labels, bound, cumulative))
+            lines.append('{}_call_seconds_bucket{{{},le="+Inf"}} {}'.format(prefix, labels, timing.count))
+            lines.append('{}_call_seconds_sum{{{}}} {!r}'.format(prefix, labels, timing.total))
+            lines.append('{}_call_seconds_count{{{}}} {}'.format(prefix, labels, timing.count))
+            errors.append('{}_errors_total{{{}}} {}'.format(prefix, labels, timing.errors))
+        return '\n'.join(lines + errors) + '\n'
+
+    def write(self, path):
+        '''
+        Writes the timings to a file, Prometheus text for .prom or
+        .txt files, JSON otherwise.
+        '''
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json() + '\n'
+        with open(path, 'w', encoding='utf-8') as out:
+            out.write(text)
+
+
+def profile(function, *args, report=None, sort='cumulative', limit=40, **kwargs):
+    '''
+    Runs function(*args, **kwargs) under cProfile and returns its
+    result. The report is written to report : a .prof path gets the
+    raw stats (for snakeviz, pstats ...), any other path or a file
+    object gets the text of the `limit` costliest functions.
+    '''
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        if isinstance(report, str) and report.endswith('.prof'):
+            profiler.dump_stats(report)
+        else:
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats(sort).print_stats(limit)
+            if isinstance(report, str):
+                with open(report, 'w', encoding='utf-8') as out:
+                    out.write(text.getvalue())
+            elif report != None:
+                report.write(text.getvalue())
@@ -0,0 +1,121 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from CLI_approach import Citation, RenderContext
+from bibliography import render_row
+
+
+def _render_chunk(chunk, context):
+    '''
+    Runs in a worker process. Renders a list of (key, record) where
+    record is a row dict or a Citation object.
+
+    Returns (pid, seconds, results) where every result is either
+    ('ok', end_text, in_text) or ('error', key, kind, message).
+    '''
+    start = time.perf_counter()
+    results = []
+    for key, record in chunk:
+        try:
+            if isinstance(record, Citation):
+                results.append(('ok', record.end_text(context=context), record.in_text()))
+            else:
+                results.append(('ok',) + render_row(record, context))
+        except Exception as error:
+            results.append(('error', key, type(error).__name__, str(error)))
+    return os.getpid(), time.perf_counter() - start, results
+
+
+class ParallelRenderer:
+    '''
+    Renders records across a pool of worker processes.
+    Records are sent in chunks and the output keeps the order of
+    the input, so it is the same as rendering them one by one.
+
+    Input : data types
+        workers     -> int or None (number of CPUs)
+        chunksize   -> int, records per chunk sent to a worker
+        context     -> RenderContext object or None (a new one for every render)
+    '''
+    def __init__(self, workers=None, chunksize=1000, context=None):
+        if chunksize < 1:
+            raise ValueError('chunksize must be at least 1')
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.context = context
+        self.stats = {}
+
+    def _chunks(self, records):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    def _record(self, pid, seconds, count):
+        stat = self.stats.setdefault(pid, {'chunks': 0, 'records': 0, 'seconds': 0.0})
+        stat['chunks'] += 1
+        stat['records'] += count
+        stat['seconds'] += seconds
+        stat['records_per_sec'] = stat['records'] / stat['seconds'] if stat['seconds'] else 0.0
+
+    def render_keyed(self, records, on_error=None):
+        '''
+        Yields tuples (end_text, in_text) in input order.
+
+        input :
+            records  -> iterable of (key, row dict or Citation)
+            on_error -> function(key, kind, message) called for every bad
+                        record, which is then skipped
+        '''
+        self.stats = {}
+        # one context for the whole run, sent to every worker
+        context = RenderContext() if self.context == None else self.context
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            chunks = self._chunks(records)
+            # keep a bounded number of chunks in flight so memory stays flat
+            for chunk in islice(chunks, self.workers * 2):
+                pending.append(pool.submit(_render_chunk, chunk, context))
+            while pending:
+                pid, seconds, results = pending.popleft().result()
+                for chunk in islice(chunks, 1):
+                    pending.append(pool.submit(_render_chunk, chunk, context))
+                self._record(pid, seconds, len(results))
+                for result in results:
+                    if result[0] == 'ok':
+                        yield result[1], result[2]
+                    elif on_error != None:
+                        on_error(*result[1:])
+
+    def render(self, records, on_error=None):
+        '''
+        Yields tuples (end_text, in_text) in input order.
+        Keys given to on_error are the positions of the records.
+
+        input :
+            records -> iterable of row dicts or Citation objects
+        '''
+        return self.render_keyed(enumerate(records), on_error)
+
+    def render_bibliography(self, bibliography):
+        '''
+        Same as Bibliography.render(), rendered in parallel : with
+        validate on, rows that fail the validation are left out. Bad
+        rows are reported to the bibliography error stream.
+        '''
+        return self.render_keyed(bibliography.checked_rows(), bibliography.write_error)
+
+    def report(self):
+        '''
+        Returns a string with the throughput of every worker.
+        '''
+        lines = ['{:>8} {:>7} {:>10} {:>10} {:>12}'.format('pid', 'chunks', 'records', 'seconds', 'records/s')]
+        for pid, stat in sorted(self.stats.items()):
+            lines.append('{:>8} {:>7} {:>10} {:>10.3f} {:>12.0f}'.format(
+                pid, stat['chunks'], stat['records'], stat['seconds'], stat['records_per_sec']))
+        return '\n'.join(lines)
@@ -0,0 +1,143 @@
+import heapq
+import json
+import os
+import tempfile
+import unicodedata
+
+from CLI_approach import RenderContext
+
+# separates the parts of a sort key, sorts before every printable character
+SEPARATOR = '\x00'
+
+
+def collation_key(text):
+    '''
+    Returns the key used to compare strings : accents removed and
+    case folded, so that 'Ünal' sorts with 'Unal' and 'de Vries'
+    with 'De Vries'.
+    '''
+    text = unicodedata.normalize('NFKD', str(text))
+    return ''.join([char for char in text if not unicodedata.combining(char)]).casefold()
+
+
+def sort_key(citation):
+    '''
+    Returns the Harvard sort key of a citation as one str :
+    surnames of the authors (or the title taking their place),
+    then the year, then the title.
+    '''
+    if citation.author == None:
+        names = [citation.master_title]
+    else:
+        names = citation.author.get_famname()
+    year = str(citation.year_of_publication).zfill(4)
+    return SEPARATOR.join([collation_key(SEPARATOR.join(names)), year, collation_key(citation.master_title)])
+
+
+class ReferenceList:
+    '''
+    Builds a sorted Harvard reference list of end-text citations.
+
+    The sort key and the end-text of every citation are worked out
+    once when it is added. When the pending entries go over the
+    memory budget they are sorted and written to a temporary file
+    (a run), and iterating merges every run, so the list can be
+    much bigger than the memory.
+
+    Input : data types
+        memory_budget -> int, approximate bytes kept in memory
+        markup        -> markup given to end_text()
+        context       -> RenderContext object or None (today)
+        tmpdir        -> str or None, where runs are written
+    '''
+    def __init__(self, memory_budget=64 * 1024 * 1024, markup='text', context=None, tmpdir=None):
+        self.memory_budget = memory_budget
+        self.markup = markup
+        self.context = RenderContext() if context == None else context
+        self.tmpdir = tmpdir
+        self.pending = []
+        self.pending_size = 0
+        self.runs = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, citation):
+        key = sort_key(citation)
+        text = citation.end_text(self.markup, self.context)
+        self.pending.append((key, text))
+        # rough size of the tuple, the two str and the list slot
+        self.pending_size += 2 * (len(key) + len(text)) + 200
+        self.count += 1
+        if self.pending_size > self.memory_budget:
+            self.spill()
+
+    def extend(self, citations):
+        for citation in citations:
+            self.add(citation)
+
+    def spill(self):
+        '''
+        Sorts the pending entries and writes them as a run.
+        '''
+        if not self.pending:
+            return
+        self.pending.sort(key=lambda entry: entry[0])
+        handle, path = tempfile.mkstemp(prefix='reflist-', suffix='.run', dir=self.tmpdir)
+        with os.fdopen(handle, 'w', encoding='utf-8') as run:
+            run.writelines([json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.pending])
+        self.runs.append(path)
+        self.pending = []
+        self.pending_size = 0
+
+    @staticmethod
+    def _read_run(path):
+        with open(path, encoding='utf-8') as run:
+            for line in run:
+                yield tuple(json.loads(line))
+
+    def entries(self):
+        '''
+        Yields tuples (sort key, end_text) in order.
+        Entries with the same key keep the order they were added in.
+        '''
+        self.pending.sort(key=lambda entry: entry[0])
+        if not self.runs:
+            yield from self.pending
+            return
+        sources = [self._read_run(path) for path in self.runs] + [iter(self.pending)]
+        yield from heapq.merge(*sources, key=lambda entry: entry[0])
+
+    def __iter__(self):
+        for _, text in self.entries():
+            yield text
+
+    def close(self):
+        '''
+        Removes the temporary runs.
+        '''
+        for path in self.runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.runs = []
+        self.pending = []
+        self.pending_size = 0
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def sorted_references(citations, memory_budget=64 * 1024 * 1024, markup='text', context=None):
+    '''
+    Yields the end-text citations sorted by surname, year and title.
+    '''
+    with ReferenceList(memory_budget, markup, context) as references:
+        references.extend(citations)
+        yield from references
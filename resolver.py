@@ -0,0 +1,503 @@
+import asyncio
+import html.parser
+import json
+import re
+import sqlite3
+import ssl
+import sys
+import time
+from collections import deque
+from urllib.parse import quote, urljoin, urlsplit
+
+from importers import convert_name, parse_year
+
+DOI = re.compile(r'^(?:doi:\s*|https?://(?:dx\.)?doi\.org/)?(10\.\d{4,9}/\S+)$', re.IGNORECASE)
+CSL_JSON = 'application/vnd.citationstyles.csl+json'
+USER_AGENT = 'harvard-ref-resolver/1.0'
+MAX_REDIRECTS = 5
+# statuses that stay true : the rest (429, 503, ...) are asked again
+CACHED_STATUSES = (200, 404, 410)
+# end of the identifiers : None is an identifier like any other
+_END = object()
+
+RESPONSES = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url          TEXT PRIMARY KEY,
+    status       INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    body         BLOB NOT NULL,
+    fetched      REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+
+class HTTPError(Exception):
+    pass
+
+
+class ConnectionPool:
+    '''
+    Keep-alive HTTP/1.1 connections, pooled per host. A connection
+    goes back to the pool once its response is read, so a batch of
+    requests to one host reuses a few sockets instead of opening one
+    per request.
+
+    Input : data types
+        per_host -> int, connections open at once to one host
+        timeout  -> float, seconds to connect, then seconds for one request
+    '''
+    def __init__(self, per_host=4, timeout=10.0):
+        self.per_host = per_host
+        self.timeout = timeout
+        # (scheme, host, port) -> list of idle (reader, writer)
+        self.idle = {}
+        self.limits = {}
+        self.ssl = None
+        self.opened = 0
+
+    async def _connect(self, scheme, host, port):
+        context = None
+        if scheme == 'https':
+            if self.ssl == None:
+                self.ssl = ssl.create_default_context()
+            context = self.ssl
+        self.opened += 1
+        # a host that does not answer must not hold the lookup longer than a request
+        return await asyncio.wait_for(asyncio.open_connection(host, port, ssl=context), self.timeout)
+
+    async def request(self, url, headers=None):
+        '''
+        Returns (status, headers, body) of a GET request. Header
+        names are lower case, body is bytes.
+        '''
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise HTTPError('unsupported url {!r}'.format(url))
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        lines = ['GET {} HTTP/1.1'.format(path), 'Host: {}'.format(parts.netloc),
+                 'User-Agent: {}'.format(USER_AGENT), 'Accept-Encoding: identity', 'Connection: keep-alive']
+        lines += ['{}: {}'.format(name, value) for name, value in (headers or {}).items()]
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        if key not in self.limits:
+            self.limits[key] = asyncio.Semaphore(self.per_host)
+        async with self.limits[key]:
+            idle = self.idle.setdefault(key, [])
+            while True:
+                reused = bool(idle)
+                try:
+                    reader, writer = idle.pop() if reused else await self._connect(*key)
+                except asyncio.TimeoutError as error:
+                    raise HTTPError('{}: connection timed out'.format(url)) from error
+                try:
+                    writer.write(message)
+                    status, response, body, keep = await asyncio.wait_for(self._read(reader), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError, HTTPError) as error:
+                    writer.close()
+                    if reused:
+                        # the server closed the idle connection : try again on a new one
+                        continue
+                    raise HTTPError('{}: {}'.format(url, error or type(error).__name__)) from error
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep:
+                    idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, response, body
+
+    @staticmethod
+    async def _read(reader):
+        line = await reader.readline()
+        if not line:
+            raise HTTPError('connection closed')
+        version, status = line.decode('latin-1').split(' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # trailers
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep = False
+        return int(status), headers, body, keep
+
+    def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle = {}
+
+
+class RateLimiter:
+    '''
+    Spaces the requests to each host at least 1/rate seconds apart.
+    '''
+    def __init__(self, rate=None):
+        self.interval = 0 if not rate else 1.0 / rate
+        self.next = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next.get(host, 0))
+        self.next[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ResponseCache:
+    '''
+    On disk cache of HTTP responses (SQLite), so resolving the same
+    list again sends no request. Only successful responses and the
+    not found ones are cached, a transient error is asked again.
+
+    Input : data types
+        path    -> str, SQLite file or ':memory:'
+        max_age -> float, seconds a response stays valid, None for ever
+    '''
+    def __init__(self, path=':memory:', max_age=None):
+        self.max_age = max_age
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(RESPONSES)
+
+    def get(self, url):
+        found = self.db.execute('SELECT status, content_type, body, fetched FROM responses WHERE url = ?',
+                                (url,)).fetchone()
+        if found == None or self.max_age != None and time.time() - found[3] > self.max_age:
+            return None
+        return found[:3]
+
+    def put(self, url, status, content_type, body):
+        self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                        (url, status, content_type, body, time.time()))
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+class MetaParser(html.parser.HTMLParser):
+    '''
+    Collects the <meta> tags and the <title> of the head of a page.
+    '''
+    def __init__(self):
+        html.parser.HTMLParser.__init__(self, convert_charrefs=True)
+        # meta name or property (lower case) -> list of contents
+        self.meta = {}
+        self.title = ''
+        self.in_title = False
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            name = attrs.get('name') or attrs.get('property')
+            if name and attrs.get('content'):
+                self.meta.setdefault(name.lower(), []).append(attrs['content'].strip())
+        elif tag == 'title':
+            self.in_title = True
+        elif tag == 'body':
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        elif tag == 'head':
+            self.done = True
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+
+    def first(self, *names):
+        for name in names:
+            if self.meta.get(name):
+                return self.meta[name][0]
+        return None
+
+
+def csl_names(people):
+    names = []
+    for person in people or ():
+        if person.get('literal'):
+            names.append(person['literal'])
+        else:
+            name = ' '.join(part for part in (person.get('given'), person.get('family')) if part)
+            if name:
+                names.append(name)
+    return names or None
+
+
+def csl_year(item):
+    for field in ('issued', 'published-print', 'published-online', 'created'):
+        parts = (item.get(field) or {}).get('date-parts')
+        if parts and parts[0] and parts[0][0]:
+            return int(parts[0][0])
+    return None
+
+
+def number(value):
+    value = str(value or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def csl_to_row(item, url):
+    '''
+    Returns the row of a CSL-JSON item : an ejournal for journal
+    articles, a website for anything else.
+    '''
+    def text(field):
+        value = item.get(field)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        return value.strip() if isinstance(value, str) else value
+
+    row = {'author': csl_names(item.get('author')), 'year_of_publication': csl_year(item),
+           'url': text('URL') or url}
+    if item.get('type') in ('article-journal', 'article') and text('container-title'):
+        page = text('page')
+        row.update(type='ejournal', title_of_article=text('title'), title_of_journal=text('container-title'),
+                   volume_number=number(item.get('volume')), part_number=number(item.get('issue')),
+                   page=page if page and re.fullmatch(r'\d+(-\d+)?', page) else None)
+    else:
+        row.update(type='website', article_title=text('title'),
+                   website_name=text('container-title') or text('publisher') or urlsplit(row['url']).hostname)
+    return row
+
+
+def meta_to_row(parser, url):
+    '''
+    Returns the row of an HTML page from its citation_*, Open Graph
+    and Dublin Core meta tags.
+    '''
+    authors = parser.meta.get('citation_author') or parser.meta.get('dc.creator') or parser.meta.get('author')
+    row = {'author': [convert_name(name) for name in authors] if authors else None,
+           'year_of_publication': parse_year(parser.first('citation_publication_date', 'citation_date',
+                                                          'article:published_time', 'dc.date')),
+           'url': url}
+    title = parser.first('citation_title', 'og:title', 'dc.title') or ' '.join(parser.title.split()) or None
+    journal = parser.first('citation_journal_title')
+    if journal:
+        first, last = parser.first('citation_firstpage'), parser.first('citation_lastpage')
+        page = None
+        if number(first) != None:
+            page = first if number(last) == None else '{}-{}'.format(first, last)
+        row.update(type='ejournal', title_of_article=title, title_of_journal=journal,
+                   volume_number=number(parser.first('citation_volume')),
+                   part_number=number(parser.first('citation_issue')), page=page)
+    else:
+        row.update(type='website', article_title=title,
+                   website_name=parser.first('og:site_name', 'application-name', 'dc.publisher')
+                   or urlsplit(url).hostname)
+    return row
+
+
+class Resolver:
+    '''
+    Fetches the metadata of URLs and DOIs concurrently and turns it
+    into rows for build_citation() (Website or EJournal records).
+
+    Without an endpoint, DOIs are asked to doi.org as CSL-JSON and
+    URLs are fetched and read from their meta tags. With an endpoint
+    every identifier is sent to it and a CSL-JSON item is expected.
+
+    Input : data types
+        endpoint    -> str with an {id} field (url quoted) or None
+        concurrency -> int, requests in flight at once
+        per_host    -> int, connections open at once to one host
+        rate        -> float, requests per second to one host, None for no limit
+        cache       -> str, path of the response cache, or None
+        timeout     -> float, seconds for one request
+        errors      -> file object receiving failed lookups (default stderr)
+    '''
+    def __init__(self, endpoint=None, concurrency=32, per_host=8, rate=None, cache=None,
+                 timeout=10.0, errors=None):
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.pool = ConnectionPool(per_host, timeout)
+        self.limiter = RateLimiter(rate)
+        self.cache = None if cache == None else ResponseCache(cache)
+        self.errors = sys.stderr if errors == None else errors
+        self.stats = {'resolved': 0, 'errors': 0, 'requests': 0, 'cache_hits': 0,
+                      'seconds': 0.0, 'requests_per_sec': 0.0}
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def target(self, identifier):
+        '''
+        Returns (request url, accept header, page url) of an identifier.
+        '''
+        identifier = identifier.strip()
+        doi = DOI.match(identifier)
+        page = 'https://doi.org/' + doi.group(1) if doi else identifier
+        if self.endpoint != None:
+            return self.endpoint.format(id=quote(doi.group(1) if doi else identifier, safe='')), 'application/json', page
+        if doi:
+            return page, CSL_JSON, page
+        return identifier, 'text/html,application/xhtml+xml', page
+
+    async def fetch(self, url, accept):
+        '''
+        Returns (status, content type, body) of a url, from the cache
+        or the network, following redirects.
+        '''
+        if self.cache != None:
+            found = self.cache.get(url)
+            # caches written before CACHED_STATUSES may hold transient errors
+            if found != None and found[0] in CACHED_STATUSES:
+                self.stats['cache_hits'] += 1
+                return found
+        location = url
+        for _ in range(MAX_REDIRECTS + 1):
+            await self.limiter.wait(urlsplit(location).hostname)
+            async with self.semaphore:
+                status, headers, body = await self.pool.request(location, {'Accept': accept})
+            self.stats['requests'] += 1
+            if status in (301, 302, 303, 307, 308) and 'location' in headers:
+                location = urljoin(location, headers['location'])
+                continue
+            break
+        else:
+            raise HTTPError('{}: too many redirects'.format(url))
+        content_type = headers.get('content-type', '')
+        if self.cache != None and status in CACHED_STATUSES:
+            self.cache.put(url, status, content_type, body)
+        return status, content_type, body
+
+    async def resolve_one(self, identifier):
+        '''
+        Returns the row of one URL or DOI, None for an empty one.
+        '''
+        if identifier == None or not identifier.strip():
+            return None
+        url, accept, page = self.target(identifier)
+        status, content_type, body = await self.fetch(url, accept)
+        if status != 200:
+            raise HTTPError('{}: HTTP {}'.format(url, status))
+        charset = re.search(r'charset=([\w\-]+)', content_type)
+        text = body.decode(charset.group(1) if charset else 'utf-8', errors='replace')
+        if 'json' in content_type or text.lstrip()[:1] in ('{', '['):
+            item = json.loads(text)
+            if isinstance(item, list):
+                item = item[0] if item else {}
+            try:
+                return csl_to_row(item, page)
+            except (AttributeError, TypeError) as error:
+                # not a CSL-JSON item, e.g. [1] or an author that is a string
+                raise ValueError('{}: unexpected JSON: {}'.format(url, error)) from error
+        parser = MetaParser()
+        # the head is enough, feed the page in pieces and stop there
+        for start in range(0, len(text), 16 * 1024):
+            parser.feed(text[start:start + 16 * 1024])
+            if parser.done:
+                break
+        return meta_to_row(parser, page)
+
+    async def resolve(self, identifiers):
+        '''
+        Yields (identifier, row, error) for every identifier, in order.
+        row is None when the lookup failed. At most a few times
+        concurrency lookups are pending, so any number of identifiers
+        can be streamed through.
+        '''
+        start = time.perf_counter()
+        window = deque()
+        identifiers = iter(identifiers)
+        try:
+            while True:
+                while len(window) < 4 * self.concurrency:
+                    identifier = next(identifiers, _END)
+                    if identifier is _END:
+                        break
+                    window.append((identifier, asyncio.ensure_future(self.resolve_one(identifier))))
+                if not window:
+                    break
+                identifier, task = window.popleft()
+                try:
+                    row = await task
+                except (HTTPError, OSError, asyncio.TimeoutError, ValueError, UnicodeError) as error:
+                    self.stats['errors'] += 1
+                    self.errors.write('{}: {}: {}\n'.format(identifier, type(error).__name__, error))
+                    yield identifier, None, error
+                    continue
+                if row != None:
+                    self.stats['resolved'] += 1
+                yield identifier, row, None
+        finally:
+            for _, task in window:
+                task.cancel()
+            if self.cache != None:
+                self.cache.commit()
+            self.stats['seconds'] += time.perf_counter() - start
+            if self.stats['seconds']:
+                self.stats['requests_per_sec'] = self.stats['requests'] / self.stats['seconds']
+
+    async def fill(self, rows):
+        '''
+        Yields every row with its missing fields filled from the
+        metadata of its `doi` or `url`. Fields already set are kept,
+        rows with neither are passed through.
+        '''
+        rows = iter(rows)
+        pending = deque()
+
+        def identifiers():
+            for row in rows:
+                pending.append(row)
+                identifier = row.get('doi') or row.get('url')
+                # rows without an identifier still go through, in order
+                yield identifier or ''
+
+        async for identifier, found, _ in self.resolve(identifiers()):
+            row = pending.popleft()
+            if found != None:
+                for field, value in found.items():
+                    if row.get(field) in (None, ''):
+                        row[field] = value
+            yield row
+
+    def close(self):
+        self.pool.close()
+        if self.cache != None:
+            self.cache.close()
+
+
+def resolve_all(identifiers, **options):
+    '''
+    Returns a list of (identifier, row, error) for every identifier,
+    the options are those of Resolver.
+    '''
+    async def run():
+        resolver = Resolver(**options)
+        try:
+            return [result async for result in resolver.resolve(identifiers)]
+        finally:
+            resolver.close()
+    return asyncio.run(run())
@@ -0,0 +1,216 @@
+import difflib
+import io
+import re
+
+from disambiguation import CitationIndex
+
+# one part of a parenthetical citation : Name, 2019a or Name, n.d. (page numbers allowed)
+CITE_PART = re.compile(r'^\s*(?P<cite>(?P<name>[^\d,;()][^;()]*?),\s*(?P<year>\d{4}[a-z]{0,2}|n\.d\.[a-z]{0,2}))'
+                       r'(?:\s*,\s*pp?\.\s*[\w\-]+)?\s*$')
+PARENTHESES = re.compile(r'\(([^()\n]{1,300})\)')
+# a block read from the stream is cut at a line end, but never inside an open bracket
+MAX_BUFFER = 1024 * 1024
+
+
+class Automaton:
+    '''
+    Aho-Corasick automaton : finds every occurrence of many patterns
+    in one pass over the text, whatever the number of patterns.
+
+    Input : data types
+        patterns -> list of str
+    '''
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for number, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                following = self.goto[state].get(char)
+                if following == None:
+                    following = self.goto[state][char] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = following
+            self.out[state] += (number,)
+
+        # breadth first, so the fail state of a parent is always ready
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[following] = target if target != following else 0
+                self.out[following] += self.out[self.fail[following]]
+
+        # from the root only the first characters of the patterns can match,
+        # the regex engine skips to the next one of them
+        self.starts = re.compile('[{}]'.format(''.join(re.escape(char) for char in self.goto[0])) or '(?!)')
+
+    def search(self, text, offset=0):
+        '''
+        Yields tuples (start offset, pattern number) of every match.
+        '''
+        goto, fail, out, patterns = self.goto, self.fail, self.out, self.patterns
+        skip = self.starts.search
+        state = 0
+        position = 0
+        length = len(text)
+        while position < length:
+            if state == 0:
+                start = skip(text, position)
+                if start == None:
+                    return
+                position = start.start()
+            char = text[position]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                for number in out[state]:
+                    yield offset + position - len(patterns[number]) + 1, number
+            position += 1
+
+
+class ScanReport:
+    '''
+    Result of scanning a manuscript.
+
+        found     -> dict, citation -> list of offsets where it is cited
+        missing   -> list of (offset, text) cited but with no bibliography entry
+        near_miss -> list of (offset, text, expected) close to an entry but not equal
+        unused    -> list of bibliography citations never cited
+        labels    -> dict, citation -> in-text form used in the manuscript
+    '''
+    def __init__(self, labels):
+        self.labels = labels
+        self.found = {}
+        self.missing = []
+        self.near_miss = []
+        self.unused = []
+
+    def as_dict(self):
+        return {
+            'found': {self.labels[citation]: offsets for citation, offsets in self.found.items()},
+            'missing': [{'offset': offset, 'text': text} for offset, text in self.missing],
+            'near_miss': [{'offset': offset, 'text': text, 'expected': expected}
+                          for offset, text, expected in self.near_miss],
+            'unused': [self.labels[citation] for citation in self.unused],
+        }
+
+
+class CitationScanner:
+    '''
+    Cross-checks the in-text citations of manuscripts against a
+    bibliography. The patterns of every entry (Smith, 2019 and the
+    narrative form Smith (2019)) are compiled once into one automaton,
+    then each manuscript is streamed through it in a single pass.
+
+    Input : data types
+        citations -> iterable of Citation objects, or a CitationIndex
+                     (year suffixes are then part of the patterns)
+    '''
+    def __init__(self, citations):
+        self.index = citations if isinstance(citations, CitationIndex) else CitationIndex(citations)
+        self.citations = list(self.index.keys)
+        patterns = []
+        self.owners = []
+        self.expected = {}
+        self.by_year = {}
+        self.by_initial = {}
+        self.labels = {}
+        for citation in self.citations:
+            cite = self.index.in_text(citation)[1:-1]
+            name, year = cite.rsplit(', ', 1)
+            for pattern in (cite, '{} ({})'.format(name, year)):
+                patterns.append(pattern)
+                self.owners.append(citation)
+            self.expected[cite] = citation
+            self.labels[citation] = cite
+            self.by_year.setdefault(year, []).append(cite)
+            self.by_initial.setdefault(cite[:1].lower(), []).append(cite)
+        self.automaton = Automaton(patterns)
+        # cite -> closest expected cite, the same mistakes come back often
+        self.closest = {}
+
+    def _blocks(self, stream, chunk_size):
+        '''
+        Yields (offset, block) of the text, cut at line ends so a
+        bracket is never split between two blocks.
+        '''
+        offset = 0
+        buffer = ''
+        while True:
+            chunk = stream.read(chunk_size)
+            buffer += chunk
+            if not chunk:
+                if buffer:
+                    yield offset, buffer
+                return
+            cut = buffer.rfind('\n')
+            opened = buffer.rfind('(', 0, cut)
+            if opened > buffer.rfind(')', 0, cut):
+                cut = buffer.rfind('\n', 0, opened)
+            if cut < 0:
+                if len(buffer) < MAX_BUFFER:
+                    continue
+                cut = len(buffer) - 1
+            yield offset, buffer[:cut + 1]
+            offset += cut + 1
+            buffer = buffer[cut + 1:]
+
+    def _closest(self, cite, year):
+        if cite in self.closest:
+            return self.closest[cite]
+        candidates = self.by_year.get(year)
+        if candidates == None:
+            # no entry of that year, maybe a typo in the year : only the
+            # names with the same initial, not the whole bibliography
+            candidates = self.by_initial.get(cite[:1].lower(), ())
+        close = difflib.get_close_matches(cite, candidates, n=1, cutoff=0.8)
+        self.closest[cite] = close[0] if close else None
+        return self.closest[cite]
+
+    def scan(self, manuscript, chunk_size=64 * 1024):
+        '''
+        Returns a ScanReport for a manuscript.
+
+        input :
+            manuscript -> str or file object opened in text mode
+        '''
+        stream = io.StringIO(manuscript) if isinstance(manuscript, str) else manuscript
+        report = ScanReport(self.labels)
+        found = report.found
+        owners, patterns = self.owners, self.automaton.patterns
+        for offset, block in self._blocks(stream, chunk_size):
+            text = block.replace('\n', ' ')
+            for start, number in self.automaton.search(text):
+                end = start + len(patterns[number])
+                # whole words only : Smith, 2019 is not part of McSmith, 2019a
+                if start and text[start - 1].isalnum() or end < len(text) and text[end].isalnum():
+                    continue
+                found.setdefault(owners[number], []).append(offset + start)
+
+            for bracket in PARENTHESES.finditer(text):
+                position = bracket.start(1)
+                for part in bracket.group(1).split(';'):
+                    match = CITE_PART.match(part)
+                    if match != None:
+                        cite = match.group('cite')
+                        if cite not in self.expected:
+                            where = offset + position + match.start('cite')
+                            expected = self._closest(cite, match.group('year'))
+                            if expected == None:
+                                report.missing.append((where, cite))
+                            else:
+                                report.near_miss.append((where, cite, expected))
+                    position += len(part) + 1
+
+        report.unused = [citation for citation in self.citations if citation not in found]
+        return report
@@ -0,0 +1,427 @@
+'''
+In-memory search index over the titles, surnames, publishers and
+years of citation records, for lookups while writing.
+
+    index = SearchIndex()
+    number = index.add(citation)
+    index.search('dicks econ 2019', k=10)   -> [(number, score), ...]
+    index.remove(number)
+
+Every word of the query must match a record : as the exact word,
+then, when that gives fewer than k records, as the start of a word
+(3 characters or more), and when nothing matches at all, as a word
+one typo away (found through a table of the words less one
+character, see deletions()). A query word can be limited to one
+field : author:dick, title:econ, publisher:..., year:2019.
+
+The score of a record is the sum, over the query words, of the
+weight of the field matched times the weight of the match. Records
+are found best score first : the postings of the best matches are
+intersected first, and the search stops once k records are found,
+so common words do not cost a pass over their whole posting.
+
+The index holds millions of small sets : a long lived process can
+call gc.freeze() once it is built, so that full collections do not
+walk them again and again between queries.
+'''
+import bisect
+import heapq
+from itertools import chain, islice
+
+from dedup import normalize
+from exporters import citation_fields
+
+FIELDS = {'title': 2.0, 'author': 3.0, 'publisher': 1.0, 'year': 1.5}
+EXACT = 1.0
+PREFIX = 0.6
+FUZZY = 0.4
+# query words shorter than this only match whole words, or without typo
+PREFIX_MIN = 3
+FUZZY_MIN = 4
+# most frequent words a prefix (or a misspelt word) stands for, out of the first MAX_SCAN
+MAX_EXPANSIONS = 50
+MAX_SCAN = 2000
+# words added or removed before the sorted word list is sorted again
+MERGE_WORDS = 512
+# records of a level over which it is walked until k records are found rather than intersected,
+# when they are common in the other levels or over MAX_WALK
+SCAN_FROM = 1024
+MAX_WALK = 8192
+# records walked at a time ; a walk gives up with what it found after MAX_WALK checks of a
+# record against a posting
+WALK_STEP = 256
+# too common to be worth an index entry
+STOPWORDS = frozenset(('a', 'an', 'and', 'the', 'of', 'in', 'on', 'for', 'to', 'at', 'by', 'with'))
+
+
+def deletions(word):
+    '''
+    Returns the set of word and of the words made by deleting one of
+    its characters. Two words one typo apart share one of them.
+    '''
+    return {word[:i] + word[i + 1:] for i in range(len(word))} | {word}
+
+
+def one_typo(first, second):
+    '''
+    Returns True if two different words are one typo apart : one
+    character changed, added, removed, or two neighbours swapped.
+    '''
+    if len(first) < len(second):
+        first, second = second, first
+    if len(first) - len(second) > 1:
+        return False
+    i = 0
+    while i < len(second) and first[i] == second[i]:
+        i += 1
+    if len(first) != len(second):
+        return first[i + 1:] == second[i:]
+    if first[i + 1:] == second[i + 1:]:
+        return True
+    return (first[i + 2:] == second[i + 2:] and first[i:i + 1] == second[i + 1:i + 2]
+            and first[i + 1:i + 2] == second[i:i + 1])
+
+
+def citation_terms(citation):
+    '''
+    Returns the set of (field, word) of a citation.
+    '''
+    fields = citation_fields(citation)
+    terms = set()
+    for name in ('authors', 'editors'):
+        if fields.get(name) != None:
+            for surname in fields[name].get_famname():
+                terms.update(('author', word) for word in normalize(surname).split())
+    for name, text in (('title', fields.get('title')), ('title', fields.get('container')),
+                       ('publisher', fields.get('publisher'))):
+        if text:
+            terms.update((name, word) for word in normalize(text).split() if word not in STOPWORDS)
+    if isinstance(fields.get('year'), int):
+        terms.add(('year', str(fields['year'])))
+    return terms
+
+
+def parse_query(query):
+    '''
+    Returns a list of (field or None, word) of a query.
+    '''
+    words = []
+    for part in query.split():
+        field = None
+        name, colon, rest = part.partition(':')
+        if colon and name.lower() in FIELDS:
+            field, part = name.lower(), rest
+        words.extend((field, word) for word in normalize(part).split() if word not in STOPWORDS)
+    return words
+
+
+class Level:
+    '''
+    Records a query word matches one way : the postings of the words
+    it matched in one field, and the weight of that match.
+    '''
+    __slots__ = ('weight', 'sets', 'size', 'merged')
+
+    def __init__(self, weight, sets):
+        self.weight = weight
+        self.sets = sets
+        self.size = sum(len(found) for found in sets)
+        self.merged = None
+
+    def __contains__(self, number):
+        for found in self.sets:
+            if number in found:
+                return True
+        return False
+
+    def union(self):
+        # kept : a level is intersected once for every combination it is in
+        if self.merged == None:
+            self.merged = self.sets[0] if len(self.sets) == 1 else set().union(*self.sets)
+        return self.merged
+
+
+class SearchIndex:
+    '''
+    Inverted index word -> field -> set of record numbers, with a
+    sorted list of the words for prefixes and a table of the words
+    less one character for typos. Records are numbered in the order
+    they are added.
+    '''
+    def __init__(self):
+        self.postings = {}
+        # word -> postings holding it, to pick the most frequent expansions
+        self.counts = {}
+        # sorted words, plus the words added since it was sorted
+        self.words = []
+        self.new_words = set()
+        self.removed_words = 0
+        # word or word less one character -> words
+        self.deleted = {}
+        self.records = {}
+        self.terms = {}
+        self.next_number = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, number):
+        return number in self.records
+
+    def __getitem__(self, number):
+        return self.records[number]
+
+    def add(self, citation):
+        '''
+        Indexes a citation, returns its record number.
+        '''
+        number = self.next_number
+        self.next_number += 1
+        terms = citation_terms(citation)
+        self.records[number] = citation
+        self.terms[number] = tuple(terms)
+        postings = self.postings
+        counts = self.counts
+        for field, word in terms:
+            fields = postings.get(word)
+            if fields == None:
+                fields = postings[word] = {}
+                counts[word] = 0
+                self._add_word(word)
+            found = fields.get(field)
+            if found == None:
+                fields[field] = {number}
+            else:
+                found.add(number)
+            counts[word] += 1
+        return number
+
+    def update(self, citations):
+        '''
+        Indexes many citations, returns the list of their numbers.
+        The word list is sorted at the end rather than by the first
+        prefix query.
+        '''
+        numbers = [self.add(citation) for citation in citations]
+        self.sorted_words()
+        return numbers
+
+    def remove(self, number):
+        '''
+        Removes a record from the index. Raises KeyError for an
+        unknown number.
+        '''
+        del self.records[number]
+        for field, word in self.terms.pop(number):
+            fields = self.postings[word]
+            fields[field].discard(number)
+            self.counts[word] -= 1
+            if not fields[field]:
+                del fields[field]
+                if not fields:
+                    del self.postings[word]
+                    del self.counts[word]
+                    self._remove_word(word)
+
+    def _add_word(self, word):
+        words = self.words
+        i = bisect.bisect_left(words, word)
+        if i < len(words) and words[i] == word:
+            # removed but still in the sorted list : it is there again
+            self.removed_words -= 1
+        else:
+            self.new_words.add(word)
+        for key in deletions(word):
+            self.deleted.setdefault(key, set()).add(word)
+
+    def _remove_word(self, word):
+        if word in self.new_words:
+            self.new_words.discard(word)
+        else:
+            # left in the sorted list until it is sorted again
+            self.removed_words += 1
+        for key in deletions(word):
+            self.deleted[key].discard(word)
+            if not self.deleted[key]:
+                del self.deleted[key]
+
+    def sorted_words(self):
+        '''
+        Returns the sorted list of the words, merged with the words
+        added since the last call once there are enough of them.
+        '''
+        if len(self.new_words) + self.removed_words > MERGE_WORDS:
+            postings = self.postings
+            self.words = sorted(chain([word for word in self.words if word in postings], self.new_words))
+            self.new_words = set()
+            self.removed_words = 0
+        return self.words
+
+    def expand_prefix(self, word):
+        '''
+        Returns the most frequent indexed words starting with word,
+        word itself excepted.
+        '''
+        if len(word) < PREFIX_MIN:
+            return []
+        words = self.sorted_words()
+        start = bisect.bisect_left(words, word)
+        end = bisect.bisect_left(words, word + '\uffff', start, min(len(words), start + MAX_SCAN))
+        found = words[start:end]
+        if found and found[0] == word:
+            del found[0]
+        if self.removed_words:
+            found = [other for other in found if other in self.postings]
+        found.extend(other for other in self.new_words if other.startswith(word) and other != word)
+        if len(found) > MAX_EXPANSIONS:
+            found = sorted(found, key=self.counts.__getitem__, reverse=True)[:MAX_EXPANSIONS]
+        return found
+
+    def expand_fuzzy(self, word):
+        '''
+        Returns the most frequent indexed words one typo away from
+        word (see one_typo), for words of FUZZY_MIN characters or more.
+        '''
+        if len(word) < FUZZY_MIN:
+            return []
+        deleted = self.deleted
+        found = [other for other in set().union(*[deleted[key] for key in deletions(word) if key in deleted])
+                 if other != word and not other.startswith(word) and one_typo(word, other)]
+        return heapq.nlargest(MAX_EXPANSIONS, found, key=self.counts.__getitem__)
+
+    def levels(self, field, word, stage):
+        '''
+        Returns the Level objects of a query word, best weight first.
+        Stage 0 only matches the word itself, stage 1 adds the words
+        it starts, stage 2 the words one typo away.
+        '''
+        found = []
+
+        def match(words, quality):
+            for name in FIELDS if field == None else (field,):
+                sets = [self.postings[other][name] for other in words if name in self.postings[other]]
+                if sets:
+                    # biggest first, a record is found sooner when it is there
+                    sets.sort(key=len, reverse=True)
+                    found.append(Level(FIELDS[name] * quality, sets))
+
+        if word in self.postings:
+            match([word], EXACT)
+        if stage >= 1:
+            match(self.expand_prefix(word), PREFIX)
+        if stage >= 2:
+            match(self.expand_fuzzy(word), FUZZY)
+        found.sort(key=lambda level: -level.weight)
+        return found
+
+    def search(self, query, k=10, fuzzy=True):
+        '''
+        Returns up to k (record number, score) matching a query, best
+        score first. Prefixes are only looked at when the whole words
+        give less than k records, typos when nothing matches.
+
+        input :
+            query -> str, words to find, eg 'smith 2019' or 'author:smi econ'
+            fuzzy -> bool, allow typos
+        '''
+        words = parse_query(query)
+        if not words or k <= 0:
+            return []
+        found = []
+        sizes = None
+        for stage in (0, 1, 2) if fuzzy else (0, 1):
+            levels = [self.levels(field, word, stage) for field, word in words]
+            # a stage adding no level finds the records of the one before
+            if list(map(len, levels)) != sizes:
+                found = self._ranked(levels, k)
+                sizes = list(map(len, levels))
+            if len(found) >= k or stage == 1 and found:
+                break
+        return found
+
+    def _ranked(self, levels, k):
+        '''
+        Returns the k best records : walks the combinations of one
+        level per query word best total weight first, a record is
+        kept at the first (best) combination it is in.
+        '''
+        if not all(levels):
+            return []
+        start = (0,) * len(levels)
+        heap = [(-sum(word[0].weight for word in levels), start)]
+        seen = {start}
+        found = []
+        kept = set()
+        while heap and len(found) < k:
+            score, combination = heapq.heappop(heap)
+            chosen = sorted((levels[i][level] for i, level in enumerate(combination)), key=lambda level: level.size)
+            for number in self._intersection(chosen, kept, k - len(found)):
+                kept.add(number)
+                found.append((number, round(-score, 6)))
+            for i, level in enumerate(combination):
+                if level + 1 < len(levels[i]):
+                    following = combination[:i] + (level + 1,) + combination[i + 1:]
+                    if following not in seen:
+                        seen.add(following)
+                        heapq.heappush(heap, (score + levels[i][level].weight - levels[i][level + 1].weight,
+                                              following))
+        return found
+
+    def _intersection(self, levels, kept, limit):
+        '''
+        Returns up to limit record numbers in every level (smallest
+        level first) and not in kept, smallest numbers first when the
+        levels are small.
+        '''
+        smallest, others = levels[0], levels[1:]
+        # share of the records in every other level, taking the levels as independent
+        share = 1.0
+        for other in others:
+            share *= min(1.0, other.size / max(1, len(self.records)))
+        if smallest.size > SCAN_FROM and (smallest.size > MAX_WALK or limit * 4 < smallest.size * share):
+            # big postings : walk the smallest WALK_STEP records at a time
+            # until enough records are found. When few of them are in the
+            # other levels the walk stops short : a query of common words
+            # seldom found together may get less than k records
+            numbers = chain.from_iterable(smallest.sets)
+            others = [[other.union()] if other.size <= SCAN_FROM else other.sets for other in others]
+            checks = WALK_STEP * max(1, sum(len(sets) for sets in others))
+            found = []
+            for _ in range(max(1, MAX_WALK // checks)):
+                step = set(islice(numbers, WALK_STEP))
+                if not step:
+                    break
+                step.difference_update(kept, found)
+                for sets in others:
+                    if len(sets) == 1:
+                        step &= sets[0]
+                    else:
+                        step = set().union(*[step & posting for posting in sets])
+                found.extend(sorted(step)[:limit - len(found)])
+                if len(found) == limit:
+                    break
+            return found
+        common = smallest.union()
+        checked = []
+        for other in others:
+            if len(other.sets) == 1:
+                common = common & other.sets[0]
+            else:
+                # records walked to find limit of them, against the cost of intersecting every posting
+                share = min(1.0, other.size / max(1, len(self.records)))
+                if limit / share * len(other.sets) * 4 < sum(min(len(common), len(found)) for found in other.sets):
+                    checked.append(other)
+                else:
+                    common = set().union(*[common & found for found in other.sets])
+            if not common:
+                return []
+        common = sorted(common - kept if kept else common)
+        if not checked:
+            return common[:limit]
+        found = []
+        for number in common:
+            if all(number in other for other in checked):
+                found.append(number)
+                if len(found) == limit:
+                    break
+        return found
@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+from CLI_approach import RenderContext
+from bibliography import build_citation
+from templates import MARKUPS
+
+# largest request body accepted, in bytes
+MAX_BODY = 16 * 1024 * 1024
+# longest request line or header line accepted, in bytes
+MAX_LINE = 64 * 1024
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           411: 'Length Required', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def percentile(ordered, fraction):
+    '''
+    Returns the value at fraction (0 to 1) of a sorted list, nearest rank.
+    '''
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class RenderService:
+    '''
+    Small HTTP/1.1 service rendering citation rows, so other apps get
+    Harvard strings from one warm process.
+
+        POST /render        one row (JSON object)  -> {"end_text": ..., "in_text": ...}
+        POST /render/batch  list of rows           -> list of the same, or {"error": ...}
+        GET  /stats         request counts, batch sizes and latency percentiles
+        GET  /health        {"status": "ok"}
+
+    ?markup=html (markdown, rtf) picks the markup of end_text.
+
+    Requests arriving together are rendered as one batch in a worker
+    thread : while a batch renders the next requests queue up, so the
+    batches grow with the load and a lone request does not wait.
+    Every batch shares one RenderContext, made again when the day
+    changes.
+
+    Input : data types
+        host      -> str
+        port      -> int, 0 for any free port
+        max_batch -> int, rows rendered in one batch at most
+        max_wait  -> float, seconds a batch waits for more requests (0 : none)
+        window    -> int, number of latencies kept for the percentiles
+    '''
+    def __init__(self, host='127.0.0.1', port=8080, max_batch=512, max_wait=0.0, window=10000):
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.latencies = deque(maxlen=window)
+        self.counts = {'requests': 0, 'records': 0, 'errors': 0, 'batches': 0}
+        self.render_context = RenderContext()
+        self.executor = ThreadPoolExecutor(1)
+        self.queue = None
+        self.server = None
+        self.batcher = None
+        self.started = time.time()
+
+    def context(self):
+        '''
+        Returns the RenderContext shared by the batches of the day.
+        '''
+        if self.render_context.access_date != date.today():
+            self.render_context = RenderContext()
+        return self.render_context
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.ensure_future(self._batches())
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server == None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        '''
+        Stops the server and the batches. Requests still waiting for
+        their batch get a 503 error.
+        '''
+        if self.server != None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher != None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+            self.batcher = None
+        if self.queue != None:
+            while not self.queue.empty():
+                _, _, future = self.queue.get_nowait()
+                if not future.done():
+                    future.set_exception(BadRequest(503, 'service closed'))
+        self.executor.shutdown(wait=False)
+
+    async def render(self, rows, markup='text'):
+        '''
+        Returns the results of a list of rows, rendered with the next batch.
+        '''
+        if self.batcher == None:
+            raise BadRequest(503, 'service closed')
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, markup, future))
+        return await future
+
+    async def _batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            while size < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                size += len(batch[-1][0])
+            if self.max_wait and size < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+                while size < self.max_batch and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    size += len(batch[-1][0])
+            try:
+                results = await loop.run_in_executor(self.executor, self._render_batch, batch, self.context())
+            except asyncio.CancelledError:
+                # closed while the batch renders
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(BadRequest(503, 'service closed'))
+                raise
+            except Exception as error:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.counts['batches'] += 1
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _render_batch(self, batch, context):
+        results = []
+        for rows, markup, _ in batch:
+            rendered = []
+            for row in rows:
+                try:
+                    if not isinstance(row, dict):
+                        raise ValueError('record is not a JSON object')
+                    citation = build_citation(row)
+                    rendered.append({'end_text': citation.end_text(markup, context), 'in_text': citation.in_text()})
+                except Exception as error:
+                    rendered.append({'error': '{}: {}'.format(type(error).__name__, error)})
+            results.append(rendered)
+        return results
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+        stats = dict(self.counts)
+        stats['mean_batch'] = self.counts['records'] / self.counts['batches'] if self.counts['batches'] else 0.0
+        stats['uptime'] = time.time() - self.started
+        stats['latency_ms'] = {
+            'count': len(ordered),
+            'mean': 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+            'p50': 1000 * percentile(ordered, 0.50),
+            'p90': 1000 * percentile(ordered, 0.90),
+            'p99': 1000 * percentile(ordered, 0.99),
+            'max': 1000 * ordered[-1] if ordered else 0.0,
+        }
+        return stats
+
+    async def _route(self, method, target, body):
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/') or '/'
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats()
+        if path not in ('/render', '/render/batch'):
+            raise BadRequest(404, 'no such endpoint {}'.format(path))
+        if method != 'POST':
+            raise BadRequest(405, 'use POST')
+        markup = parse_qs(parts.query).get('markup', ['text'])[0]
+        if markup not in MARKUPS:
+            raise BadRequest(400, 'unknown markup {!r}'.format(markup))
+        try:
+            data = json.loads(body)
+        except ValueError as error:
+            raise BadRequest(400, 'body is not JSON: {}'.format(error))
+        if path == '/render':
+            if not isinstance(data, dict):
+                raise BadRequest(400, 'record is not a JSON object')
+            result = (await self.render([data], markup))[0]
+            self.counts['records'] += 1
+            if 'error' in result:
+                self.counts['errors'] += 1
+                return 400, result
+            return 200, result
+        if not isinstance(data, list):
+            raise BadRequest(400, 'batch is not a JSON list')
+        results = await self.render(data, markup)
+        self.counts['records'] += len(data)
+        self.counts['errors'] += sum(1 for result in results if 'error' in result)
+        return 200, results
+
+    @staticmethod
+    async def _readline(reader, status, what):
+        '''
+        Returns the next line, raises BadRequest(status) when it is
+        over MAX_LINE bytes.
+        '''
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise BadRequest(status, '{} over {} bytes'.format(what, MAX_LINE))
+
+    @classmethod
+    async def _read_request(cls, reader):
+        '''
+        Returns (method, target, headers, body) of the next request,
+        None when the client closed the connection.
+        '''
+        line = await cls._readline(reader, 400, 'request line')
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise BadRequest(400, 'bad request line')
+        headers = {}
+        while True:
+            line = await cls._readline(reader, 431, 'header line')
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        headers['version'] = version
+        body = b''
+        if method == 'POST':
+            if 'content-length' not in headers:
+                raise BadRequest(411, 'Content-Length is required')
+            length = headers['content-length']
+            # int() would also take '-1', '+1' or '1_000'
+            if not length.isascii() or not length.isdigit():
+                raise BadRequest(400, 'bad Content-Length {!r}'.format(length))
+            length = int(length)
+            if length > MAX_BODY:
+                raise BadRequest(413, 'body over {} bytes'.format(MAX_BODY))
+            body = await reader.readexactly(length)
+        return method, target, headers, body
+
+    @staticmethod
+    def _respond(writer, status, payload, keep):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\n'
+                     'Content-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                         status, REASONS[status], len(body), 'keep-alive' if keep else 'close').encode('latin-1')
+                     + body)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as error:
+                    self._respond(writer, error.status, {'error': str(error)}, False)
+                    break
+                if request == None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                self.counts['requests'] += 1
+                try:
+                    status, payload = await self._route(method, target, body)
+                except BadRequest as error:
+                    status, payload = error.status, {'error': str(error)}
+                except Exception as error:
+                    status, payload = 500, {'error': '{}: {}'.format(type(error).__name__, error)}
+                keep = headers['version'] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                self._respond(writer, status, payload, keep)
+                await writer.drain()
+                if target.startswith('/render'):
+                    self.latencies.append(time.perf_counter() - start)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP service rendering Harvard citations.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-batch', type=int, default=512)
+    parser.add_argument('--max-wait', type=float, default=0.0, help='seconds a batch waits for more requests')
+    args = parser.parse_args(argv)
+    service = RenderService(args.host, args.port, args.max_batch, args.max_wait)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
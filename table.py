@@ -0,0 +1,217 @@
+from array import array
+
+from CLI_approach import Citation, RenderContext
+from bibliography import TYPES, NAME_FIELDS, NAME_SEPARATOR, INT_FIELDS, parse_page, build_citation
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# value stored in the int columns for a missing value : the smallest
+# int of the column, real values are kept between LOWEST and HIGHEST
+MISSING = -2 ** (8 * array('i').itemsize - 1)
+LOWEST = MISSING + 1
+HIGHEST = -MISSING - 1
+
+KINDS = tuple(TYPES)
+
+
+class StringPool:
+    '''
+    Interned strings of a table. Every different string is stored
+    once and referred to by its index, index 0 is None.
+    '''
+    def __init__(self):
+        self.strings = [None]
+        self.index = {None: 0}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def add(self, value):
+        '''
+        Returns the index of the string, adding it if it is new.
+        '''
+        position = self.index.get(value)
+        if position == None:
+            position = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return position
+
+    def get(self, position):
+        return self.strings[position]
+
+
+class CitationTable:
+    '''
+    Whole bibliography stored column by column (struct of arrays).
+
+    Numbers (years, months, days, volumes, parts, editions and pages)
+    are kept in typed array columns, every other field is an index into
+    a shared string pool. Formatting helpers work over a whole column
+    at once instead of one call per Citation object.
+
+    Rows are the same dicts as the ones read by Bibliography.
+    '''
+    def __init__(self, rows=None):
+        self.kinds = array('B')
+        self.columns = {}
+        self.pool = StringPool()
+        if rows != None:
+            self.extend(rows)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _column(self, name, typecode, missing):
+        column = self.columns.get(name)
+        if column == None:
+            column = self.columns[name] = array(typecode, [missing]) * len(self.kinds)
+        return column
+
+    @staticmethod
+    def _number(field, value):
+        '''
+        Returns the int stored for a value of an int column, raises
+        ValueError when it does not fit the column.
+        '''
+        number = int(value)
+        if not LOWEST <= number <= HIGHEST:
+            raise ValueError('{} out of range : {}'.format(field, number))
+        return number
+
+    def append(self, row):
+        '''
+        Adds a row dict, values are checked like in build_citation().
+        Every value is checked before the first column grows : a bad
+        row raises and leaves the table as it was.
+        '''
+        kind = (row.get('type') or '').strip().lower()
+        if kind not in TYPES:
+            raise KeyError('unknown citation type {!r}'.format(row.get('type')))
+
+        values = {}
+        strings = {}
+        for field, value in row.items():
+            if field == 'type' or value == None or value == '':
+                continue
+            if field in INT_FIELDS:
+                values[field] = self._number(field, value)
+            elif field == 'page':
+                page = parse_page(value)
+                start, to = page if isinstance(page, tuple) else (page, None)
+                values['page_start'] = self._number(field, start)
+                values['page_end'] = MISSING if to == None else self._number(field, to)
+            else:
+                if field in NAME_FIELDS and not isinstance(value, str):
+                    value = (NAME_SEPARATOR + ' ').join(value)
+                strings[field] = str(value)
+
+        count = len(self.kinds)
+        for field, value in values.items():
+            self._column(field, 'i', MISSING).append(value)
+        for field, value in strings.items():
+            self._column(field, 'I', 0).append(self.pool.add(value))
+        for column in self.columns.values():
+            if len(column) == count:
+                column.append(MISSING if column.typecode == 'i' else 0)
+        self.kinds.append(KINDS.index(kind))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def column(self, name):
+        '''
+        Returns a column : a numpy array sharing the memory of the
+        column when numpy is installed, the array object otherwise.
+        '''
+        column = self.columns[name]
+        if numpy != None:
+            kind = 'u' if column.typecode.isupper() else 'i'
+            return numpy.frombuffer(column, dtype='{}{}'.format(kind, column.itemsize))
+        return column
+
+    def strings(self, name):
+        '''
+        Returns a list of the values of a string column.
+        '''
+        strings = self.pool.strings
+        column = self.columns.get(name)
+        if column == None:
+            return [None] * len(self)
+        return [strings[position] for position in column]
+
+    def row(self, i):
+        '''
+        Returns the row dict at position i.
+        '''
+        row = {'type': KINDS[self.kinds[i]]}
+        for name, column in self.columns.items():
+            value = column[i]
+            if column.typecode == 'I':
+                if value:
+                    row[name] = self.pool.get(value)
+            elif value != MISSING and name not in ('page_start', 'page_end'):
+                row[name] = value
+        if 'page_start' in self.columns and self.columns['page_start'][i] != MISSING:
+            start, to = self.columns['page_start'][i], self.columns['page_end'][i]
+            row['page'] = start if to == MISSING else (start, to)
+        return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def citation(self, i):
+        '''
+        Returns the Citation object at position i.
+        '''
+        return build_citation(self.row(i))
+
+    def format_years(self):
+        '''
+        Citation.format_year_of_publication over the year column.
+        Returns a list of str.
+        '''
+        column = self.columns.get('year_of_publication')
+        if column == None:
+            return ['n.d.'] * len(self)
+        years = {}
+        return [years.get(year) or years.setdefault(year, 'n.d.' if year == MISSING else str(year))
+                for year in column]
+
+    def positions(self, name):
+        '''
+        Citation.position over an int column, eg 'edition' or
+        'day_of_publication'. Every different number is formatted
+        once. Returns a list of str, None for missing values.
+        '''
+        column = self.columns.get(name)
+        if column == None:
+            return [None] * len(self)
+        ordinals = {MISSING: None}
+        for number in set(column):
+            if number not in ordinals:
+                ordinals[number] = Citation.position(number)
+        return [ordinals[number] for number in column]
+
+    def format_pages(self):
+        '''
+        Citation.format_page_num over the page columns.
+        Returns a list of str, '' for missing pages.
+        '''
+        if 'page_start' not in self.columns:
+            return [''] * len(self)
+        return [('' if start == MISSING else str(start)) if to == MISSING else '{}-{}'.format(start, to)
+                for start, to in zip(self.columns['page_start'], self.columns['page_end'])]
+
+    def end_texts(self, markup='text', context=None):
+        '''
+        Yields the end-text citation of every row, with one
+        RenderContext for the whole table.
+        '''
+        context = RenderContext() if context == None else context
+        for i in range(len(self)):
+            yield self.citation(i).end_text(markup, context)
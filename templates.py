@@ -0,0 +1,132 @@
+'''
+Small template engine for the Harvard layouts of the citation classes.
+
+A layout is a str.format style string. A field written as {name!i}
+is a title that has to be in italics, eg :
+
+    '{name}({year}) {master_title!i}. {place_of_publication}: {publisher}.'
+
+Every (layout, markup) pair is compiled once into a render function
+that takes a dict of field values and returns the citation in one
+pass of str.format_map.
+'''
+import string
+
+MARKUPS = ('text', 'html', 'markdown', 'rtf')
+
+
+def escape_html(value):
+    '''
+    Escapes &, < and >, same as html.escape(value, quote=False)
+    without importing html (and re) at startup.
+    '''
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def escape_markdown(value):
+    '''
+    Escapes the characters markdown would read as formatting.
+    '''
+    for char in '\\`*_[]<>':
+        value = value.replace(char, '\\' + char)
+    return value
+
+
+def escape_rtf(value):
+    '''
+    Escapes RTF control characters, non ASCII characters are
+    written as \\uN? unicode escapes.
+    '''
+    value = value.replace('\\', '\\\\').replace('{', '\\{').replace('}', '\\}')
+    if value.isascii():
+        return value
+    final = []
+    for char in value:
+        code = ord(char)
+        if code < 128:
+            final.append(char)
+            continue
+        if code > 0xFFFF:
+            code -= 0x10000
+            units = (0xD800 + (code >> 10), 0xDC00 + (code & 0x3FF))
+        else:
+            units = (code,)
+        for unit in units:
+            # RTF wants signed 16 bit code units
+            final.append('\\u{}?'.format(unit - 65536 if unit > 32767 else unit))
+    return ''.join(final)
+
+
+# characters XML 1.0 does not allow, even escaped
+XML_ILLEGAL = dict.fromkeys([code for code in range(32) if code not in (9, 10, 13)] + [0xFFFE, 0xFFFF])
+
+
+def escape_xml(value):
+    '''
+    Escapes &, < and > and drops the characters XML cannot hold.
+    '''
+    value = escape_html(value)
+    return value if value.isprintable() else value.translate(XML_ILLEGAL)
+
+
+# a title in a WordprocessingML paragraph : the run is closed and an italic run opened
+WORDML_ITALIC = '</w:t></w:r><w:r><w:rPr><w:i/></w:rPr><w:t xml:space="preserve">'
+WORDML_ROMAN = '</w:t></w:r><w:r><w:t xml:space="preserve">'
+
+# markup -> (escape function, italic start, italic end). 'wordml' is not
+# a markup of its own : it gives the runs of a DOCX paragraph, see writers.py
+STYLES = {
+    'text'    : (None, '', ''),
+    'html'    : (escape_html, '<i>', '</i>'),
+    'markdown': (escape_markdown, '*', '*'),
+    'rtf'     : (escape_rtf, '{\\i ', '}'),
+    'wordml'  : (escape_xml, WORDML_ITALIC, WORDML_ROMAN),
+}
+
+_compiled = {}
+
+
+def _literal(text):
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def compile_template(template, markup='text'):
+    '''
+    Returns a function(fields) -> str rendering the layout in the
+    given markup. Compiled functions are cached.
+
+    input :
+        template -> str, layout of the citation
+        markup   -> 'text', 'html', 'markdown' or 'rtf'
+    '''
+    key = (template, markup)
+    if key in _compiled:
+        return _compiled[key]
+    if markup not in STYLES:
+        raise ValueError('Only accept one of these markups : {}'.format(', '.join(MARKUPS)))
+    escape, italic_start, italic_end = STYLES[markup]
+
+    fmt = ''
+    names = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        fmt += _literal(literal if escape == None else escape(literal))
+        if field == None:
+            continue
+        if conversion not in (None, 'i'):
+            raise ValueError('Unknown conversion !{} in template'.format(conversion))
+        if field not in names:
+            names.append(field)
+        placeholder = '{' + field + (':' + spec if spec else '') + '}'
+        if conversion == 'i':
+            placeholder = _literal(italic_start) + placeholder + _literal(italic_end)
+        fmt += placeholder
+
+    format_map = fmt.format_map
+    if escape == None:
+        render = format_map
+    else:
+        def render(fields):
+            return format_map({name: escape(str(fields[name])) for name in names})
+
+    _compiled[key] = render
+    return render
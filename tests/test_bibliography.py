@@ -0,0 +1,52 @@
+import io
+
+import pytest
+
+from bibliography import Bibliography, build_citation, parse_page
+from CLI_approach import Book
+
+BOOK = '{"type": "book", "author": "John Dickson; Katy Perry", "book_title": "Economics", ' \
+       '"year_of_publication": 2018, "edition": 2, "place_of_publication": "London", "publisher": "Penguin"}'
+
+
+def test_build_citation():
+    citation = build_citation({'type': ' Book ', 'author': 'John Dickson', 'book_title': 'Economics',
+                               'year_of_publication': '2018', 'edition': '', 'place_of_publication': 'London',
+                               'publisher': 'Penguin'})
+    assert isinstance(citation, Book)
+    assert citation.year_of_publication == 2018 and citation.edition == None
+
+
+def test_unknown_type():
+    with pytest.raises(KeyError):
+        build_citation({'type': 'podcast'})
+
+
+@pytest.mark.parametrize('value, page', [('12', 12), ('12-15', (12, 15)), ([3, 4], (3, 4)), ('', None)])
+def test_parse_page(value, page):
+    assert parse_page(value) == page
+
+
+def test_jsonl_bad_rows_are_reported_and_skipped():
+    source = io.StringIO('\n'.join([BOOK, '{not json', '[1, 2]', '{"type": "podcast"}', '', BOOK]) + '\n')
+    errors = io.StringIO()
+    bibliography = Bibliography(source, 'jsonl', errors=errors)
+    rendered = list(bibliography)
+    assert rendered == [('Dickson, J. and Perry, K. (2018) Economics. 2nd edition. London: Penguin.',
+                         '(Dickson and Perry, 2018)')] * 2
+    assert bibliography.error_count == 3
+    assert [line.split(':')[1] for line in errors.getvalue().splitlines()] == ['2', '3', '4']
+
+
+def test_csv(tmp_path):
+    path = tmp_path / 'references.csv'
+    path.write_text('type,author,book_title,year_of_publication,volume,edition,place_of_publication,publisher\n'
+                    'book,John Dickson,Economics,2018,,2,London,Penguin\n', encoding='utf-8')
+    citations = list(Bibliography(str(path)).citations())
+    assert len(citations) == 1 and citations[0].master_title == 'Economics'
+
+
+def test_names_are_shared():
+    first = build_citation({'type': 'book', 'author': 'John Dickson; Katy Perry', 'book_title': 'One'})
+    second = build_citation({'type': 'book', 'author': ['John Dickson', 'Katy Perry'], 'book_title': 'Two'})
+    assert first.author is second.author
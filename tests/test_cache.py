@@ -0,0 +1,125 @@
+from datetime import date
+
+from bibliography import build_citation
+from cache import RenderCache, record_key
+from CLI_approach import RenderContext
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+
+
+def book(i, title='Economics'):
+    return build_citation({'type': 'book', 'author': 'John Dickson', 'book_title': '{} {}'.format(title, i),
+                           'year_of_publication': 2000 + i % 20, 'place_of_publication': 'London',
+                           'publisher': 'Penguin'})
+
+
+def direct(citations):
+    return [(citation.end_text('text', CONTEXT), citation.in_text()) for citation in citations]
+
+
+def test_hits_and_edits(tmp_path):
+    citations = [book(i) for i in range(1200)]
+    with RenderCache(str(tmp_path / 'cache.sqlite')) as cache:
+        assert list(cache.render_many(citations, context=CONTEXT)) == direct(citations)
+        assert cache.stats() == {'hits': 0, 'misses': 1200, 'entries': 1200}
+        citations[7] = book(7, 'Edited')
+        assert list(cache.render_many(citations, context=CONTEXT)) == direct(citations)
+        assert cache.stats() == {'hits': 1199, 'misses': 1201, 'entries': 1201}
+
+
+def test_settings_are_part_of_the_key():
+    citation = book(1)
+    with RenderCache() as cache:
+        assert cache.render(citation, 'html', CONTEXT)[0] != cache.render(citation, 'text', CONTEXT)[0]
+        assert cache.render(citation, 'text', CONTEXT, 'a')[0].startswith('Dickson, J. (2001a)')
+        assert cache.stats()['misses'] == 3
+    assert record_key(citation, 'text', CONTEXT) == record_key(book(1), 'text', CONTEXT)
+    assert record_key(citation, 'text', CONTEXT) != record_key(book(2), 'text', CONTEXT)
+
+
+def test_access_date_only_in_the_keys_of_dated_layouts():
+    citation = book(1)
+    website = build_citation({'type': 'website', 'author': 'Ann Lee', 'year_of_publication': 2020,
+                              'website_name': 'BBC', 'article_title': 'News', 'url': 'https://bbc.co.uk'})
+    later = RenderContext(date(2021, 1, 1))
+    with RenderCache() as cache:
+        for context in (CONTEXT, later):
+            assert list(cache.render_many([citation, website], context=context)) == [
+                (item.end_text('text', context), item.in_text()) for item in (citation, website)]
+        # the book is served again, the website is rendered for the new date
+        assert cache.stats() == {'hits': 1, 'misses': 3, 'entries': 3}
+    assert record_key(citation, 'text', CONTEXT) == record_key(citation, 'text', later)
+    assert record_key(website, 'text', CONTEXT) != record_key(website, 'text', later)
+
+
+def test_memory_keeps_the_records_used_last():
+    citations = [book(i) for i in range(8)]
+    with RenderCache(memory_entries=4) as cache:
+        list(cache.render_many(citations[:4], context=CONTEXT))
+        cache.render(citations[0], context=CONTEXT)
+        # the fifth record makes room : the least recently used go, not the first added
+        cache.render(citations[4], context=CONTEXT)
+        assert [memo[2] for memo in cache.memory] == [citation.get_values() for citation in
+                                                      (citations[2], citations[3], citations[0], citations[4])]
+
+
+def test_kept_across_processes(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    citations = [book(i) for i in range(50)]
+    with RenderCache(path) as cache:
+        list(cache.render_many(citations, context=CONTEXT))
+    with RenderCache(path) as cache:
+        assert list(cache.render_many(citations, context=CONTEXT)) == direct(citations)
+        assert cache.stats() == {'hits': 50, 'misses': 0, 'entries': 50}
+
+
+def test_memory_is_bounded():
+    citations = [book(i) for i in range(100)]
+    with RenderCache(memory_entries=40) as cache:
+        assert list(cache.render_many(citations, context=CONTEXT)) == direct(citations)
+        assert len(cache.memory) <= 40
+        # the records left out of memory come from the database
+        assert list(cache.render_many(citations, context=CONTEXT)) == direct(citations)
+        assert cache.stats()['misses'] == 100
+
+
+def test_least_recently_used_are_evicted():
+    with RenderCache(max_entries=32, memory_entries=0) as cache:
+        old = [book(i) for i in range(32)]
+        list(cache.render_many(old, context=CONTEXT))
+        list(cache.render_many(old[:8], context=CONTEXT))
+        new = [book(i) for i in range(100, 124)]
+        list(cache.render_many(new, context=CONTEXT))
+        assert len(cache) == 32
+        cache.hits = cache.misses = 0
+        list(cache.render_many(old[:8] + new, context=CONTEXT))
+        assert cache.misses == 0
+
+
+class SelectMisses:
+    '''
+    Connection whose lookups find nothing, as if another process
+    stored the renders between the SELECT and the INSERT.
+    '''
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, *args):
+        if sql.startswith('SELECT key'):
+            return []
+        return self.db.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+def test_storing_a_render_already_stored(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    citation = book(3)
+    with RenderCache(path) as first:
+        first.render(citation, context=CONTEXT)
+    with RenderCache(path, memory_entries=0) as second:
+        second.db = SelectMisses(second.db)
+        assert second.render(citation, context=CONTEXT) == direct([citation])[0]
+        assert second.db.execute('SELECT COUNT(*) FROM renders').fetchone() == (1,)
+        assert len(second) == 1
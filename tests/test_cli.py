@@ -0,0 +1,75 @@
+import io
+import json
+
+import pytest
+
+from cli import docstring_fields, interactive, main
+from CLI_approach import Video
+
+BOOK = {'type': 'book', 'author': 'John Dickson', 'book_title': 'Economics', 'year_of_publication': 2018,
+        'place_of_publication': 'London', 'publisher': 'Penguin'}
+
+
+@pytest.fixture
+def records(tmp_path):
+    path = tmp_path / 'refs.jsonl'
+    path.write_text(json.dumps(BOOK) + '\n', encoding='utf-8')
+    return path
+
+
+def test_end_text_in_text_and_json(records, capsys):
+    assert main([str(records)]) == 0
+    assert capsys.readouterr().out == 'Dickson, J. (2018) Economics.London: Penguin.\n'
+    assert main(['--in-text', str(records)]) == 0
+    assert capsys.readouterr().out == '(Dickson, 2018)\n'
+    assert main(['--json', '--markup=html', str(records)]) == 0
+    assert json.loads(capsys.readouterr().out) == {'end_text': 'Dickson, J. (2018) <i>Economics</i>.London: Penguin.',
+                                                   'in_text': '(Dickson, 2018)'}
+
+
+def test_stdin_and_csv(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO('type,author,book_title,year_of_publication,place_of_publication,'
+                                                 'publisher\nbook,Ann Lee,Title,2001,Leeds,Sage\n'))
+    assert main(['--csv', '--in-text']) == 0
+    assert capsys.readouterr().out == '(Lee, 2001)\n'
+
+
+def test_exit_codes(records, tmp_path, capsys):
+    bad = tmp_path / 'bad.jsonl'
+    bad.write_text(json.dumps(BOOK) + '\n{"type": "podcast"}\n', encoding='utf-8')
+    assert main([str(bad)]) == 1
+    captured = capsys.readouterr()
+    assert captured.out.count('\n') == 1 and ':2: KeyError' in captured.err
+    assert main(['--help']) == 0 and 'usage: harvard-ref' in capsys.readouterr().out
+    for argv in (['--markup', 'latex'], ['--in-text', '--json'], ['--nope'], ['a', 'b'], ['-m']):
+        assert main(argv) == 2
+        assert 'harvard-ref: error:' in capsys.readouterr().err
+    assert main([str(tmp_path / 'missing.jsonl')]) == 1
+    assert 'No such file' in capsys.readouterr().err
+
+
+def test_interactive():
+    answers = ['book', 'John Dickson', 'Economics', '2018', '', '2', 'London', 'Penguin', 'nope', '']
+    out = io.StringIO()
+    assert interactive(stdin=io.StringIO('\n'.join(answers) + '\n'), stdout=out) == 0
+    assert 'Dickson, J. (2018) Economics. 2nd edition. London: Penguin.\n(Dickson, 2018)' in out.getvalue()
+    assert "unknown type 'nope'" in out.getvalue()
+
+
+def test_fields_of_a_video_are_documented():
+    # matched by position : the docstring calls them website_name and article_title
+    fields = docstring_fields(Video)
+    assert list(fields)[-3:] == ['channel_name', 'video_title', 'url'] and fields['channel_name'] == 'str'
+
+
+@pytest.mark.parametrize('name', ['metrics.json', 'metrics.prom'])
+def test_metrics(records, tmp_path, capsys, name):
+    path = tmp_path / name
+    assert main(['--metrics', str(path), str(records)]) == 0
+    assert capsys.readouterr().out == 'Dickson, J. (2018) Economics.London: Penguin.\n'
+    text = path.read_text(encoding='utf-8')
+    if name.endswith('.json'):
+        assert json.loads(text)['Book']['end_text']['count'] == 1
+    else:
+        assert 'harvard_ref_call_seconds_count{type="Book",op="end_text"} 1' in text
+    assert main(['--metrics']) == 2
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from bibliography import build_citation
+from corpus import Corpus, CorpusWriter, write_corpus
+
+ROWS = {
+    'dickson2018': {'type': 'book', 'author': 'John Dickson; Katy Perry', 'book_title': 'Économie', 'edition': 2,
+                    'year_of_publication': 2018, 'place_of_publication': 'London', 'publisher': 'Penguin'},
+    'bbc2020': {'type': 'website', 'author': None, 'year_of_publication': 2020, 'website_name': 'BBC',
+                'article_title': 'News', 'url': 'https://bbc.co.uk'},
+    'lee2019': {'type': 'journal', 'author': 'Ann Lee', 'year_of_publication': 2019, 'title_of_article': 'Methods',
+                'journal_title': 'Statistics Today', 'volume_number': 12, 'issue_number': 3, 'page': '10-25'},
+}
+
+
+@pytest.fixture
+def citations():
+    return {key: build_citation(row) for key, row in ROWS.items()}
+
+
+def test_round_trip(tmp_path, citations):
+    path = str(tmp_path / 'refs.corpus')
+    assert write_corpus(path, citations.items()) == 3
+    with Corpus(path) as corpus:
+        assert len(corpus) == 3 and list(corpus) == list(citations)
+        for key, citation in citations.items():
+            assert corpus[key] == citation and key in corpus
+            assert corpus[key].end_text() == citation.end_text()
+        assert dict(corpus.items()) == citations
+        assert corpus.get('nope') == None and 'nope' not in corpus
+        with pytest.raises(KeyError):
+            corpus['nope']
+    assert os.listdir(str(tmp_path)) == ['refs.corpus']
+
+
+def test_duplicate_keys(tmp_path, citations):
+    path = str(tmp_path / 'refs.corpus')
+    with pytest.raises(ValueError, match='duplicate key'):
+        write_corpus(path, [('lee2019', citations['lee2019']), ('bbc2020', citations['bbc2020']),
+                            ('lee2019', citations['dickson2018'])])
+    # nothing left behind
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_empty_corpus(tmp_path):
+    path = str(tmp_path / 'empty.corpus')
+    assert write_corpus(path, []) == 0
+    with Corpus(path) as corpus:
+        assert len(corpus) == 0 and list(corpus.items()) == [] and 'a' not in corpus
+
+
+def test_failed_write_keeps_the_old_corpus(tmp_path, citations):
+    path = str(tmp_path / 'refs.corpus')
+    write_corpus(path, citations.items())
+    with pytest.raises(RuntimeError):
+        with CorpusWriter(path) as writer:
+            writer.add('other', citations['lee2019'])
+            raise RuntimeError
+    with Corpus(path) as corpus:
+        assert len(corpus) == 3
+    assert os.listdir(str(tmp_path)) == ['refs.corpus']
+
+
+@pytest.mark.parametrize('cut', [0, 10, 64, 100, -10])
+def test_truncated_file(tmp_path, citations, cut):
+    path = tmp_path / 'refs.corpus'
+    write_corpus(str(path), citations.items())
+    path.write_bytes(path.read_bytes()[:cut])
+    with pytest.raises(ValueError, match='not a corpus file' if 0 <= cut < 64 else 'truncated'):
+        Corpus(str(path))
+
+
+def test_corrupt_type_table(tmp_path, citations):
+    path = tmp_path / 'refs.corpus'
+    write_corpus(str(path), citations.items())
+    data = path.read_bytes()
+    path.write_bytes(data[:-3] + b'?]]')
+    with pytest.raises(ValueError, match='corrupt type table'):
+        Corpus(str(path))
+
+
+def test_corrupt_file(tmp_path, citations):
+    path = tmp_path / 'refs.corpus'
+    write_corpus(str(path), citations.items())
+    data = bytearray(path.read_bytes())
+    data[0:8] = b'NOTACORP'
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='not a corpus file'):
+        Corpus(str(path))
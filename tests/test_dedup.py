@@ -0,0 +1,72 @@
+import io
+import json
+import random
+import string
+
+from bibliography import build_citation
+from dedup import Deduplicator, block_key, merge, normalize, write_report
+
+
+def book(title, author='John Dickson', year=2018, edition=None):
+    return build_citation({'type': 'book', 'author': author, 'book_title': title, 'year_of_publication': year,
+                           'edition': edition, 'place_of_publication': 'London', 'publisher': 'Penguin'})
+
+
+def test_normalize_and_blocks():
+    assert normalize('The Économie, of Things!') == 'the economie of things'
+    assert block_key(book('A', 'Jóhn Dickson')) == block_key(book('B', 'J. Dickson'))
+    assert block_key(book('A')) != block_key(book('A', year=2019))
+
+
+def test_true_duplicates():
+    citations = [book('The Economics of Things'), book('Statistics'), book('Economics of things!', 'J. Dickson',
+                                                                           edition=2)]
+    deduplicator = Deduplicator()
+    clusters = deduplicator.find(citations)
+    assert clusters == [[0, 2]]
+    assert deduplicator.stats['duplicates'] == 1
+    # the record with more fields is kept
+    assert list(merge(citations, clusters)) == citations[1:]
+    out = io.StringIO()
+    write_report(citations, clusters, out)
+    report = json.loads(out.getvalue())
+    assert report['kept'] == 2 and report['duplicates'] == [0]
+
+
+
+def journal(title, volume=12, page='10-25'):
+    return build_citation({'type': 'journal', 'author': 'Ann Lee', 'year_of_publication': 2019,
+                           'title_of_article': title, 'title_of_journal': 'Statistics Today',
+                           'volume_number': volume, 'part_number': 3, 'page': page})
+
+
+def test_false_duplicates():
+    citations = [book('Title number {} about things'.format(i)) for i in range(200)]
+    assert Deduplicator().find(citations) == []
+    # the same title in another volume or on other pages
+    citations = [journal('Methods'), journal('Methods', volume=13), journal('Methods', page='30-31'),
+                 journal('Methods.', page=None)]
+    assert Deduplicator().find(citations) == [[0, 3]]
+
+
+def test_near_titles_do_not_chain():
+    # each title is a duplicate of the next one, the first is not a duplicate of the last two
+    titles = ['a history of the growth of trading markets in western europe',
+              'a history of the growth of trading markets in europe', 'a history of the growth of trading markets',
+              'history of the growth of trading markets']
+    deduplicator = Deduplicator()
+    records = [deduplicator._record(book(title)) for title in titles]
+    assert [deduplicator.same_work(*pair) for pair in zip(records, records[1:])] == [True] * 3
+    assert not deduplicator.same_work(records[0], records[2])
+    assert deduplicator.find([book(title) for title in titles]) == [[0, 1], [2, 3]]
+
+
+def test_duplicates_in_a_big_block():
+    rng = random.Random(5)
+    titles = [' '.join(''.join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(3))
+              for _ in range(100)]
+    citations = [book(title) for title in titles] + [book(titles[20].upper() + '.'), book(titles[20].replace(' ', ', '))]
+    deduplicator = Deduplicator()
+    assert deduplicator.find(citations) == [[20, 100, 101]]
+    # prefix filtering : far fewer pairs than all of them
+    assert deduplicator.stats['compared'] < len(citations) * (len(citations) - 1) // 4
@@ -0,0 +1,82 @@
+import io
+import json
+from datetime import date
+
+from bibliography import build_citation
+from CLI_approach import RenderContext
+from diff import ADDED, MODIFIED, REMOVED, ReferenceDiff, main, write_json, write_text
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+
+
+def book(title='Economics', author='John Dickson', year=2018, **fields):
+    return build_citation(dict({'type': 'book', 'author': author, 'book_title': title, 'year_of_publication': year,
+                                'place_of_publication': 'London', 'publisher': 'Penguin'}, **fields))
+
+
+def diff(old, new):
+    differ = ReferenceDiff(old, new)
+    return [(change.kind, change.old and change.old[0], change.new and change.new[0])
+            for change in differ.changes()], differ.stats
+
+
+def test_equal_records_are_unchanged():
+    old = [book(), book('Statistics'), book()]
+    assert diff(old, [book('Statistics'), book(), book()]) == ([], {'old': 3, 'new': 3, 'unchanged': 3,
+                                                                    ADDED: 0, REMOVED: 0, MODIFIED: 0})
+
+
+def test_edits_matched_on_normalized_title_and_surnames():
+    # another edition, the title written differently
+    changes, _ = diff([book('Economics: a primer')], [book('economics a primer', 'J. Dickson', edition=2)])
+    assert changes == [(MODIFIED, 0, 0)]
+
+
+def test_edits_matched_on_the_title_then_surnames_and_year():
+    old = [book('Economics', 'John Dickson'), book('Statistics', 'Ann Lee', 2001)]
+    new = [book('Statistics for all', 'Ann Lee', 2001), book('Economics', 'John Dickson; Katy Perry')]
+    changes, stats = diff(old, new)
+    assert changes == [(MODIFIED, 1, 0), (MODIFIED, 0, 1)]
+    assert stats[MODIFIED] == 2 and stats['unchanged'] == 0
+
+
+def test_ambiguous_keys_stay_added_and_removed():
+    # two records of Dickson 2018 on each side : the third key cannot tell them apart
+    old = [book('Economics'), book('Statistics'), book('Removed', 'Ann Lee')]
+    new = [book('Growth'), book('Markets'), book('Added', 'Bob Ray', 2001)]
+    changes, stats = diff(old, new)
+    assert changes == [(REMOVED, 0, None), (REMOVED, 1, None), (REMOVED, 2, None),
+                       (ADDED, None, 0), (ADDED, None, 1), (ADDED, None, 2)]
+    assert (stats['old'], stats['new'], stats[ADDED], stats[REMOVED], stats[MODIFIED]) == (3, 3, 3, 3, 0)
+
+
+def test_output():
+    old = [book(), book('Statistics', 'Ann Lee'), book('Gone', 'Bob Ray')]
+    new = [book(edition=2), book('Statistics', 'Ann Lee'), book('New', 'Cy Lo')]
+    changes = ReferenceDiff(old, new).changes()
+    out = io.StringIO()
+    write_text(changes, out, CONTEXT)
+    assert out.getvalue() == ('- [3] Ray, B. (2018) Gone.London: Penguin.\n'
+                              '~ [1 -> 1] Book\n'
+                              "    edition: None -> '2nd'\n"
+                              '    - Dickson, J. (2018) Economics.London: Penguin.\n'
+                              '    + Dickson, J. (2018) Economics. 2nd edition. London: Penguin.\n'
+                              '+ [3] Lo, C. (2018) New.London: Penguin.\n')
+    out = io.StringIO()
+    write_json(changes, out, CONTEXT)
+    modified = json.loads(out.getvalue().splitlines()[1])
+    assert modified['change'] == MODIFIED and modified['fields'] == {'edition': [None, '2nd']}
+    assert modified['type'] == 'Book' and (modified['old'], modified['new']) == (0, 0)
+
+
+def test_main(tmp_path, capsys):
+    old, new = tmp_path / 'old.jsonl', tmp_path / 'new.jsonl'
+    row = {'type': 'book', 'author': 'John Dickson', 'book_title': 'Economics', 'year_of_publication': 2018,
+           'place_of_publication': 'London', 'publisher': 'Penguin'}
+    old.write_text(json.dumps(row) + '\n', encoding='utf-8')
+    new.write_text(json.dumps(row) + '\n' + json.dumps(dict(row, book_title='Other')) + '\n', encoding='utf-8')
+    assert main([str(old), str(old)]) == 0
+    assert main([str(old), str(new), '--json']) == 1
+    captured = capsys.readouterr()
+    assert json.loads(captured.out)['change'] == ADDED
+    assert captured.err.endswith('1 unchanged, 1 added, 0 removed, 0 modified\n')
@@ -0,0 +1,47 @@
+from datetime import date
+
+import CLI_approach
+from bibliography import build_citation
+from CLI_approach import RenderContext
+from disambiguation import CitationIndex, suffix_letters
+
+
+def book(title, author='John Dickson', year=2019):
+    return build_citation({'type': 'book', 'author': author, 'book_title': title, 'year_of_publication': year,
+                           'place_of_publication': 'London', 'publisher': 'Penguin'})
+
+
+def test_suffix_letters():
+    assert [suffix_letters(i) for i in (0, 1, 25, 26, 27, 701, 702)] == ['a', 'b', 'z', 'aa', 'ab', 'zz', 'aaa']
+
+
+def test_same_author_and_year():
+    zebras, apples, alone, later = book('Zebras'), book('Apples'), book('Other', 'Katy Perry'), book('Later', year=2020)
+    index = CitationIndex([zebras, apples, alone, later, book('Apples')])
+    assert len(index) == 4
+    # in the order of the titles, not of the input
+    assert index.in_text(apples) == '(Dickson, 2019a)' and index.in_text(zebras) == '(Dickson, 2019b)'
+    assert index.end_text(zebras).startswith('Dickson, J. (2019b) Zebras.')
+    assert index.in_text(alone) == '(Perry, 2019)' and index.in_text(later) == '(Dickson, 2020)'
+    assert index.cite(zebras, apples, alone, zebras) == '(Dickson, 2019b; Dickson, 2019a; Perry, 2019)'
+    assert index.cite([later]) == '(Dickson, 2020)'
+
+
+def test_groups_follow_the_in_text_names():
+    # two authors with the same surname are one group, et al. lists too
+    first, second = book('One', 'Ann Lee'), book('Two', 'Bob Lee')
+    many = [book('Many {}'.format(i), 'Ann Lee; Bob Ray; Cy Lo; Di Ma') for i in range(2)]
+    index = CitationIndex([first, second] + many)
+    assert [index.in_text(citation) for citation in (first, second)] == ['(Lee, 2019a)', '(Lee, 2019b)']
+    assert [index.in_text(citation) for citation in many] == ['(Lee et al., 2019a)', '(Lee et al., 2019b)']
+
+
+def test_one_context_for_the_index(monkeypatch):
+    sites = [build_citation({'type': 'website', 'author': 'Ann Lee', 'year_of_publication': 2020,
+                             'website_name': 'BBC', 'article_title': title, 'url': 'https://bbc.co.uk'})
+             for title in ('One', 'Two')]
+    index = CitationIndex(sites, RenderContext(date(2020, 1, 2)))
+    # no context built per citation
+    monkeypatch.setattr(CLI_approach, 'RenderContext', None)
+    assert [index.end_text(site)[-24:] for site in sites] == ['. [Accessed:02/01/2020].'] * 2
+    assert index.end_text(sites[1], context=RenderContext(date(2021, 5, 6))).endswith('[Accessed:06/05/2021].')
@@ -0,0 +1,68 @@
+import io
+import json
+from datetime import date
+
+from bibliography import build_citation
+from CLI_approach import Book, Chapter, EJournal, Journal, RenderContext, Thesis, Website
+from exporters import export, format_for
+from importers import BibTeXImporter
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+ROWS = [
+    {'type': 'journal', 'author': 'John Dickson; Katy Perry', 'year_of_publication': 2019,
+     'title_of_article': 'Methods & means', 'title_of_journal': 'Statistics Today', 'volume_number': 12,
+     'part_number': 3, 'page': '10-25'},
+    {'type': 'ejournal', 'author': 'Ann Lee', 'year_of_publication': 2021, 'title_of_article': 'Online',
+     'title_of_journal': 'PLOS', 'volume_number': 4, 'part_number': 1, 'page': '3', 'url': 'https://plos.org/a'},
+    {'type': 'book', 'author': 'Ann Lee', 'book_title': 'Economics 100%', 'year_of_publication': 2015,
+     'edition': 2, 'place_of_publication': 'London', 'publisher': 'Penguin'},
+    {'type': 'chapter', 'author': 'Bob Ray', 'book_title': 'Handbook', 'editors': 'Cy Lo; Di Ma',
+     'year_of_publication': 2011, 'edition': 3, 'place_of_publication': 'Leeds', 'publisher': 'Sage'},
+    {'type': 'thesis', 'author': 'Ed Fu', 'year_of_publication': 2010, 'thesis_title': 'Rays',
+     'degree_statement': 'PhD thesis', 'degree_awarding_body': 'Faculty of Science', 'location': 'Leeds',
+     'university': 'Faculty of Science'},
+    {'type': 'website', 'author': 'Ann Lee', 'year_of_publication': 2019, 'website_name': 'BBC',
+     'article_title': 'News', 'url': 'https://bbc.co.uk/news'},
+    {'type': 'newspaper', 'author': 'Ann Lee', 'newspaper_title': 'The Times', 'year_of_publication': 2019,
+     'article_title': 'Storm', 'day_of_publication': 21, 'month_of_publication': 11, 'page': 4},
+    {'type': 'video', 'author': 'Ann Lee', 'year_of_publication': 2021, 'day_of_publication': 22,
+     'month_of_publication': 7, 'channel_name': 'YouTube', 'video_title': 'How to cite', 'url': 'https://youtu.be/x'},
+]
+
+
+def test_bibtex_round_trip():
+    citations = [build_citation(row) for row in ROWS]
+    out = io.StringIO()
+    assert export(citations, out, 'bibtex', CONTEXT) == len(citations)
+    assert 'urldate = {2020-01-02}' in out.getvalue()
+    imported = list(BibTeXImporter(io.StringIO(out.getvalue()), errors=io.StringIO()))
+    assert [type(citation) for citation in imported] == [Journal, EJournal, Book, Chapter, Thesis, Website,
+                                                         Journal, Website]
+    assert imported[:5] == citations[:5]
+    # the website name is exported as its organization, not the author
+    assert imported[5].url == citations[5].url and imported[5].article_title == 'News'
+    # a newspaper comes back as a journal article : no day, the page as text
+    newspaper = imported[6]
+    assert (newspaper.author, newspaper.year_of_publication, newspaper.title_of_article, newspaper.master_title,
+            newspaper.page) == (citations[6].author, 2019, 'Storm', 'The Times', '4')
+    # a video comes back as a website of its channel : no day and month
+    video = imported[7]
+    assert (video.author, video.year_of_publication, video.article_title, video.website_name, video.url) == (
+        citations[7].author, 2021, 'How to cite', 'YouTube', 'https://youtu.be/x')
+
+
+def test_csl_json_export():
+    citations = [build_citation(row) for row in ROWS]
+    out = io.StringIO()
+    export(citations, out, 'csl-json', CONTEXT)
+    items = json.loads(out.getvalue())
+    assert [item['type'] for item in items] == ['article-journal', 'article-journal', 'book', 'chapter', 'thesis',
+                                                'webpage', 'article-newspaper', 'motion_picture']
+    assert items[0]['author'] == [{'family': 'Dickson', 'given': 'John'}, {'family': 'Perry', 'given': 'Katy'}]
+    assert items[0]['page'] == '10-25' and items[0]['issued'] == {'date-parts': [[2019]]}
+    assert items[2]['edition'] == 2
+    assert items[6]['issued'] == {'date-parts': [[2019, 11, 21]]} and items[7]['URL'] == 'https://youtu.be/x'
+
+
+def test_format_for():
+    assert format_for('refs.bib') == 'bibtex' and format_for('refs.json') == 'csl-json'
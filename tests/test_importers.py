@@ -0,0 +1,130 @@
+import io
+import json
+
+from bibliography import build_citation
+from CLI_approach import Book, Chapter, EJournal, Journal, Names, Thesis, Website
+from exporters import export
+from importers import BibTeXImporter, RISImporter, clean_latex, convert_name, importer_for
+
+BIBTEX = r'''
+@string{pub = "Penguin"}
+@comment{not an entry}
+@article{dickson2019,
+  author = {Dickson, John Smith and Perry, Katy},
+  title = {Methods},
+  journal = {Statistics Today},
+  year = 2019, volume = {12}, number = {3}, pages = {10--25}
+}
+@book{lee2015, author = {Ann Lee}, title = {Economics}, year = {2015}, edition = {Second},
+       address = {London}, publisher = pub}
+@inproceedings{ray2020, author = {Ray, Bob}, title = {A paper}, booktitle = {Proceedings of Things},
+       editor = {Lo, Cy}, year = 2020, address = {Leeds}, organization = {ACM}}
+@techreport{fu2001, author = {Ed Fu}, title = {Report}, year = 2001, institution = {NASA}}
+@misc{nourl, title = {Nothing}}
+'''
+
+RIS = '''TY  - JOUR
+AU  - Dickson, John
+TI  - Methods
+JO  - Statistics Today
+PY  - 2019
+VL  - 12
+IS  - 3
+SP  - 10
+EP  - 25
+ER  -
+TY  - CONF
+AU  - Ray, Bob
+ED  - Lo, Cy
+TI  - A paper
+T2  - Proceedings of Things
+PY  - 2020
+CY  - Leeds
+PB  - ACM
+ER  -
+TY  - GEN
+TI  - Something
+ER  -
+'''
+
+
+def test_latex_and_names():
+    assert clean_latex('Schr{\\"o}dinger \\& Sons') == 'Schrödinger & Sons'
+    assert convert_name('Dickson, John Smith') == 'John Smith Dickson'
+
+
+def test_bibtex_types_and_skipped_entries():
+    errors = io.StringIO()
+    importer = BibTeXImporter(io.StringIO(BIBTEX), errors=errors)
+    citations = list(importer)
+    assert [type(citation) for citation in citations] == [Journal, Book, Chapter]
+    journal, book, chapter = citations
+    assert journal.author == Names(['John Smith Dickson', 'Katy Perry']) and journal.page == '10-25'
+    assert book.publisher == 'Penguin' and book.edition == '2nd'
+    assert chapter.master_title == 'Proceedings of Things' and chapter.publisher == 'ACM'
+    assert chapter.editors == Names(['Cy Lo'])
+    assert importer.stats['skipped'] == 2
+    assert importer.stats['skipped_types'] == {'@techreport': 1, '@misc': 1}
+    assert 'no citation type for @techreport' in errors.getvalue()
+
+
+def test_bibtex_across_chunks():
+    whole = list(BibTeXImporter(io.StringIO(BIBTEX), errors=io.StringIO()))
+    assert list(BibTeXImporter(io.StringIO(BIBTEX), errors=io.StringIO(), chunk_size=7)) == whole
+
+
+def test_ris_types_and_skipped_entries():
+    errors = io.StringIO()
+    importer = RISImporter(io.StringIO(RIS), errors=errors)
+    journal, chapter = list(importer)
+    assert isinstance(journal, Journal) and journal.page == '10-25' and journal.part_number == 3
+    assert isinstance(chapter, Chapter) and chapter.master_title == 'Proceedings of Things'
+    assert importer.stats['skipped_types'] == {'TY  - GEN': 1}
+    assert 'no citation type for TY  - GEN' in errors.getvalue()
+
+
+def test_importer_for(tmp_path):
+    path = tmp_path / 'refs.ris'
+    path.write_text(RIS, encoding='utf-8')
+    assert list(importer_for(str(path), errors=io.StringIO())) == list(RISImporter(io.StringIO(RIS)))
+
+
+ROUND_TRIP = [
+    {'type': 'journal', 'author': 'John Dickson; Katy Perry', 'year_of_publication': 2019,
+     'title_of_article': 'Methods & means', 'title_of_journal': 'Statistics Today', 'volume_number': 12,
+     'part_number': 3, 'page': '10-25'},
+    {'type': 'ejournal', 'author': 'Ann Lee', 'year_of_publication': 2021, 'title_of_article': 'Online',
+     'title_of_journal': 'PLOS', 'volume_number': 4, 'part_number': 1, 'page': '3', 'url': 'https://plos.org/a'},
+    {'type': 'book', 'author': 'Ann Lee', 'book_title': 'Economics 100%', 'year_of_publication': 2015,
+     'edition': 2, 'place_of_publication': 'London', 'publisher': 'Penguin'},
+    {'type': 'chapter', 'author': 'Bob Ray', 'book_title': 'Handbook', 'editors': 'Cy Lo; Di Ma',
+     'year_of_publication': 2011, 'edition': 3, 'place_of_publication': 'Leeds', 'publisher': 'Sage'},
+    {'type': 'thesis', 'author': 'Ed Fu', 'year_of_publication': 2010, 'thesis_title': 'Rays',
+     'degree_statement': 'PhD thesis', 'degree_awarding_body': 'Faculty of Science', 'location': 'Leeds',
+     'university': 'Faculty of Science'},
+    {'type': 'website', 'author': 'Ann Lee', 'year_of_publication': 2019, 'website_name': 'BBC',
+     'article_title': 'News', 'url': 'https://bbc.co.uk/news'},
+]
+
+
+def test_bibtex_round_trip():
+    citations = [build_citation(row) for row in ROUND_TRIP]
+    out = io.StringIO()
+    assert export(citations, out, 'bibtex') == len(citations)
+    imported = list(BibTeXImporter(io.StringIO(out.getvalue()), errors=io.StringIO()))
+    assert [type(citation) for citation in imported] == [Journal, EJournal, Book, Chapter, Thesis, Website]
+    assert imported[:5] == citations[:5]
+    # the website name is exported as its organization, not the author
+    assert imported[5].url == citations[5].url and imported[5].article_title == 'News'
+
+
+def test_csl_json_export():
+    citations = [build_citation(row) for row in ROUND_TRIP]
+    out = io.StringIO()
+    export(citations, out, 'csl-json')
+    items = json.loads(out.getvalue())
+    assert [item['type'] for item in items] == ['article-journal', 'article-journal', 'book', 'chapter', 'thesis',
+                                                'webpage']
+    assert items[0]['author'] == [{'family': 'Dickson', 'given': 'John'}, {'family': 'Perry', 'given': 'Katy'}]
+    assert items[0]['page'] == '10-25' and items[0]['issued'] == {'date-parts': [[2019]]}
+    assert items[2]['edition'] == 2
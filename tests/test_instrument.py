@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+from bibliography import build_citation, get_fields
+from CLI_approach import Book, RenderContext, Video
+from instrument import Instrumentation, Timing
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+ROWS = [{'type': 'book', 'author': 'John Dickson', 'book_title': 'Economics', 'year_of_publication': 2018,
+         'place_of_publication': 'London', 'publisher': 'Penguin'},
+        {'type': 'video', 'author': 'Ann Lee', 'year_of_publication': 2021, 'day_of_publication': 22,
+         'month_of_publication': 7, 'channel_name': 'YouTube', 'video_title': 'How to cite', 'url': 'https://youtu.be/x'}]
+
+
+def render(rows):
+    return [(citation.end_text('html', CONTEXT), citation.in_text()) for citation in map(build_citation, rows)]
+
+
+def test_results_unchanged_and_methods_put_back():
+    expected = render(ROWS)
+    def methods():
+        return [cls.__dict__.get(name) for cls in (Book, Video) for name in ('__init__', 'end_text')]
+    before = methods()
+    instrumentation = Instrumentation()
+    with instrumentation:
+        assert render(ROWS) == expected
+        assert get_fields(Video) == tuple(ROWS[1])[1:]
+    assert render(ROWS) == expected
+    assert methods() == before
+    stats = instrumentation.stats()
+    # the outermost call only : a Video is built once, not once more as a WebDocument
+    assert stats['Video']['build']['count'] == 1 and 'WebDocument' not in stats
+    # and nothing counted once disabled
+    assert stats['Book']['end_text']['count'] == stats['Book']['in_text']['count'] == 1
+
+
+def test_errors_are_counted():
+    with Instrumentation([Book]) as instrumentation:
+        with pytest.raises(TypeError):
+            Book()
+    build = instrumentation.stats()['Book']['build']
+    assert build['count'] == build['errors'] == 1
+    assert 'harvard_ref_errors_total{type="Book",op="build"} 1' in instrumentation.to_prometheus()
+
+
+def test_percentiles():
+    timing = Timing()
+    for _ in range(99):
+        timing.add(1e-6, False)
+    timing.add(0.5, False)
+    assert timing.percentile(0.5) <= 1e-6 and timing.percentile(1.0) > 0.25
@@ -0,0 +1,54 @@
+import io
+import json
+from datetime import date
+
+from bibliography import Bibliography, build_citation
+from CLI_approach import RenderContext
+from parallel import ParallelRenderer
+
+
+def row(i):
+    if i % 3 == 0:
+        return {'type': 'website', 'author': 'Ann Lee', 'year_of_publication': 2000 + i % 20,
+                'website_name': 'BBC', 'article_title': 'News {}'.format(i), 'url': 'https://bbc.co.uk/{}'.format(i)}
+    return {'type': 'book', 'author': 'John Dickson; Katy Perry', 'book_title': 'Economics {}'.format(i),
+            'year_of_publication': 2000 + i % 20, 'place_of_publication': 'London', 'publisher': 'Penguin'}
+
+
+def serial(records):
+    citations = [build_citation(record) for record in records]
+    return [(citation.end_text(), citation.in_text()) for citation in citations]
+
+
+def test_same_output_as_the_serial_path():
+    rows = [row(i) for i in range(250)]
+    renderer = ParallelRenderer(workers=2, chunksize=16)
+    assert list(renderer.render(rows)) == serial(rows)
+    assert sum(stat['records'] for stat in renderer.stats.values()) == 250
+    assert 'records/s' in renderer.report()
+    # citation objects as well as rows
+    assert list(renderer.render([build_citation(record) for record in rows[:20]])) == serial(rows[:20])
+
+
+def test_one_context_for_the_run():
+    context = RenderContext(date(2020, 1, 2))
+    rendered = list(ParallelRenderer(workers=2, chunksize=4, context=context).render(row(i) for i in range(0, 30, 3)))
+    assert len(rendered) == 10 and all(end.endswith('[Accessed:02/01/2020].') for end, _ in rendered)
+
+
+def test_bad_records_are_reported_and_skipped():
+    rows = [row(0), {'type': 'podcast'}, row(1), dict(row(2), year_of_publication='soon'), row(4)]
+    errors = []
+    rendered = list(ParallelRenderer(workers=2, chunksize=2).render(rows, lambda *error: errors.append(error)))
+    assert rendered == serial([rows[0], rows[2], rows[4]])
+    assert [(key, kind) for key, kind, _ in errors] == [(1, 'KeyError'), (3, 'ValueError')]
+
+
+def test_bibliography_errors_go_to_its_stream():
+    lines = [json.dumps(row(1)), '{not json', json.dumps({'type': 'podcast'}), json.dumps(row(2))]
+    errors = io.StringIO()
+    bibliography = Bibliography(io.StringIO('\n'.join(lines) + '\n'), 'jsonl', errors=errors)
+    assert list(ParallelRenderer(workers=2, chunksize=1).render_bibliography(bibliography)) == serial([row(1), row(2)])
+    assert [line.split(':')[1:3] for line in errors.getvalue().splitlines()] == [['2', ' JSONDecodeError'],
+                                                                                 ['3', ' KeyError']]
+    assert bibliography.error_count == 2
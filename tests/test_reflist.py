@@ -0,0 +1,40 @@
+import random
+from datetime import date
+
+from bibliography import build_citation
+from CLI_approach import RenderContext
+from reflist import ReferenceList, collation_key, sorted_references
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+SURNAMES = ['Dickson', 'Ünal', 'de Vries', 'Unal', 'Perry', 'Abbott']
+
+
+def book(i, surname, year, publisher='Penguin'):
+    return build_citation({'type': 'book', 'author': 'Ann {}'.format(surname), 'book_title': 'Title {}'.format(i % 3),
+                           'year_of_publication': year, 'place_of_publication': 'London', 'publisher': publisher})
+
+
+def test_collation():
+    assert collation_key('Ünal') == collation_key('unal') and collation_key('de Vries') == 'de vries'
+
+
+def test_spilled_runs_merge_in_stable_order(tmp_path):
+    rng = random.Random(3)
+    citations = [book(i, rng.choice(SURNAMES), rng.choice([2001, 2002]), 'Publisher {}'.format(i))
+                 for i in range(300)]
+    # sorted() is stable : ties keep the order they were added in
+    expected = [citation.end_text('text', CONTEXT)
+                for citation in sorted(citations, key=lambda citation: (
+                    collation_key(citation.author.get_famname()[0]), citation.year_of_publication,
+                    collation_key(citation.master_title)))]
+    with ReferenceList(memory_budget=4000, context=CONTEXT, tmpdir=str(tmp_path)) as references:
+        references.extend(citations)
+        assert len(references.runs) > 5 and len(references) == 300
+        assert list(references) == expected
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_in_memory_list():
+    citations = [book(1, 'Perry', 2001), book(2, 'Abbott', 2005), book(3, 'Perry', 1999)]
+    assert [text[:20] for text in sorted_references(citations, context=CONTEXT)] == [
+        'Abbott, A. (2005) Ti', 'Perry, A. (1999) Tit', 'Perry, A. (2001) Tit']
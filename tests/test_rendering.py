@@ -0,0 +1,136 @@
+from datetime import date
+
+import pytest
+
+import CLI_approach
+from CLI_approach import Names, RenderContext, Thesis
+
+ACCESSED = date(2020, 1, 2)
+ONE = ['John Smith Dickson']
+TWO = ['John Dickson', 'Katy Perry']
+FIVE = ['Ann Lee', 'Bob Ray', 'Cy Lo', 'Di Ma', 'Ed Fu']
+
+# (class, authors, other constructor arguments, end-text, in-text), the
+# citations given by the first version of CLI_approach.py for the same records
+CASES = [
+    ('Website', ONE, (2019, 'YourCoach', 'Vroom theory', 'https://yourcoach.be/vroom'),
+     'Dickson, J.S. (2019) Vroom theory. [Online] Available from: https://yourcoach.be/vroom. [Accessed:02/01/2020].',
+     '(Dickson, 2019)'),
+    ('Website', None, (None, 'YourCoach', 'Vroom theory', 'https://yourcoach.be/vroom'),
+     'YourCoach. (n.d.) Vroom theory. [Online] Available from: https://yourcoach.be/vroom. [Accessed:02/01/2020].',
+     '(YourCoach, n.d.)'),
+    ('Blog', TWO, (2020, 'Medium', 'A post', 'https://medium.com/p'),
+     'Dickson, J. and Perry, K. (2020) A post. [Online] Available from: https://medium.com/p. [Accessed:02/01/2020].',
+     '(Dickson and Perry, 2020)'),
+    ('WebDocument', ONE, (2018, 3, 'Gov', 'Annual report', 'https://gov.uk/r'),
+     'Dickson, J.S. (2018) Annual report. [Online] March 2018. Available from:https://gov.uk/r. '
+     '[Accessed:02/01/2020].',
+     '(Dickson, 2018)'),
+    ('Journal', ONE, (2019, 'Methods', 'Statistics Today', 12, 3, (10, 25)),
+     'Dickson, J.S. (2019) Methods. Statistics Today. 12 (3). p. 10-25',
+     '(Dickson, 2019)'),
+    ('Journal', FIVE, (2017, 'Many hands', 'Nature', 1, 2, 7),
+     'Lee, A. , Ray, B. , Lo, C. , Ma, D. and Fu, E. (2017) Many hands. Nature. 1 (2). p. 7',
+     '(Lee et al., 2017)'),
+    ('EJournal', TWO, (2021, 'Online methods', 'PLOS', 4, 1, None, 'https://plos.org/a'),
+     'Dickson, J. and Perry, K. (2021) Online methods. PLOS. 4 (1). p. . Available from:https://plos.org/a. '
+     '[Accessed: 02/01/2020]',
+     '(Dickson and Perry, 2021)'),
+    ('Book', TWO, ('Economics', 2018, None, 2, 'London', 'Penguin'),
+     'Dickson, J. and Perry, K. (2018) Economics. 2nd edition. London: Penguin.',
+     '(Dickson and Perry, 2018)'),
+    ('Book', FIVE, ('Big book', 2015, 3, None, 'Oxford', 'OUP'),
+     'Lee, A. , Ray, B. , Lo, C. , Ma, D. and Fu, E. (2015) Big book. Volume 3. Oxford: OUP.',
+     '(Lee et al., 2015)'),
+    ('EBook', ONE, ('Digital economics', 2020, None, 1, 'Cambridge', 'CUP', 'https://cup.org/b'),
+     'Dickson, J.S. (2020) Digital economics. [Online] 1st edition. Cambridge: CUP. Available from:https://cup.org/b. '
+     '[Accessed: 02/01/2020]',
+     '(Dickson, 2020)'),
+    ('Chapter', ONE, ('Handbook', TWO, 2011, None, 3, 'Leeds', 'Sage'),
+     'Dickson, J.S. (2011) Handbook. In: Dickson, J. and Perry, K.  (eds). 3rd edition. Leeds: Sage.',
+     '(Dickson, 2011)'),
+    ('Encyclopedia', ONE, ('Britannica', ['Ann Lee'], 2005, 12, 15, 'Chicago', 'EB'),
+     'Dickson, J.S. (2005) Britannica. In: Lee, A.  (ed). Volume 12.  15th edition. Chicago: EB.',
+     '(Dickson, 2005)'),
+    ('Dictionary', TWO, ('Oxford English Dictionary', 1989, 20, 2, 'Oxford', 'Clarendon'),
+     'Dickson, J. and Perry, K. (eds.)  (1989) Oxford English Dictionary. Volume 20.  2nd edition. Oxford: Clarendon.',
+     '(Dickson and Perry, 1989)'),
+    ('Dictionary', None, ('Collins Dictionary', 2014, None, 12, 'Glasgow', 'Collins'),
+     'Collins Dictionary. (2014) Collins Dictionary. 12th edition. Glasgow: Collins.',
+     '(Collins Dictionary, 2014)'),
+    ('Image', None, (2016, 'Flickr', 'Sunset over hills', 'https://flickr.com/i'),
+     'Flickr. (2016) Sunset over hills. [Online Image] Available from:https://flickr.com/i. [Accessed:02/01/2020].',
+     '(Flickr, 2016)'),
+    ('Newspaper', ONE, ('The Times', 2019, 'Storm warning', 21, 11, 4),
+     'Dickson, J.S.  (2019) Storm warning. The Times. 21st November.p. 4',
+     '(Dickson, 2019)'),
+    ('Newspaper', None, ('The Guardian', 2020, 'Budget day', 2, 3, None),
+     'The Guardian. (2020) Budget day. The Guardian. 2nd March.',
+     '(The Guardian, 2020)'),
+    ('Video', ONE, (2021, 22, 7, 'YouTube', 'How to cite', 'https://youtu.be/x'),
+     'Dickson, J.S. (2021) How to cite. [Online Video] 22nd July. Available from:https://youtu.be/x. '
+     '[Accessed:02/01/2020].',
+     '(Dickson, 2021)'),
+]
+
+
+def build(kind, authors, args):
+    args = [Names(value) if isinstance(value, list) else value for value in args]
+    return getattr(CLI_approach, kind)(None if authors == None else Names(authors), *args)
+
+
+@pytest.mark.parametrize('kind, authors, args, end_text, in_text', CASES)
+def test_plain_text_matches_first_version(kind, authors, args, end_text, in_text):
+    citation = build(kind, authors, args)
+    assert citation.end_text('text', RenderContext(ACCESSED)) == end_text
+    assert citation.in_text() == in_text
+
+
+def test_access_date_of_the_context():
+    citation = build(*CASES[0][:3])
+    context = RenderContext(ACCESSED, '%Y-%m-%d')
+    assert citation.end_text(context=context).endswith('[Accessed:2020-01-02].')
+    assert citation.end_text().endswith('[Accessed:{}].'.format(date.today().strftime('%d/%m/%Y')))
+
+
+def test_names_are_parsed_once():
+    names = Names(['John Smith Dickson', 'Katy Perry'])
+    assert names.get_parsed() == (('Dickson', ('John', 'Smith'), 'J.S.'), ('Perry', ('Katy',), 'K.'))
+    assert names.get_parsed() is names.get_parsed()
+    assert names.get_famname() == ['Dickson', 'Perry'] and names.get_initials() == ['J.S.', 'K.']
+    assert names.get_endtext_name() == 'Dickson, J.S. and Perry, K. '
+
+
+def test_thesis_prints_the_names():
+    citation = Thesis(Names(ONE), 2010, 'Rays', 'PhD', 'Faculty of Science', 'Leeds', 'University of Leeds')
+    assert citation.end_text() == 'Dickson, J.S. (2010) Rays. PhD. Faculty of Science. Leeds: University of Leeds'
+
+
+@pytest.mark.parametrize('markup, title', [('html', '<i>Economics</i>'), ('markdown', '*Economics*'),
+                                           ('rtf', '{\\i Economics}')])
+def test_titles_in_italics(markup, title):
+    citation = build(*CASES[7][:3])
+    assert title in citation.end_text(markup)
+
+
+def test_html_is_escaped():
+    citation = build('Book', ['Ann Lee'], ('Tom & Jerry <1>', 2001, None, None, 'London', 'Penguin'))
+    assert '<i>Tom &amp; Jerry &lt;1&gt;</i>' in citation.end_text('html')
+
+
+def test_records_are_immutable_and_hashable():
+    first = build(*CASES[7][:3])
+    second = build(*CASES[7][:3])
+    assert first == second and hash(first) == hash(second)
+    with pytest.raises(AttributeError):
+        first.publisher = 'Other'
+    assert Names(TWO) == Names(list(TWO)) and len({Names(TWO), Names(TWO)}) == 1
+
+
+def test_year_suffix():
+    citation = build(*CASES[7][:3])
+    assert citation.end_text(year_suffix='a').startswith('Dickson, J. and Perry, K. (2018a) Economics.')
+    assert citation.in_text('b') == '(Dickson and Perry, 2018b)'
+    # the month and year of a web document stay as they are
+    document = build(*CASES[3][:3])
+    assert '(2018a)' in document.end_text(year_suffix='a') and 'March 2018.' in document.end_text(year_suffix='a')
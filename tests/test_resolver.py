@@ -0,0 +1,170 @@
+import asyncio
+import io
+import json
+
+from bibliography import build_citation
+from CLI_approach import EJournal, Names, Website
+from resolver import HTTPError, Resolver, ResponseCache, resolve_all
+
+ARTICLE = {'type': 'article-journal', 'title': 'Methods', 'container-title': 'Statistics Today',
+           'author': [{'given': 'John', 'family': 'Dickson'}], 'issued': {'date-parts': [[2019]]},
+           'volume': '12', 'issue': '3', 'page': '10-25', 'URL': 'https://doi.org/10.5555/a'}
+
+PAGE = '''<html><head><title>Ignored</title>
+<meta name="citation_title" content="A page">
+<meta name="citation_author" content="Lee, Ann">
+<meta name="citation_publication_date" content="2021/03/01">
+<meta property="og:site_name" content="BBC">
+</head><body>text</body></html>'''
+
+
+class Stub:
+    '''
+    Local HTTP/1.1 server answering each path from `routes`, a dict
+    of path -> (status, content type, body). Counts the requests.
+    '''
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                path = line.split()[1].decode()
+                self.requests.append(path)
+                status, content_type, body = self.routes.get(path, (404, 'text/plain', 'not found'))
+                body = body.encode()
+                writer.write('HTTP/1.1 {} X\r\nContent-Type: {}\r\nContent-Length: {}\r\n\r\n'.format(
+                    status, content_type, len(body)).encode() + body)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def run(routes, *batches, **options):
+    '''
+    Resolves each batch of paths with a new Resolver against one stub
+    server. Returns (stub, [(results, resolver) for each batch]).
+    '''
+    stub = Stub(routes)
+
+    async def main():
+        server = await asyncio.start_server(stub.handle, '127.0.0.1', 0)
+        base = 'http://127.0.0.1:{}'.format(server.sockets[0].getsockname()[1])
+        done = []
+        try:
+            for paths in batches:
+                resolver = Resolver(errors=io.StringIO(), **options)
+                try:
+                    done.append(([result async for result in resolver.resolve(base + path for path in paths)],
+                                 resolver))
+                finally:
+                    resolver.close()
+            # let the stub see its connections closed
+            await asyncio.sleep(0.01)
+        finally:
+            server.close()
+            await server.wait_closed()
+        return done
+    return stub, asyncio.run(main())
+
+
+def test_csl_json_and_meta_tags():
+    routes = {'/article': (200, 'application/json', json.dumps(ARTICLE)),
+              '/page': (200, 'text/html; charset=utf-8', PAGE)}
+    _, [(results, resolver)] = run(routes, ['/article', '/page', '/missing'])
+    (_, article, _), (_, page, _), (_, missing, error) = results
+    citation = build_citation(article)
+    assert isinstance(citation, EJournal) and citation.page == '10-25' and citation.volume_number == 12
+    assert citation.url == 'https://doi.org/10.5555/a'
+    page = build_citation(page)
+    assert isinstance(page, Website) and page.article_title == 'A page' and page.website_name == 'BBC'
+    assert page.year_of_publication == 2021 and page.author == Names(['Ann Lee'])
+    assert missing == None and 'HTTP 404' in str(error)
+    assert resolver.stats['resolved'] == 2 and resolver.stats['errors'] == 1
+
+
+def test_unexpected_json_is_a_failed_lookup():
+    routes = {'/numbers': (200, 'application/json', '[1]'),
+              '/names': (200, 'application/json', json.dumps(dict(ARTICLE, author=['John Dickson']))),
+              '/article': (200, 'application/json', json.dumps(ARTICLE))}
+    _, [(results, resolver)] = run(routes, ['/numbers', '/names', '/article'])
+    assert [type(error).__name__ for _, _, error in results] == ['ValueError', 'ValueError', 'NoneType']
+    assert results[2][1]['title_of_article'] == 'Methods'
+    assert resolver.stats['errors'] == 2
+    assert 'unexpected JSON' in resolver.errors.getvalue()
+
+
+def test_only_lasting_responses_are_cached(tmp_path):
+    routes = {'/article': (200, 'application/json', json.dumps(ARTICLE)),
+              '/busy': (429, 'text/plain', 'slow down'),
+              '/broken': (503, 'text/plain', 'down')}
+    paths = ['/article', '/busy', '/broken', '/missing']
+    stub, [_, (results, resolver)] = run(routes, paths, paths, cache=str(tmp_path / 'responses.db'))
+    # the 200 and the 404 come from the cache, the 429 and the 503 are asked again
+    assert stub.requests == paths + ['/busy', '/broken']
+    assert resolver.stats['cache_hits'] == 2
+    assert [row['title_of_article'] if row else None for _, row, _ in results] == ['Methods', None, None, None]
+
+
+def test_transient_errors_left_in_an_old_cache_are_asked_again(tmp_path):
+    path = str(tmp_path / 'responses.db')
+    routes = {'/busy': (200, 'application/json', json.dumps(ARTICLE))}
+    stub = Stub(routes)
+
+    async def main():
+        server = await asyncio.start_server(stub.handle, '127.0.0.1', 0)
+        url = 'http://127.0.0.1:{}/busy'.format(server.sockets[0].getsockname()[1])
+        # written by a version that kept every status below 500
+        cache = ResponseCache(path)
+        cache.put(url, 429, 'text/plain', b'slow down')
+        cache.close()
+        resolver = Resolver(cache=path, errors=io.StringIO())
+        try:
+            return [result async for result in resolver.resolve([url])], resolver
+        finally:
+            resolver.close()
+            await asyncio.sleep(0.01)
+            server.close()
+            await server.wait_closed()
+    results, resolver = asyncio.run(main())
+    assert results[0][1]['title_of_article'] == 'Methods' and stub.requests == ['/busy']
+    assert resolver.stats['cache_hits'] == 0
+
+
+def test_none_is_an_empty_identifier():
+    routes = {'/article': (200, 'application/json', json.dumps(ARTICLE))}
+    stub = Stub(routes)
+
+    async def main():
+        server = await asyncio.start_server(stub.handle, '127.0.0.1', 0)
+        url = 'http://127.0.0.1:{}/article'.format(server.sockets[0].getsockname()[1])
+        resolver = Resolver(errors=io.StringIO())
+        try:
+            return [result async for result in resolver.resolve([None, url, '', None])]
+        finally:
+            resolver.close()
+            await asyncio.sleep(0.01)
+            server.close()
+            await server.wait_closed()
+    results = asyncio.run(main())
+    # the lookups after a None are not dropped
+    assert [(identifier, row != None, error) for identifier, row, error in results] == [
+        (None, False, None), (results[1][0], True, None), ('', False, None), (None, False, None)]
+
+
+def test_connect_timeout(monkeypatch):
+    async def never(*args, **kwargs):
+        await asyncio.sleep(60)
+    monkeypatch.setattr(asyncio, 'open_connection', never)
+    errors = io.StringIO()
+    [(_, row, error)] = resolve_all(['http://192.0.2.1/page'], timeout=0.05, errors=errors)
+    assert row == None and isinstance(error, HTTPError) and 'connection timed out' in str(error)
+    assert 'connection timed out' in errors.getvalue()
@@ -0,0 +1,73 @@
+import io
+import random
+
+import scanner as scanner_module
+from bibliography import build_citation
+from scanner import Automaton, CitationScanner
+
+
+def book(author, year, title='Economics'):
+    return build_citation({'type': 'book', 'author': author, 'book_title': title, 'year_of_publication': year,
+                           'place_of_publication': 'London', 'publisher': 'Penguin'})
+
+
+BIBLIOGRAPHY = [book('John Dickson', 2019), book('John Dickson', 2019, 'Zoology'), book('Katy Perry', 2020),
+                book('Ann Lee; Bob Ray', 2015), book('Ed Fu', 2001)]
+
+MANUSCRIPT = '''Growth is slow (Dickson, 2019a; Perry, 2020) and Lee and Ray (2015)
+found the same. Others disagree (Dikson, 2019b, p. 4) or (Perry, 2021) and
+(Moon, 1999). McDickson, 2019a is a different name.
+'''
+
+
+def test_automaton_finds_every_occurrence():
+    automaton = Automaton(['he', 'she', 'his', 'hers'])
+    assert sorted(automaton.search('ushers')) == [(1, 1), (2, 0), (2, 3)]
+    rng = random.Random(2)
+    patterns = [''.join(rng.choice('ab') for _ in range(rng.randint(1, 4))) for _ in range(12)]
+    automaton = Automaton(patterns)
+    for _ in range(20):
+        text = ''.join(rng.choice('abc') for _ in range(60))
+        expected = sorted((i, number) for number, pattern in enumerate(patterns)
+                          for i in range(len(text)) if text.startswith(pattern, i))
+        assert sorted(automaton.search(text)) == expected
+
+
+def test_report():
+    report = CitationScanner(BIBLIOGRAPHY).scan(MANUSCRIPT)
+    labels = report.as_dict()
+    assert labels['found'] == {'Dickson, 2019a': [MANUSCRIPT.index('Dickson')], 'Perry, 2020': [32],
+                               'Lee and Ray, 2015': [MANUSCRIPT.index('Lee')]}
+    assert [(item['text'], item['expected']) for item in labels['near_miss']] == [
+        ('Dikson, 2019b', 'Dickson, 2019b'), ('Perry, 2021', 'Perry, 2020')]
+    assert labels['missing'] == [{'offset': MANUSCRIPT.index('Moon'), 'text': 'Moon, 1999'}]
+    assert labels['unused'] == ['Dickson, 2019b', 'Fu, 2001']
+
+
+def test_cites_across_chunks():
+    scanner = CitationScanner(BIBLIOGRAPHY)
+    whole = scanner.scan(MANUSCRIPT).as_dict()
+    # every cut, including inside '(Dickson, 2019a;' and across the line end inside a bracket
+    text = MANUSCRIPT.replace('and Lee', 'and\nLee').replace('(Dikson, 2019b,', '(Dikson,\n2019b,')
+    expected = scanner.scan(text).as_dict()
+    assert expected['near_miss'] == whole['near_miss'] and expected['found'].keys() == whole['found'].keys()
+    for chunk_size in (1, 5, 17, 33, 64):
+        assert scanner.scan(io.StringIO(text), chunk_size=chunk_size).as_dict() == expected
+
+
+def test_unknown_years_only_compare_the_same_initial(monkeypatch):
+    bibliography = BIBLIOGRAPHY + [book('{} Smith'.format(name), 2000 + i) for i, name in enumerate('ABCDEFGH')]
+    scanner = CitationScanner(bibliography)
+    compared = []
+    close_matches = scanner_module.difflib.get_close_matches
+
+    def get_close_matches(word, candidates, *args, **kwargs):
+        compared.append(list(candidates))
+        return close_matches(word, candidates, *args, **kwargs)
+    monkeypatch.setattr(scanner_module.difflib, 'get_close_matches', get_close_matches)
+    report = scanner.scan('(Perry, 2031) (Dickson, 2031) (Quill, 2031) (Perry, 2031)')
+    assert [(text, expected) for _, text, expected in report.near_miss] == [
+        ('Perry, 2031', 'Perry, 2020'), ('Dickson, 2031', 'Dickson, 2019b'), ('Perry, 2031', 'Perry, 2020')]
+    assert report.missing == [(31, 'Quill, 2031')]
+    # once per cite, never the whole bibliography
+    assert compared == [['Perry, 2020'], ['Dickson, 2019a', 'Dickson, 2019b'], []]
@@ -0,0 +1,63 @@
+import search
+from bibliography import build_citation
+from search import SearchIndex
+
+
+def book(title, author='John Dickson'):
+    return build_citation({'type': 'book', 'author': author, 'book_title': title, 'year_of_publication': 2019,
+                           'place_of_publication': 'London', 'publisher': 'Penguin'})
+
+
+def test_prefix_typo_and_field():
+    index = SearchIndex()
+    numbers = index.update([book('Economics'), book('Econometrics', 'Ann Lee'), book('Statistics')])
+    assert [number for number, _ in index.search('econ')] == numbers[:2]
+    assert [number for number, _ in index.search('author:lee econ')] == [numbers[1]]
+    assert [number for number, _ in index.search('statistcs')] == [numbers[2]]
+
+
+def test_word_removed_then_added_again(monkeypatch):
+    # sort the word list on every call
+    monkeypatch.setattr(search, 'MERGE_WORDS', 0)
+    index = SearchIndex()
+    first = index.update([book('Economics'), book('Statistics')])[0]
+    assert 'economics' in index.words
+    index.remove(first)
+    monkeypatch.setattr(search, 'MERGE_WORDS', 512)
+    second = index.add(book('Economics'))
+    index.add(book('Economy'))
+    assert index.expand_prefix('econ').count('economics') == 1
+    assert [number for number, _ in index.search('econom', k=5)] == [second, second + 1]
+    # and once sorted again
+    monkeypatch.setattr(search, 'MERGE_WORDS', 0)
+    assert index.sorted_words().count('economics') == 1
+    assert index.expand_prefix('econ').count('economics') == 1
+
+
+def test_typos_of_every_kind():
+    index = SearchIndex()
+    numbers = index.update([book('Statistics'), book('Economics')])
+    for query in ('statistcs', 'sattistics', 'statisstics', 'stutistics'):
+        assert [number for number, _ in index.search(query)] == [numbers[0]]
+    index.remove(numbers[0])
+    assert index.search('sattistics') == []
+    assert all('statistics' not in words for words in index.deleted.values())
+
+
+def test_walked_levels_find_the_same_records(monkeypatch):
+    titles = ['Economics of labour', 'Economics of land', 'Labour markets', 'Land economics']
+    index = SearchIndex()
+    index.update([book(titles[i % 4], ['John Dickson', 'Ann Lee'][i % 3 == 0]) for i in range(200)])
+    queries = ['economics', 'economics labour', 'lee land', 'econ lab', 'dickson markets']
+    everything = [dict(index.search(query, k=200)) for query in queries]
+    expected = [index.search(query) for query in queries]
+    # walk the levels, a few records at a time
+    monkeypatch.setattr(search, 'SCAN_FROM', 4)
+    monkeypatch.setattr(search, 'WALK_STEP', 8)
+    for query, found, scores in zip(queries, expected, everything):
+        walked = index.search(query)
+        assert [score for _, score in walked] == [score for _, score in found]
+        assert all(scores[number] == score for number, score in walked)
+    # and give up early
+    monkeypatch.setattr(search, 'MAX_WALK', 8)
+    assert len(index.search('economics labour', k=100)) < len(everything[1])
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from service import MAX_BODY, MAX_LINE, BadRequest, RenderService
+
+BOOK = {'type': 'book', 'author': 'John Dickson', 'book_title': 'Economics', 'year_of_publication': 2018,
+        'place_of_publication': 'London', 'publisher': 'Penguin'}
+
+
+def post(path, body, headers=None):
+    body = body if isinstance(body, bytes) else json.dumps(body).encode()
+    headers = {'Content-Length': str(len(body)), **(headers or {})}
+    lines = ['POST {} HTTP/1.1'.format(path)] + ['{}: {}'.format(name, value) for name, value in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+def exchange(*requests):
+    '''
+    Sends raw requests on one connection to a new service. Returns the
+    list of (status, payload) answered before the service closed it.
+    '''
+    async def main():
+        service = await RenderService(port=0).start()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', service.port)
+            responses = []
+            for request in requests:
+                writer.write(request)
+                line = await reader.readline()
+                if not line:
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers['content-length']))
+                responses.append((int(line.split()[1]), json.loads(body)))
+            writer.close()
+            return responses
+        finally:
+            await service.close()
+    return asyncio.run(main())
+
+
+def test_render_and_batch():
+    [(status, result), (batch_status, batch)] = exchange(post('/render', BOOK),
+                                                         post('/render/batch?markup=html', [BOOK, {}, 3]))
+    assert status == 200 and result == {'end_text': result['end_text'], 'in_text': '(Dickson, 2018)'}
+    assert batch_status == 200 and batch[0]['end_text'].startswith('Dickson, J. (2018) <i>Economics</i>')
+    assert 'error' in batch[1] and batch[2] == {'error': 'ValueError: record is not a JSON object'}
+
+
+@pytest.mark.parametrize('request_, status', [
+    (b'GET /nowhere HTTP/1.1\r\n\r\n', 404),
+    (b'GET /render HTTP/1.1\r\n\r\n', 405),
+    (post('/render?markup=latex', BOOK), 400),
+    (post('/render', b'{not json'), 400),
+    (post('/render', [BOOK]), 400),
+    (post('/render/batch', BOOK), 400),
+    (post('/render', {'type': 'podcast'}), 400),
+])
+def test_bad_requests_keep_the_connection(request_, status):
+    [(first, payload), (health, _)] = exchange(request_, b'GET /health HTTP/1.1\r\n\r\n')
+    assert first == status and 'error' in payload
+    assert health == 200
+
+
+@pytest.mark.parametrize('request_, status', [
+    (b'NONSENSE\r\n\r\n', 400),
+    (b'POST /render HTTP/1.1\r\n\r\n', 411),
+    (post('/render', BOOK, {'Content-Length': 'ten'}), 400),
+    (post('/render', BOOK, {'Content-Length': '-1'}), 400),
+    (post('/render', BOOK, {'Content-Length': '1_0'}), 400),
+    (post('/render', BOOK, {'Content-Length': str(MAX_BODY + 1)}), 413),
+    (b'GET /' + b'a' * MAX_LINE + b' HTTP/1.1\r\n\r\n', 400),
+    (post('/render', BOOK, {'X-Long': 'a' * MAX_LINE}), 431),
+])
+def test_unreadable_requests_close_the_connection(request_, status):
+    [(first, payload)] = exchange(request_, b'GET /health HTTP/1.1\r\n\r\n')
+    assert first == status and 'error' in payload
+
+
+def test_stats_count_the_errors():
+    responses = exchange(post('/render', BOOK), post('/render', {'type': 'book'}), b'GET /stats HTTP/1.1\r\n\r\n')
+    stats = responses[-1][1]
+    assert stats['requests'] == 3 and stats['records'] == 2 and stats['errors'] == 1
+    assert stats['latency_ms']['count'] == 2
+
+
+def test_close_fails_the_pending_requests():
+    async def main():
+        service = await RenderService(port=0).start()
+        release = threading.Event()
+        render_batch = service._render_batch
+
+        def slow(batch, context):
+            release.wait(5)
+            return render_batch(batch, context)
+        service._render_batch = slow
+        # the first request is rendering, the others wait for the next batch
+        first = asyncio.ensure_future(service.render([BOOK]))
+        await asyncio.sleep(0.05)
+        waiting = [asyncio.ensure_future(service.render([BOOK])) for _ in range(2)]
+        await asyncio.sleep(0)
+        await asyncio.wait_for(service.close(), 1)
+        release.set()
+        results = await asyncio.gather(first, *waiting, return_exceptions=True)
+        with pytest.raises(BadRequest):
+            await service.render([BOOK])
+        return results
+    results = asyncio.run(main())
+    assert [(type(error), error.status) for error in results] == [(BadRequest, 503)] * 3
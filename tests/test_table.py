@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+
+from bibliography import build_citation
+from CLI_approach import RenderContext
+from table import HIGHEST, LOWEST, CitationTable
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+ROWS = [
+    {'type': 'book', 'author': 'John Dickson; Katy Perry', 'book_title': 'Economics', 'year_of_publication': 2018,
+     'edition': 2, 'place_of_publication': 'London', 'publisher': 'Penguin'},
+    {'type': 'journal', 'author': ['Ann Lee'], 'year_of_publication': '2019', 'title_of_article': 'Methods',
+     'title_of_journal': 'Statistics Today', 'volume_number': 12, 'part_number': 3, 'page': '10-25'},
+    {'type': 'Website', 'author': '', 'year_of_publication': None, 'website_name': 'BBC',
+     'article_title': 'News', 'url': 'https://bbc.co.uk'},
+    {'type': 'newspaper', 'author': 'Ann Lee', 'newspaper_title': 'The Times', 'year_of_publication': 2019,
+     'article_title': 'Storm', 'day_of_publication': 21, 'month_of_publication': 11, 'page': 4},
+]
+
+
+def test_round_trip():
+    table = CitationTable(ROWS)
+    assert len(table) == 4
+    for i, row in enumerate(ROWS):
+        assert table.citation(i) == build_citation(row)
+    assert table.row(1)['page'] == (10, 25) and table.row(3)['page'] == 4
+    assert table.row(0)['author'] == 'John Dickson; Katy Perry'
+    assert list(table.end_texts(context=CONTEXT)) == [build_citation(row).end_text('text', CONTEXT) for row in ROWS]
+
+
+def test_missing_values():
+    table = CitationTable(ROWS)
+    # empty and absent fields are not stored, columns first seen late are filled in
+    assert 'author' not in table.row(2) and 'year_of_publication' not in table.row(2)
+    assert 'edition' not in table.row(1) and 'url' not in table.row(0)
+    assert table.strings('url') == [None, None, 'https://bbc.co.uk', None]
+    assert table.strings('doi') == [None] * 4
+    assert all(len(column) == 4 for column in table.columns.values())
+
+
+def test_column_formatting():
+    table = CitationTable(ROWS)
+    assert table.format_years() == ['2018', '2019', 'n.d.', '2019']
+    assert table.positions('edition') == ['2nd', None, None, None]
+    assert table.positions('day_of_publication') == [None, None, None, '21st']
+    assert table.format_pages() == ['', '10-25', '', '4']
+    assert table.column('volume_number')[1] == 12 and len(table.column('volume_number')) == 4
+
+
+def test_negative_numbers_are_not_missing():
+    table = CitationTable([dict(ROWS[1], volume_number=-1, page=(-1, LOWEST)), dict(ROWS[0], edition=HIGHEST)])
+    assert table.row(0)['volume_number'] == -1 and table.row(0)['page'] == (-1, LOWEST)
+    assert table.row(1)['edition'] == HIGHEST and 'volume_number' not in table.row(1)
+
+
+@pytest.mark.parametrize('field, value', [
+    ('edition', 2 ** 40),
+    ('year_of_publication', LOWEST - 1),
+    ('page', (1, HIGHEST + 1)),
+    ('page', 'ten'),
+])
+def test_bad_rows_leave_the_table_as_it_was(field, value):
+    table = CitationTable(ROWS[:2])
+    before = list(table)
+    strings = len(table.pool)
+    # the new column and the strings of the row are not added either
+    with pytest.raises(ValueError):
+        table.append(dict(ROWS[0], **{field: value, 'url': 'https://new.org'}))
+    assert len(table) == 2 and list(table) == before and len(table.pool) == strings
+    assert 'url' not in table.columns and all(len(column) == 2 for column in table.columns.values())
+    table.append(ROWS[3])
+    assert list(table) == before + [CitationTable([ROWS[3]]).row(0)]
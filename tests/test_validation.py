@@ -0,0 +1,92 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+from bibliography import Bibliography, build_citation
+from CLI_approach import RenderContext
+from parallel import ParallelRenderer
+from validation import format_errors, validate, validate_rows
+
+BOOK = {'type': 'book', 'author': 'John Dickson', 'book_title': 'Economics', 'year_of_publication': 2018,
+        'place_of_publication': 'London', 'publisher': 'Penguin'}
+
+
+def test_valid_rows():
+    assert validate(BOOK) == []
+    assert validate(dict(BOOK, type=' Book ', year_of_publication='2018', edition='', author='A B; C D')) == []
+    assert validate({'type': 'website', 'author': '', 'year_of_publication': 2020, 'website_name': 'BBC',
+                     'article_title': 'News', 'url': 'https://bbc.co.uk'}) == []
+
+
+def test_every_error_of_a_row():
+    errors = validate(dict(BOOK, author=None, year_of_publication='soon', publisher=3))
+    assert errors == [('author', 'required'), ('year_of_publication', "expected an int, got 'soon'"),
+                      ('publisher', 'expected text, got int')]
+    assert format_errors(errors).startswith('author: required; year_of_publication')
+    assert validate({'type': 'podcast'}) == [('type', "unknown citation type 'podcast'")]
+    assert validate([1]) == [('', 'record is not a JSON object')]
+
+
+@pytest.mark.parametrize('field, value', [
+    ('edition', []),
+    ('year_of_publication', []),
+    ('volume', [1]),
+    ('author', ['  A']),
+    ('author', 'John  Smith'),
+    ('author', 'A B;  C  D'),
+])
+def test_rows_build_citation_would_fail_on(field, value):
+    row = dict(BOOK, **{field: value})
+    assert [error_field for error_field, _ in validate(row)] == [field]
+    with pytest.raises((TypeError, ValueError, IndexError)):
+        build_citation(row).end_text()
+
+
+@pytest.mark.parametrize('value', [['John Smith '], ['A B', '']])
+def test_names_rendered_without_a_surname(value):
+    assert [field for field, _ in validate(dict(BOOK, author=value))] == ['author']
+
+
+@pytest.mark.parametrize('value', [[], '', ' ; ', 'A B; ; C D'])
+def test_empty_names(value):
+    row = dict(BOOK, author=value)
+    errors = validate(row)
+    if errors:
+        assert [field for field, _ in errors] == ['author']
+    else:
+        build_citation(row).end_text()
+
+
+def test_parallel_renderer_leaves_out_invalid_rows():
+    rows = [BOOK, dict(BOOK, author='John  Smith'), dict(BOOK, edition=[]), dict(BOOK, book_title='Other')]
+    source = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+    errors = io.StringIO()
+    bibliography = Bibliography(source, 'jsonl', errors=errors, context=RenderContext(date(2020, 1, 2)),
+                                validate=True)
+    rendered = list(ParallelRenderer(workers=1).render_bibliography(bibliography))
+    assert [in_text for _, in_text in rendered] == ['(Dickson, 2018)'] * 2
+    assert [line.split(':')[1:3] for line in errors.getvalue().splitlines()] == [['2', ' ValidationError'],
+                                                                                 ['3', ' ValidationError']]
+
+
+def test_bibliography_leaves_out_invalid_rows():
+    rows = [BOOK, dict(BOOK, year_of_publication='soon'), dict(BOOK, book_title='Other')]
+    source = io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+    errors = io.StringIO()
+    bibliography = Bibliography(source, 'jsonl', errors=errors, validate=True)
+    assert [in_text for _, in_text in bibliography.render()] == ['(Dickson, 2018)'] * 2
+    assert ':2: ValidationError: year_of_publication' in errors.getvalue()
+
+
+def test_rows_that_are_not_objects():
+    rows = [(1, BOOK), (2, [BOOK]), (3, 'book'), (4, None)]
+    assert [(line_num, errors) for line_num, _, errors in validate_rows(rows)] == [
+        (1, []), (2, [('', 'record is not a JSON object')]), (3, [('', 'record is not a JSON object')]),
+        (4, [('', 'record is not a JSON object')])]
+    source = io.StringIO(''.join(json.dumps(row) + '\n' for row in [[BOOK], BOOK]))
+    errors = io.StringIO()
+    bibliography = Bibliography(source, 'jsonl', errors=errors, validate=True)
+    assert [in_text for _, in_text in bibliography.render()] == ['(Dickson, 2018)']
+    assert ':1: ValueError: record is not a JSON object' in errors.getvalue()
@@ -0,0 +1,116 @@
+import io
+import json
+import random
+from datetime import date
+
+from CLI_approach import RenderContext
+from watch import BibliographyWatcher
+
+
+def row(i, **fields):
+    record = {'type': 'book', 'author': 'A B{}'.format(i % 7), 'book_title': 'T{}'.format(i),
+              'year_of_publication': 2000 + i % 5, 'place_of_publication': 'L', 'publisher': 'P'}
+    record.update(fields)
+    return record
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in rows), encoding='utf-8')
+
+
+def output(watcher):
+    with open(watcher.output, encoding='utf-8') as stream:
+        return stream.read().splitlines()
+
+
+def fresh(path, tmp_path):
+    '''
+    Output of a new watcher, built from scratch.
+    '''
+    watcher = BibliographyWatcher(str(path), str(tmp_path / 'fresh.txt'), errors=io.StringIO())
+    watcher.update()
+    return output(watcher)
+
+
+def test_edits_are_patched(tmp_path):
+    source = tmp_path / 'refs.jsonl'
+    rows = [row(i, key=i) for i in range(40)]
+    write_jsonl(source, rows)
+    watcher = BibliographyWatcher(str(source), str(tmp_path / 'out.txt'), errors=io.StringIO())
+    assert watcher.update() == {'added': 40, 'changed': 0, 'removed': 0}
+
+    rows[3] = row(3, key=3, book_title='Edited')
+    del rows[10]
+    rows.append(row(99, key=99))
+    write_jsonl(source, rows)
+    assert watcher.update() == {'added': 1, 'changed': 1, 'removed': 1}
+    assert output(watcher) == fresh(source, tmp_path)
+    assert len(output(watcher)) == 40
+
+
+def test_removed_records_on_a_new_access_date(tmp_path):
+    source = tmp_path / 'refs.jsonl'
+    rows = [row(i) for i in range(10)]
+    write_jsonl(source, rows)
+    watcher = BibliographyWatcher(str(source), str(tmp_path / 'out.txt'), errors=io.StringIO())
+    watcher.update()
+    # the last pass was made yesterday
+    watcher.context = RenderContext(date(2000, 1, 1))
+    write_jsonl(source, rows[:8])
+    counts = watcher.update()
+    assert counts['removed'] == 2 and counts['changed'] == 8 and counts['added'] == 0
+    assert len(watcher.records) == 8
+    assert output(watcher) == fresh(source, tmp_path)
+
+
+def test_copies_of_a_line_without_key(tmp_path):
+    source = tmp_path / 'refs.jsonl'
+    rows = [row(1), row(1), row(2)]
+    write_jsonl(source, rows)
+    watcher = BibliographyWatcher(str(source), str(tmp_path / 'out.txt'), errors=io.StringIO())
+    watcher.update()
+    assert len(output(watcher)) == 3
+    watcher.update()
+    write_jsonl(source, rows[1:])
+    assert watcher.update() == {'added': 0, 'changed': 0, 'removed': 1}
+    assert output(watcher) == fresh(source, tmp_path)
+
+
+def test_random_edits_match_a_fresh_build(tmp_path):
+    rng = random.Random(5)
+    source = tmp_path / 'refs.jsonl'
+    rows = [row(rng.randrange(30)) for _ in range(40)]
+    write_jsonl(source, rows)
+    watcher = BibliographyWatcher(str(source), str(tmp_path / 'out.txt'), errors=io.StringIO())
+    watcher.update()
+    for _ in range(60):
+        action = rng.random()
+        if action < 0.3 and rows:
+            del rows[rng.randrange(len(rows))]
+        elif action < 0.6:
+            rows.insert(rng.randrange(len(rows) + 1), row(rng.randrange(30)))
+        elif action < 0.8 and rows:
+            # a copy of a line already there
+            rows.append(dict(rng.choice(rows)))
+        elif rows:
+            rows[rng.randrange(len(rows))] = row(rng.randrange(30), publisher='Q')
+        write_jsonl(source, rows)
+        watcher.update()
+        assert output(watcher) == fresh(source, tmp_path)
+        assert len(output(watcher)) == len(rows)
+
+
+def test_new_csv_header(tmp_path):
+    source = tmp_path / 'refs.csv'
+    lines = ['book,A B,Title one,2001,London,Penguin', 'book,C D,Title two,2002,Leeds,Sage']
+    source.write_text('type,author,book_title,year_of_publication,place_of_publication,publisher\n'
+                      + '\n'.join(lines) + '\n', encoding='utf-8')
+    watcher = BibliographyWatcher(str(source), str(tmp_path / 'out.txt'), errors=io.StringIO())
+    watcher.update()
+    assert output(watcher)[0] == 'B, A. (2001) Title one.London: Penguin.'
+    # same rows, the place and the publisher columns swapped
+    source.write_text('type,author,book_title,year_of_publication,publisher,place_of_publication\n'
+                      + '\n'.join(lines) + '\n', encoding='utf-8')
+    assert watcher.update()['changed'] == 2
+    assert output(watcher)[0] == 'B, A. (2001) Title one.Penguin: London.'
+    assert output(watcher) == fresh(source, tmp_path)
@@ -0,0 +1,49 @@
+import io
+import zipfile
+from datetime import date
+from xml.etree import ElementTree
+
+from bibliography import build_citation
+from CLI_approach import RenderContext
+from writers import WORDML, DocxWriter, HtmlWriter, write_document, writer_for
+
+CONTEXT = RenderContext(date(2020, 1, 2))
+W = '{{{}}}'.format(WORDML)
+
+
+def book(author, title):
+    return build_citation({'type': 'book', 'author': author, 'book_title': title, 'year_of_publication': 2018,
+                           'place_of_publication': 'London', 'publisher': 'Penguin'})
+
+
+CITATIONS = [book('Zoe Young', 'Zebras'), book('Ann Lee', 'Tom & Jerry <1>'), book('Émile Durand', 'Économie')]
+
+
+def test_docx_parts_parse_and_entries_are_sorted(tmp_path):
+    path = str(tmp_path / 'references.docx')
+    assert write_document(CITATIONS, path, context=CONTEXT, title='Sources & notes', buffer_records=2) == 3
+    assert writer_for(path) is DocxWriter
+    with zipfile.ZipFile(path) as package:
+        assert package.testzip() == None
+        parts = {name: ElementTree.fromstring(package.read(name)) for name in package.namelist()}
+    assert set(parts) == {'[Content_Types].xml', '_rels/.rels', 'word/_rels/document.xml.rels',
+                          'word/styles.xml', 'word/document.xml'}
+    paragraphs = parts['word/document.xml'].iter(W + 'p')
+    texts = [''.join(text.text for text in paragraph.iter(W + 't')) for paragraph in paragraphs]
+    assert texts[0] == 'Sources & notes'
+    assert [text.split(',')[0] for text in texts[1:]] == ['Durand', 'Lee', 'Young']
+    assert 'Tom & Jerry <1>' in texts[2]
+    # titles in italic runs
+    assert any(run.find(W + 'rPr/' + W + 'i') != None and run.find(W + 't').text == 'Zebras'
+               for run in parts['word/document.xml'].iter(W + 'r'))
+
+
+def test_html(tmp_path):
+    out = io.StringIO()
+    assert write_document(CITATIONS, out, writer=HtmlWriter, context=CONTEXT) == 3
+    text = out.getvalue()
+    assert text.startswith('<!DOCTYPE html>') and text.endswith('</html>\n')
+    entries = [line for line in text.splitlines() if line.startswith('<p>')]
+    assert entries[1] == '<p>Lee, A. (2018) <i>Tom &amp; Jerry &lt;1&gt;</i>.London: Penguin.</p>'
+    assert [entry[3:].split(',')[0] for entry in entries] == ['Durand', 'Lee', 'Young']
+    assert writer_for(str(tmp_path / 'refs.HTM')) is HtmlWriter
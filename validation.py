@@ -0,0 +1,184 @@
+'''
+Validation of citation records before they are built and rendered.
+
+    errors = validate(row)      -> [('author', 'required'), ('month_of_publication', 'expected between 1 and 12, got 13')]
+    for line_num, row, errors in validate_rows(rows):
+        ...
+
+Bad records used to fail deep inside rendering (Journal and Book
+without an author, a WebDocument month out of MONTH) or to give
+garbage ('None' for a missing publisher). Every type has a schema,
+the checks of its fields, compiled once into a Python function that
+reads the row in one pass and collects every error of the record :
+nothing is raised, a record with three bad fields gets three errors.
+
+Rows are checked as build_citation() reads them : '' is an empty
+field ([] too for names), ints may be given as strings (CSV), names
+as 'A B; C D' or a list of names, pages as 12, '12-15' or [12, 15].
+The words of a name are one space apart, as Names splits them.
+'''
+from bibliography import INT_FIELDS, NAME_FIELDS, TYPES, get_fields
+from CLI_approach import Dictionary, Newspaper, Online
+
+# fields a record can leave empty, every other field of its type is required
+OPTIONAL = frozenset(('year_of_publication', 'volume', 'edition', 'page'))
+# types whose layout uses the website or the title when there is no author
+ANONYMOUS = (Online, Dictionary, Newspaper)
+# int field -> (smallest, biggest or None)
+RANGES = {
+    'year_of_publication' : (1, 9999),
+    'month_of_publication': (1, 12),
+    'day_of_publication'  : (1, 31),
+    'volume_number'       : (1, None),
+    'part_number'         : (1, None),
+    'volume'              : (1, None),
+    'edition'             : (1, None),
+}
+
+# checks of one field, {field} is its name (a str literal), the value is in v.
+# They run in order, the first one that finds an error skips the others
+EMPTY = '''
+    v = get({field})
+    if v == None or v == ''{names_empty}:
+        {missing}'''
+
+NAMES = '''
+    elif type(v) is str:
+        if not v.replace(';', '').strip():
+            add(({field}, 'no name'))
+        elif not spaced([name.strip() for name in v.split(';')]):
+            add(({field}, 'expected words one space apart, got {{!r}}'.format(v)))
+    elif type(v) in (list, tuple):
+        if not v or not all(type(name) is str and name.strip() for name in v):
+            add(({field}, 'expected a list of names'))
+        elif not spaced(v):
+            add(({field}, 'expected words one space apart, got {{!r}}'.format(v)))
+    else:
+        add(({field}, 'expected names, got ' + type(v).__name__))'''
+
+INT = '''
+    elif type(v) is not int and not (type(v) is str and v.strip().isdecimal()):
+        add(({field}, 'expected an int, got {{!r}}'.format(v)))'''
+
+RANGE = '''
+    elif not {low} <= int(v){high}:
+        add(({field}, 'expected {between}, got {{}}'.format(v)))'''
+
+PAGE = '''
+    elif not page(v):
+        add(({field}, 'expected a page, 12 or 12-15, got {{!r}}'.format(v)))'''
+
+TEXT = '''
+    elif type(v) is not str:
+        add(({field}, 'expected text, got ' + type(v).__name__))'''
+
+_validators = {}
+
+
+def page(value):
+    '''
+    Returns True if parse_page() reads the value as a page or a range
+    of pages, from the first to the last.
+    '''
+    if type(value) is int:
+        return value > 0
+    if type(value) is str:
+        start, _, to = value.partition('-')
+        if not start.strip().isdecimal() or (_ and not to.strip().isdecimal()):
+            return False
+        return 0 < int(start) <= (int(to) if _ else int(start))
+    if type(value) in (list, tuple):
+        return (len(value) == 2 and all(type(number) is int for number in value)
+                and 0 < value[0] <= value[1])
+    return False
+
+
+def spaced(names):
+    '''
+    Returns True if the words of every name are one space apart, so
+    that Names.get_parsed() finds no empty given name or surname.
+    Empty names (between two ';') are skipped, as parse_names() does.
+    '''
+    return all('' not in name.split(' ') for name in names if name)
+
+
+def field_source(cls, field):
+    '''
+    Returns the Python source checking one field of a type.
+    '''
+    required = field not in OPTIONAL and not (field == 'author' and issubclass(cls, ANONYMOUS))
+    params = {'field': repr(field), 'missing': "add(({!r}, 'required'))".format(field) if required else 'pass',
+              # parse_names() reads [] as no names, int() and parse_page() would fail on it
+              'names_empty': " or v == []" if field in NAME_FIELDS else ''}
+    checks = [EMPTY]
+    if field in NAME_FIELDS:
+        checks.append(NAMES)
+    elif field in INT_FIELDS:
+        checks.append(INT)
+        if field in RANGES:
+            low, high = RANGES[field]
+            checks.append(RANGE)
+            params.update(low=low, high='' if high == None else ' <= {}'.format(high),
+                          between='{} or more'.format(low) if high == None else 'between {} and {}'.format(low, high))
+    elif field == 'page':
+        checks.append(PAGE)
+    else:
+        checks.append(TEXT)
+    return ''.join(check.format(**params) for check in checks)
+
+
+def compile_validator(cls):
+    '''
+    Returns the function(row) -> list of (field, message) checking
+    the records of a citation class. Compiled functions are cached.
+    '''
+    if cls in _validators:
+        return _validators[cls]
+    source = 'def check(row):\n    errors = []\n    add = errors.append\n    get = row.get'
+    source += ''.join(field_source(cls, field) for field in get_fields(cls))
+    source += '\n    return errors\n'
+    namespace = {'page': page, 'spaced': spaced}
+    exec(compile(source, '<validator {}>'.format(cls.__name__), 'exec'), namespace)
+    check = namespace['check']
+    check.source = source
+    _validators[cls] = check
+    return check
+
+
+def validate(row):
+    '''
+    Returns the list of (field, message) of every error of a row,
+    empty if build_citation() can build and render it.
+    '''
+    if not isinstance(row, dict):
+        return [('', 'record is not a JSON object')]
+    kind = row.get('type')
+    cls = TYPES.get(kind.strip().lower() if isinstance(kind, str) else None)
+    if cls == None:
+        return [('type', 'unknown citation type {!r}'.format(kind))]
+    return compile_validator(cls)(row)
+
+
+def validate_rows(rows):
+    '''
+    Streaming stage : yields (line number, row, list of errors) for
+    every (line number, row) of rows, eg Bibliography.rows().
+    '''
+    validators = {kind: compile_validator(cls) for kind, cls in TYPES.items()}
+    for line_num, row in rows:
+        kind = row.get('type') if isinstance(row, dict) else None
+        check = validators.get(kind) if type(kind) is str else None
+        if check == None:
+            # mixed case or spaces around the type, a bad type or not a JSON object
+            yield line_num, row, validate(row)
+        else:
+            yield line_num, row, check(row)
+
+
+def format_errors(errors):
+    '''
+    Returns the errors of a record on one line.
+
+    eg : 'author: required; page: expected a page, 12 or 12-15, got 'x''
+    '''
+    return '; '.join('{}: {}'.format(field, message) if field else message for field, message in errors)
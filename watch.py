@@ -0,0 +1,209 @@
+import csv
+import json
+import os
+import sys
+import time
+from bisect import bisect_left, insort
+from itertools import chain
+
+from CLI_approach import RenderContext
+from bibliography import build_citation
+from reflist import sort_key
+
+# row fields used as the identity of a record, the raw row is used if none is set
+KEY_FIELDS = ('key', 'id')
+
+
+class BibliographyWatcher:
+    '''
+    Keeps a rendered, sorted reference list in sync with a JSONL/CSV
+    bibliography file.
+
+    Every pass works out which records were added, changed or removed
+    since the last one and only builds the Citation objects of those.
+    The output file is then patched from the first line that moved,
+    the lines before it are not written again.
+
+    Records are matched by their `key` or `id` field, or by their
+    whole content when they have neither.
+
+    Input : data types
+        source   -> str, path of the bibliography (.jsonl or .csv)
+        output   -> str, path of the rendered reference list
+        markup   -> markup given to end_text()
+        errors   -> file object receiving bad rows (default stderr)
+    '''
+    def __init__(self, source, output, markup='text', errors=None):
+        self.source = source
+        self.output = output
+        self.markup = markup
+        self.errors = sys.stderr if errors == None else errors
+        self.fmt = 'csv' if os.path.splitext(source)[1].lower() == '.csv' else 'jsonl'
+        self.context = RenderContext()
+        # raw line -> identities of the records on that line, from the last pass
+        self.lines = {}
+        # CSV header of the last pass, the raw lines only mean something under it
+        self.header = None
+        # identity -> (sort key, identity, end_text) for records that rendered
+        self.records = {}
+        # sorted list of (sort key, identity, end_text) and the byte size of every line
+        self.entries = []
+        self.sizes = []
+        self.stamp = None
+
+    def _header(self):
+        with open(self.source, newline='', encoding='utf-8') as stream:
+            return next(csv.reader(stream), None)
+
+    def _read(self):
+        '''
+        Yields (line number, raw line, parser) of the source. The parser
+        is only called for lines that were not in the last pass.
+        '''
+        with open(self.source, newline='', encoding='utf-8') as stream:
+            if self.fmt == 'csv':
+                reader = csv.reader(stream)
+                header = next(reader, None)
+                for values in reader:
+                    raw = '\x1f'.join(values)
+                    yield reader.line_num, raw, lambda values=values: dict(zip(header, values))
+            else:
+                for line_num, line in enumerate(stream, 1):
+                    line = line.strip()
+                    if line:
+                        yield line_num, line, lambda line=line: json.loads(line)
+
+    def _identity(self, row, raw, seen):
+        for field in KEY_FIELDS:
+            if row.get(field) not in (None, ''):
+                identity = '{}:{}'.format(field, row[field])
+                if identity not in seen:
+                    return identity
+        # same content twice in the file : number the copies
+        identity = raw
+        copy = 1
+        while identity in seen:
+            copy += 1
+            identity = '{}#{}'.format(raw, copy)
+        return identity
+
+    def _render(self, line_num, row, identity):
+        try:
+            citation = build_citation(row)
+            return (sort_key(citation), identity, citation.end_text(self.markup, self.context))
+        except Exception as error:
+            self.errors.write('{}:{}: {}: {}\n'.format(self.source, line_num, type(error).__name__, error))
+            return None
+
+    def update(self):
+        '''
+        Brings the output up to date. Returns a dict with the number
+        of records added, changed and removed.
+        '''
+        stat = os.stat(self.source)
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        # every record of the last pass, taken before the lines are forgotten below
+        previous = set(chain.from_iterable(self.lines.values()))
+        header = self._header() if self.fmt == 'csv' else None
+        if RenderContext().accessed != self.context.accessed or header != self.header:
+            # new access date : every end-text changes, new CSV header : every row reads differently
+            self.context = RenderContext()
+            self.header = header
+            self.lines = {}
+
+        lines = {}
+        seen = set()
+        changed = {}
+        for line_num, raw, parse in self._read():
+            # the same line can hold several records : copies without a key
+            identity = next((known for known in self.lines.get(raw, ()) if known not in seen), None)
+            if identity == None:
+                try:
+                    row = parse()
+                    if not isinstance(row, dict):
+                        raise ValueError('record is not a JSON object')
+                except ValueError as error:
+                    self.errors.write('{}:{}: {}: {}\n'.format(self.source, line_num, type(error).__name__, error))
+                    continue
+                identity = self._identity(row, raw, seen)
+                changed[identity] = self._render(line_num, row, identity)
+            seen.add(identity)
+            lines.setdefault(raw, []).append(identity)
+        self.lines = lines
+
+        counts = {'added': 0, 'changed': 0, 'removed': 0}
+        first = len(self.entries)
+        for identity in previous - seen:
+            entry = self.records.pop(identity, None)
+            counts['removed'] += 1
+            if entry != None:
+                first = min(first, self._remove(entry))
+        if len(changed) > len(self.entries) // 4:
+            # many changes (first pass, new access date) : sorting again is cheaper
+            for identity, entry in changed.items():
+                counts['changed' if identity in previous else 'added'] += 1
+                self.records.pop(identity, None)
+                if entry != None:
+                    self.records[identity] = entry
+            self.entries = sorted(self.records.values())
+            self.sizes = [len((entry[2] + '\n').encode('utf-8')) for entry in self.entries]
+            self._patch(0)
+            return counts
+
+        for identity, entry in changed.items():
+            old = self.records.pop(identity, None)
+            counts['changed' if identity in previous else 'added'] += 1
+            if old == entry:
+                self.records[identity] = entry
+                continue
+            if old != None:
+                first = min(first, self._remove(old))
+            if entry != None:
+                self.records[identity] = entry
+                insort(self.entries, entry)
+                position = bisect_left(self.entries, entry)
+                self.sizes.insert(position, len((entry[2] + '\n').encode('utf-8')))
+                first = min(first, position)
+
+        if first < len(self.entries) or counts['removed'] or not os.path.exists(self.output):
+            self._patch(first)
+        return counts
+
+    def _remove(self, entry):
+        position = bisect_left(self.entries, entry)
+        del self.entries[position]
+        del self.sizes[position]
+        return position
+
+    def _patch(self, first):
+        '''
+        Rewrites the output from the line at position first.
+        '''
+        offset = sum(self.sizes[:first])
+        mode = 'r+b' if os.path.exists(self.output) else 'wb'
+        with open(self.output, mode) as out:
+            out.seek(offset)
+            for i in range(first, len(self.entries), 1000):
+                out.write(''.join([entry[2] + '\n' for entry in self.entries[i:i + 1000]]).encode('utf-8'))
+            out.truncate()
+
+    def changed(self):
+        '''
+        Returns True if the source was modified since the last pass.
+        '''
+        stat = os.stat(self.source)
+        return (stat.st_mtime_ns, stat.st_size) != self.stamp
+
+    def run(self, interval=1.0, passes=None):
+        '''
+        Polls the source every interval seconds and updates the output
+        when it changes. Runs forever unless passes is given.
+        '''
+        count = 0
+        while passes == None or count < passes:
+            if self.changed():
+                counts = self.update()
+                self.errors.write('{}: {added} added, {changed} changed, {removed} removed\n'.format(
+                    self.source, **counts))
+                count += 1
+            time.sleep(interval)
@@ -0,0 +1,257 @@
+'''
+Streaming writers of a reference list as a document : HTML, or DOCX
+(Office Open XML) built with zipfile.
+
+    with HtmlWriter('references.html') as writer:
+        writer.write(references)        # end-text citations in 'html' markup
+
+    write_document(citations, 'references.docx')   # sorted, then written
+
+The entries are end_text() output in the markup of the writer
+('html', or 'wordml' for DOCX) : titles are in italics as the layout
+of their class says, and every entry is a paragraph with a hanging
+indent. Entries are written in blocks of buffer_records as they come,
+document.xml is streamed into the zip file, so neither the document
+nor a DOM of it is ever held in memory.
+'''
+import os
+import zipfile
+
+from reflist import ReferenceList
+from templates import escape_html, escape_xml
+
+# entries joined before one write() to the output
+BUFFER_RECORDS = 1000
+
+HTML_HEAD = '''<!DOCTYPE html>
+<html lang="{language}">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+.references p {{ margin: 0 0 0.5em; padding-left: 2em; text-indent: -2em; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<div class="references">
+'''
+HTML_TAIL = '''</div>
+</body>
+</html>
+'''
+
+WORDML = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>'''
+
+PACKAGE_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="{}/officeDocument" Target="word/document.xml"/>
+</Relationships>'''.format(RELATIONSHIPS)
+
+DOCUMENT_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="{}/styles" Target="styles.xml"/>
+</Relationships>'''.format(RELATIONSHIPS)
+
+# hanging indent of 0.5 inch (720 twentieths of a point)
+STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="{ns}">
+<w:docDefaults><w:rPrDefault><w:rPr><w:lang w:val="{language}"/></w:rPr></w:rPrDefault></w:docDefaults>
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:keepNext/><w:spacing w:before="240" w:after="240"/><w:outlineLvl w:val="0"/></w:pPr>
+<w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Reference"><w:name w:val="Reference"/><w:basedOn w:val="Normal"/>
+<w:pPr><w:spacing w:after="120"/><w:ind w:left="720" w:hanging="720"/></w:pPr></w:style>
+</w:styles>'''
+
+DOCUMENT_HEAD = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="{ns}"><w:body>
+<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t xml:space="preserve">{title}</w:t></w:r></w:p>
+'''
+DOCUMENT_TAIL = '''<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>
+<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="708" w:footer="708" w:gutter="0"/>
+</w:sectPr></w:body></w:document>
+'''
+# an entry in 'wordml' markup is the text of runs, see templates.py
+PARAGRAPH = '<w:p><w:pPr><w:pStyle w:val="Reference"/></w:pPr><w:r><w:t xml:space="preserve">{}</w:t></w:r></w:p>\n'
+
+
+class DocumentWriter:
+    '''
+    Streaming writer of a reference list, one paragraph per entry.
+    Subclasses give the markup of the entries and the start, the
+    paragraphs and the end of the document.
+
+    Input : data types
+        out            -> str (path) or file object
+        title          -> str, heading of the list
+        language       -> str, language tag of the document
+        buffer_records -> int, entries joined before a write
+    '''
+    markup = None
+
+    def __init__(self, out, title='References', language='en-GB', buffer_records=BUFFER_RECORDS):
+        self.title = title
+        self.language = language
+        self.buffer_records = buffer_records
+        self.count = 0
+        self.closed = False
+        self.open(out)
+        self.emit(self.head())
+
+    def open(self, out):
+        raise NotImplementedError
+
+    def emit(self, text):
+        raise NotImplementedError
+
+    def finish(self):
+        raise NotImplementedError
+
+    def head(self):
+        return ''
+
+    def tail(self):
+        return ''
+
+    def paragraph(self, entry):
+        raise NotImplementedError
+
+    def write(self, entries):
+        '''
+        Writes every entry (end-text citation in the markup of the
+        writer), returns the number written.
+        '''
+        written = 0
+        block = []
+        paragraph = self.paragraph
+        for entry in entries:
+            block.append(paragraph(entry))
+            written += 1
+            if len(block) >= self.buffer_records:
+                self.emit(''.join(block))
+                block = []
+        if block:
+            self.emit(''.join(block))
+        self.count += written
+        return written
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.emit(self.tail())
+        self.finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HtmlWriter(DocumentWriter):
+    '''
+    HTML page of the reference list, entries in 'html' markup. The
+    hanging indent is done in CSS.
+    '''
+    markup = 'html'
+
+    def open(self, out):
+        if isinstance(out, str):
+            self.out = open(out, 'w', encoding='utf-8', newline='\n')
+            self.owned = True
+        else:
+            self.out = out
+            self.owned = False
+
+    def emit(self, text):
+        self.out.write(text)
+
+    def finish(self):
+        if self.owned:
+            self.out.close()
+        else:
+            self.out.flush()
+
+    def head(self):
+        return HTML_HEAD.format(title=escape_html(self.title), language=escape_html(self.language))
+
+    def tail(self):
+        return HTML_TAIL
+
+    def paragraph(self, entry):
+        return '<p>' + entry + '</p>\n'
+
+
+class DocxWriter(DocumentWriter):
+    '''
+    Word document (.docx) of the reference list, entries in 'wordml'
+    markup. The package parts are written first, then document.xml is
+    streamed into the zip file : it has to be the last part.
+    '''
+    markup = 'wordml'
+
+    def open(self, out):
+        self.package = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+        for name, text in (('[Content_Types].xml', CONTENT_TYPES), ('_rels/.rels', PACKAGE_RELS),
+                           ('word/_rels/document.xml.rels', DOCUMENT_RELS),
+                           ('word/styles.xml', STYLES.format(ns=WORDML, language=escape_xml(self.language)))):
+            self.package.writestr(name, text)
+        # the size is not known in advance : zip64 keeps big documents readable
+        self.document = self.package.open('word/document.xml', 'w', force_zip64=True)
+
+    def emit(self, text):
+        self.document.write(text.encode('utf-8'))
+
+    def finish(self):
+        self.document.close()
+        self.package.close()
+
+    def head(self):
+        return DOCUMENT_HEAD.format(ns=WORDML, title=escape_xml(self.title))
+
+    def tail(self):
+        return DOCUMENT_TAIL
+
+    def paragraph(self, entry):
+        return PARAGRAPH.format(entry)
+
+
+WRITERS = {'.html': HtmlWriter, '.htm': HtmlWriter, '.docx': DocxWriter}
+
+
+def writer_for(path):
+    '''
+    Returns the writer class of a file name : .docx -> DocxWriter,
+    anything else -> HtmlWriter.
+    '''
+    return WRITERS.get(os.path.splitext(path)[1].lower(), HtmlWriter)
+
+
+def write_document(citations, out, writer=None, context=None, memory_budget=64 * 1024 * 1024, **options):
+    '''
+    Sorts citations into a Harvard reference list (see reflist.py)
+    and writes it as a document, returns the number of entries.
+
+    input :
+        out     -> str (path) or file object
+        writer  -> DocumentWriter subclass or None (guessed from the path)
+        options -> title, language, buffer_records of the writer
+    '''
+    if writer == None:
+        writer = writer_for(out if isinstance(out, str) else getattr(out, 'name', ''))
+    with ReferenceList(memory_budget, writer.markup, context) as references:
+        references.extend(citations)
+        with writer(out, **options) as document:
+            return document.write(references)